@@ -2,6 +2,7 @@
 Django settings for config project.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,11 +28,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RegistroPeticionesMiddleware',
+    'core.middleware.MetricasMiddleware',
+    'core.middleware.PresupuestoConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.RenovarSesionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.autenticacion.AutenticacionCacheadaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -49,6 +56,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.notificaciones',
             ],
         },
     },
@@ -64,6 +72,14 @@ DATABASES = {
     }
 }
 
+# Caché (fragmentos de plantillas, versión del catálogo)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'miposta',
+    }
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.Usuario'
 
@@ -83,6 +99,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash de contraseñas: 'pbkdf2' (por defecto de Django), 'scrypt' o 'argon2'
+# (este último requiere argon2-cffi). Los hashes con otro algoritmo o coste
+# se siguen aceptando y se rehashean al iniciar sesión.
+PERFIL_HASH_CONTRASENAS = os.environ.get('PERFIL_HASH_CONTRASENAS', 'pbkdf2')
+SCRYPT_WORK_FACTOR = 2 ** 14
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 65536  # KiB
+
+HASHERS_POR_PERFIL = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'core.hashers.ScryptAjustadoPasswordHasher',
+    'argon2': 'core.hashers.Argon2AjustadoPasswordHasher',
+}
+PASSWORD_HASHERS = [HASHERS_POR_PERFIL[PERFIL_HASH_CONTRASENAS]] + [
+    hasher for perfil, hasher in HASHERS_POR_PERFIL.items()
+    if perfil != PERFIL_HASH_CONTRASENAS
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 # Internationalization
 LANGUAGE_CODE = 'es-mx'
 TIME_ZONE = 'America/Lima'
@@ -116,10 +152,95 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Configuración de sesiones
 SESSION_COOKIE_AGE = 86400  # 24 horas
-SESSION_SAVE_EVERY_REQUEST = True
+# La expiración se renueva en core.middleware.RenovarSesionMiddleware solo
+# cuando quedan menos de SESION_MARGEN_RENOVACION segundos
+SESSION_SAVE_EVERY_REQUEST = False
+SESION_MARGEN_RENOVACION = 43200  # 12 horas
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# Límites de peticiones (core/limites.py): nombre -> (capacidad, periodo en segundos)
+LIMITES_PETICIONES = {
+    'login_ip': (20, 60),
+    'login_usuario': (5, 60),
+    'registro_ip': (10, 3600),
+    'cambio_estado': (60, 60),
+}
+# Usar X-Forwarded-For para la IP (solo detrás de un proxy de confianza; la
+# prueba de carga lo activa en su servidor para simular clientes distintos)
+LIMITES_CONFIAR_PROXY = os.environ.get('LIMITES_CONFIAR_PROXY') == '1'
+
+# Lista de espera: segundos que un hueco liberado queda reservado para el
+# paciente al que se le ofreció (ver core/lista_espera.py)
+LISTA_ESPERA_PLAZO_OFERTA = 15 * 60
+
+# Auditoría de accesos a pacientes (core/auditoria.py): los eventos se
+# escriben por lotes desde un hilo de fondo. AUDITORIA_ACTIVA = False no
+# registra nada (mediciones como verificar_presupuestos).
+AUDITORIA_ACTIVA = True
+AUDITORIA_TAMANO_LOTE = 200
+AUDITORIA_INTERVALO = 5  # segundos
+AUDITORIA_MAX_PENDIENTES = 10000
+AUDITORIA_DESBORDE = 'sincrono'  # o 'descartar'
+
+# Logs en JSON por líneas, escritos desde un hilo de fondo (core/bitacora.py).
+# LOG_ARCHIVO vacío = stderr. LOG_MUESTREO: fracción de los INFO que se
+# conservan por logger (las advertencias y errores siempre se escriben).
+LOG_ARCHIVO = os.environ.get('LOG_ARCHIVO') or None
+LOG_MUESTREO = {
+    'core.peticiones': float(os.environ.get('LOG_MUESTREO_PETICIONES', '0.1')),
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'muestreo': {'()': 'core.bitacora.FiltroMuestreo', 'tasas': LOG_MUESTREO},
+        'contexto': {'()': 'core.bitacora.FiltroContexto'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'core.bitacora.ManejadorCola',
+            'archivo': LOG_ARCHIVO,
+            'filters': ['muestreo', 'contexto'],
+        },
+    },
+    'root': {'handlers': ['json'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'handlers': ['json'], 'level': 'INFO', 'propagate': False},
+        'core': {'handlers': ['json'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Métricas de Prometheus en /metrics (core/metricas.py). Acceso para staff o
+# con "Authorization: Bearer <METRICAS_TOKEN>". Con varios procesos,
+# METRICAS_DIRECTORIO apunta a una carpeta compartida que se vacía al desplegar.
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN') or None
+METRICAS_DIRECTORIO = os.environ.get('METRICAS_DIRECTORIO') or None
+METRICAS_INTERVALO_VOLCADO = 5  # segundos
+
+# Sincronización de la app móvil (core/sincronizacion.py): filas por flujo en
+# cada respuesta incremental y días que se guardan las lápidas de borrados
+# (un cliente sin sincronizar más tiempo que eso descarga todo de nuevo)
+SYNC_LIMITE = 500
+SYNC_RETENCION_BORRADOS_DIAS = 90
+
+# Bandeja de salida de eventos de citas (core/eventos.py). Consumidores HTTP
+# de /eventos/ como "nombre:token,nombre:token"; eventos por lote y días que
+# se guardan (un consumidor detenido más tiempo pierde los más antiguos)
+EVENTOS_CONSUMIDORES = dict(
+    par.split(':', 1) for par in os.environ.get('EVENTOS_CONSUMIDORES', '').split(',') if ':' in par
+)
+EVENTOS_LOTE = 1000
+EVENTOS_RETENCION_DIAS = 7
+
+# Notificaciones (core/notificaciones.py): las sin leer del mismo tipo y asunto
+# dentro de la ventana se agrupan en una fila; las leídas se compactan tras
+# NOTIFICACIONES_COMPACTAR_DIAS y todas se eliminan tras
+# NOTIFICACIONES_RETENCION_DIAS (manage.py purgar_notificaciones)
+NOTIFICACIONES_VENTANA_AGRUPAR = 24 * 60 * 60  # segundos
+NOTIFICACIONES_COMPACTAR_DIAS = 30
+NOTIFICACIONES_RETENCION_DIAS = 180
+
 # Configuración de mensajes
 from django.contrib.messages import constants as messages
 MESSAGE_TAGS = {
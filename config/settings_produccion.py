@@ -0,0 +1,56 @@
+"""
+Django settings para producción.
+
+Uso: DJANGO_SETTINGS_MODULE=config.settings_produccion
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE, SECRET_KEY, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+# Plantillas: se compilan una vez por proceso y se reutilizan
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Caché compartida entre procesos: Redis. Los límites de peticiones
+# (core/limites.py) y el contador de notificaciones sin leer necesitan un
+# incr atómico entre workers; FileBasedCache y DatabaseCache lo hacen con
+# get + set y pierden incrementos concurrentes, así que no hay alternativa
+# en disco.
+if not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured('REDIS_URL es obligatorio en producción (caché compartida con incr atómico)')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+}
+
+# Sesiones: lecturas desde la caché, escrituras también en la base de datos
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Estáticos: nombres con hash, variantes .gz/.br generadas en collectstatic y
+# servidos por el propio proceso con caché de larga duración
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.storage.ManifestComprimidoStorage',
+    },
+}
+MIDDLEWARE = MIDDLEWARE[:1] + ['core.middleware.ArchivosEstaticosMiddleware'] + MIDDLEWARE[1:]
+ESTATICOS_MAX_AGE_SIN_HASH = 60
@@ -1,16 +1,58 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Rol, Especialidad, Cita, Recordatorio, Notificacion
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import (
+    Usuario, Rol, Especialidad, Franja, SerieCitas, Cita, Recordatorio, Notificacion, EsperaCita, OfertaHueco,
+    AccesoPaciente,
+)
+from .paginacion import ConteoEstimadoPaginator
+
+
+def _filtro_usuarios(termino):
+    """
+    Búsqueda de usuarios que usa índices: email exacto (índice sobre
+    LOWER(email)) o prefijo de username como rango (índice único de username).
+    """
+    if '@' in termino:
+        return Usuario.objects.alias(email_min=Lower('email')).filter(email_min=termino.lower())
+    return Usuario.objects.filter(username__gte=termino, username__lt=termino + '\U0010ffff')
+
+
+class TablaGrandeAdmin(admin.ModelAdmin):
+    """Listados sin COUNT(*) completos sobre tablas grandes."""
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    # Campos FK a usuarios por los que se busca (ver _filtro_usuarios)
+    busqueda_usuarios = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip()
+        if not termino or not self.busqueda_usuarios:
+            return super().get_search_results(request, queryset, search_term)
+        usuarios = _filtro_usuarios(termino).values('pk')
+        condicion = Q()
+        for campo in self.busqueda_usuarios:
+            condicion |= Q(**{f'{campo}__in': usuarios})
+        return queryset.filter(condicion), False
+
 
 @admin.register(Usuario)
 class UsuarioAdmin(UserAdmin):
     list_display = ['username', 'email', 'rol', 'first_name', 'last_name', 'is_active']
     list_filter = ['rol', 'is_staff', 'is_active']
-    search_fields = ['username', 'email', 'first_name', 'last_name']
+    # Se busca con _filtro_usuarios; también lo usa el autocompletado de las FK
+    search_fields = ['username', 'email']
+    search_help_text = 'Email exacto o inicio del nombre de usuario'
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
     
+    filter_horizontal = UserAdmin.filter_horizontal + ('especialidades',)
+
     fieldsets = UserAdmin.fieldsets + (
         ('Información adicional', {
-            'fields': ('rol', 'telefono', 'direccion', 'fecha_nacimiento')
+            'fields': ('rol', 'telefono', 'direccion', 'fecha_nacimiento', 'especialidades')
         }),
     )
     
@@ -20,6 +62,12 @@ class UsuarioAdmin(UserAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip()
+        if not termino:
+            return queryset, False
+        return queryset.filter(pk__in=_filtro_usuarios(termino).values('pk')), False
+
 @admin.register(Rol)
 class RolAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'descripcion']
@@ -30,20 +78,85 @@ class EspecialidadAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'descripcion']
     search_fields = ['nombre']
 
+@admin.register(Franja)
+class FranjaAdmin(admin.ModelAdmin):
+    list_display = ['medico', 'dia', 'hora_inicio', 'hora_fin', 'tipo']
+    list_filter = ['dia', 'tipo']
+    list_select_related = ['medico']
+    autocomplete_fields = ['medico']
+
+@admin.register(SerieCitas)
+class SerieCitasAdmin(TablaGrandeAdmin):
+    list_display = ['paciente', 'medico', 'frecuencia', 'intervalo', 'inicio', 'repeticiones', 'hasta']
+    list_filter = ['frecuencia']
+    list_select_related = ['paciente', 'medico']
+    autocomplete_fields = ['paciente', 'medico', 'especialidad']
+    search_fields = ['paciente__username', 'medico__username']
+    search_help_text = 'Email exacto o inicio del usuario del paciente o médico'
+    busqueda_usuarios = ('paciente', 'medico')
+
 @admin.register(Cita)
-class CitaAdmin(admin.ModelAdmin):
+class CitaAdmin(TablaGrandeAdmin):
     list_display = ['paciente', 'medico', 'fecha_hora', 'estado', 'creado_en']
     list_filter = ['estado', 'fecha_hora']
+    list_select_related = ['paciente', 'medico']
+    autocomplete_fields = ['paciente', 'medico', 'especialidad']
+    raw_id_fields = ['serie']
     search_fields = ['paciente__username', 'medico__username']
-    date_hierarchy = 'fecha_hora'
+    search_help_text = 'Email exacto o inicio del usuario del paciente o médico'
+    busqueda_usuarios = ('paciente', 'medico')
 
 @admin.register(Recordatorio)
-class RecordatorioAdmin(admin.ModelAdmin):
+class RecordatorioAdmin(TablaGrandeAdmin):
     list_display = ['cita', 'fecha_envio', 'enviado']
     list_filter = ['enviado', 'fecha_envio']
+    list_select_related = ['cita__paciente', 'cita__medico']
+    raw_id_fields = ['cita']
 
 @admin.register(Notificacion)
-class NotificacionAdmin(admin.ModelAdmin):
+class NotificacionAdmin(TablaGrandeAdmin):
     list_display = ['usuario', 'titulo', 'leida', 'creada_en']
     list_filter = ['leida', 'creada_en']
-    search_fields = ['usuario__username', 'titulo']
\ No newline at end of file
+    list_select_related = ['usuario']
+    autocomplete_fields = ['usuario']
+    search_fields = ['usuario__username']
+    search_help_text = 'Email exacto o inicio del nombre de usuario'
+    busqueda_usuarios = ('usuario',)
+
+@admin.register(EsperaCita)
+class EsperaCitaAdmin(TablaGrandeAdmin):
+    list_display = ['paciente', 'medico', 'especialidad', 'desde', 'hasta', 'estado', 'creado_en']
+    list_filter = ['estado']
+    list_select_related = ['paciente', 'medico', 'especialidad']
+    autocomplete_fields = ['paciente', 'medico', 'especialidad']
+    search_fields = ['paciente__username']
+    search_help_text = 'Email exacto o inicio del nombre de usuario'
+    busqueda_usuarios = ('paciente',)
+
+@admin.register(OfertaHueco)
+class OfertaHuecoAdmin(TablaGrandeAdmin):
+    list_display = ['cita_liberada', 'espera', 'estado', 'vence_en', 'creada_en']
+    list_filter = ['estado']
+    list_select_related = ['cita_liberada__paciente', 'cita_liberada__medico', 'espera__paciente']
+    raw_id_fields = ['cita_liberada', 'espera', 'cita_asignada']
+
+@admin.register(AccesoPaciente)
+class AccesoPacienteAdmin(TablaGrandeAdmin):
+    list_display = ['momento', 'medico', 'paciente', 'vista', 'cita_id']
+    list_filter = ['vista']
+    list_select_related = ['medico', 'paciente']
+    search_fields = ['paciente__username', 'medico__username']
+    search_help_text = 'Email exacto o inicio del usuario del paciente o médico'
+    busqueda_usuarios = ('paciente', 'medico')
+    # Por pk: orden de inserción sin recorrer la tabla ordenando por momento
+    ordering = ['-id']
+
+    # Registro de solo lectura
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = 'Sistema MiPosta'
\ No newline at end of file
+    verbose_name = 'Sistema MiPosta'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,148 @@
+"""
+Auditoría de accesos a datos de pacientes sin escribir en cada petición.
+
+Las vistas del médico llaman a ``registrar_acceso``, que solo encola el evento
+en memoria. Un hilo de fondo por proceso vacía la cola con un ``bulk_create``
+cuando se juntan AUDITORIA_TAMANO_LOTE eventos, cuando pasan
+AUDITORIA_INTERVALO segundos desde el primero pendiente y al terminar el
+proceso (``atexit``).
+
+La cola está acotada (AUDITORIA_MAX_PENDIENTES). Si se llena, por ejemplo
+porque la base está bloqueada, AUDITORIA_DESBORDE decide qué hacer:
+``'sincrono'`` escribe el evento en la propia petición (no se pierde nada pero
+la petición espera) y ``'descartar'`` lo descarta y lo cuenta en el log.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import AccesoPaciente
+
+logger = logging.getLogger(__name__)
+
+_cerrojo = threading.Lock()
+_cola = None
+_hilo = None
+_pid = None
+_descartados = 0
+
+
+def _ajuste(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def _escribir(eventos):
+    try:
+        AccesoPaciente.objects.bulk_create(eventos)
+    except Exception:
+        # La auditoría nunca tumba una petición ni el hilo escritor
+        logger.exception('No se pudieron guardar %s accesos de auditoría', len(eventos))
+
+
+def _sacar_lote(cola, tamano, espera):
+    """Bloquea hasta el primer evento y junta hasta ``tamano`` durante ``espera`` segundos."""
+    lote = [cola.get()]
+    limite = time.monotonic() + espera
+    while len(lote) < tamano:
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        try:
+            lote.append(cola.get(timeout=restante))
+        except queue.Empty:
+            break
+    return lote
+
+
+def _bucle(cola):
+    tamano = _ajuste('AUDITORIA_TAMANO_LOTE', 200)
+    espera = _ajuste('AUDITORIA_INTERVALO', 5)
+    while True:
+        lote = _sacar_lote(cola, tamano, espera)
+        fin = None in lote
+        eventos = [evento for evento in lote if evento is not None]
+        if eventos:
+            close_old_connections()
+            _escribir(eventos)
+        for _ in lote:
+            cola.task_done()
+        if fin:
+            break
+    connection.close()
+
+
+def _cola_del_proceso():
+    """Crea la cola y el hilo la primera vez (y de nuevo tras un fork)."""
+    global _cola, _hilo, _pid
+    if _pid == os.getpid() and _hilo.is_alive():
+        return _cola
+    with _cerrojo:
+        if _pid != os.getpid() or not _hilo.is_alive():
+            _cola = queue.Queue(maxsize=_ajuste('AUDITORIA_MAX_PENDIENTES', 10000))
+            _hilo = threading.Thread(target=_bucle, args=(_cola,), name='auditoria', daemon=True)
+            _hilo.start()
+            _pid = os.getpid()
+    return _cola
+
+
+def registrar_acceso(medico, pacientes_ids, vista, cita_id=None):
+    """Encola un acceso del ``medico`` a cada paciente de ``pacientes_ids``."""
+    global _descartados
+    if not _ajuste('AUDITORIA_ACTIVA', True):
+        return
+    momento = timezone.now()
+    cola = _cola_del_proceso()
+    for paciente_id in pacientes_ids:
+        evento = AccesoPaciente(
+            medico_id=medico.pk, paciente_id=paciente_id, cita_id=cita_id, vista=vista, momento=momento
+        )
+        try:
+            cola.put_nowait(evento)
+        except queue.Full:
+            if _ajuste('AUDITORIA_DESBORDE', 'sincrono') == 'sincrono':
+                _escribir([evento])
+            else:
+                _descartados += 1
+                if _descartados == 1 or _descartados % 1000 == 0:
+                    logger.warning('Cola de auditoría llena: %s accesos descartados', _descartados)
+
+
+def vaciar(timeout=None):
+    """
+    Espera a que el hilo escriba todo lo encolado hasta ahora (comandos,
+    cierre del proceso). Devuelve ``False`` si se agotó ``timeout``.
+    """
+    if _cola is None or _pid != os.getpid():
+        return True
+    if timeout is None:
+        _cola.join()
+        return True
+    limite = time.monotonic() + timeout
+    while _cola.unfinished_tasks:
+        if time.monotonic() >= limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def detener(timeout=5):
+    """Escribe lo pendiente y termina el hilo escritor."""
+    global _hilo
+    if _cola is None or _pid != os.getpid() or not _hilo.is_alive():
+        return
+    try:
+        _cola.put(None, timeout=timeout)
+    except queue.Full:
+        logger.warning('Cola de auditoría llena al cerrar; se pierden los accesos pendientes')
+        return
+    _hilo.join(timeout)
+
+
+atexit.register(detener)
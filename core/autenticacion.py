@@ -0,0 +1,108 @@
+"""
+Autenticación con el usuario de la sesión cacheado y control de acceso por rol.
+
+``AutenticacionCacheadaMiddleware`` sustituye a AuthenticationMiddleware: en
+lugar de leer la fila completa de ``usuarios`` en cada petición guarda en la
+caché un registro mínimo (id, rol, nombres, banderas) y reconstruye con él
+una instancia de ``Usuario`` con el resto de campos diferidos. Cualquier
+campo no cacheado se carga bajo demanda, y guardar la instancia solo escribe
+los campos cargados.
+"""
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import auth, messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import Usuario
+
+# En el orden de los campos del modelo, como lo espera Model.from_db()
+CAMPOS_CACHEADOS = [
+    f.attname for f in Usuario._meta.concrete_fields
+    if f.attname in {'id', 'username', 'first_name', 'last_name', 'rol',
+                     'is_active', 'is_staff', 'is_superuser'}
+]
+
+DURACION_CACHE = 3600
+
+REDIRECCION_POR_ROL = {
+    'ADMIN': 'admin_dashboard',
+    'MEDICO': 'medico_dashboard',
+    'PACIENTE': 'paciente_dashboard',
+}
+
+
+def _clave(usuario_id):
+    return f'auth:usuario:{usuario_id}'
+
+
+def invalidar_usuario(usuario_id):
+    cache.delete(_clave(usuario_id))
+
+
+def obtener_usuario(request):
+    """Equivalente a ``django.contrib.auth.get_user`` con caché del registro."""
+    try:
+        usuario_id = Usuario._meta.pk.to_python(request.session[auth.SESSION_KEY])
+    except KeyError:
+        return AnonymousUser()
+
+    datos = cache.get(_clave(usuario_id))
+    if datos is not None and constant_time_compare(
+        datos['hash_sesion'], request.session.get(auth.HASH_SESSION_KEY, '')
+    ):
+        return Usuario.from_db('default', CAMPOS_CACHEADOS, [datos[c] for c in CAMPOS_CACHEADOS])
+
+    # Sin caché (o hash distinto, p. ej. tras cambiar la contraseña): camino
+    # normal de Django, que valida el hash de sesión contra la base de datos
+    usuario = auth.get_user(request)
+    if usuario.is_authenticated:
+        datos = {c: getattr(usuario, c) for c in CAMPOS_CACHEADOS}
+        datos['hash_sesion'] = usuario.get_session_auth_hash()
+        cache.set(_clave(usuario.id), datos, DURACION_CACHE)
+    return usuario
+
+
+async def _aobtener_usuario(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await sync_to_async(obtener_usuario)(request)
+    return request._acached_user
+
+
+class AutenticacionCacheadaMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: obtener_usuario(request))
+        request.auser = partial(_aobtener_usuario, request)
+
+
+def redireccion_por_rol(usuario):
+    """Redirige al dashboard que corresponde al rol del usuario."""
+    return redirect(REDIRECCION_POR_ROL.get(usuario.rol, 'paciente_dashboard'))
+
+
+def rol_requerido(rol, json=False, mensaje='No tienes permisos para acceder', redirigir='login'):
+    """
+    Exige sesión iniciada y el rol indicado.
+
+    Las vistas HTML muestran ``mensaje`` y redirigen a ``redirigir``; las
+    vistas JSON (``json=True``) responden 403.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.user.rol != rol:
+                if json:
+                    return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+                messages.error(request, mensaje)
+                return redirect(redirigir)
+            return vista(request, *args, **kwargs)
+        return login_required(envoltura)
+    return decorador
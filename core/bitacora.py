@@ -0,0 +1,150 @@
+"""
+Logs estructurados (una línea JSON por registro) sin escribir en el hilo de
+la petición.
+
+``ManejadorCola`` es un ``QueueHandler``: la petición solo resuelve el
+mensaje (argumentos con ``%``, evaluados únicamente si el nivel está activo)
+y lo encola; un ``QueueListener`` por proceso lo formatea con
+``FormatoJSON`` y lo escribe en stderr o en un archivo. Si la cola se llena
+el registro se descarta y se cuenta en ``miposta_logs_descartados_total``
+(``/metrics``), nunca se bloquea la petición.
+
+``RegistroPeticionesMiddleware`` (core/middleware.py) guarda en variables de
+contexto el id de petición, el usuario y la vista; ``FiltroContexto`` los
+copia en cada registro. ``FiltroMuestreo`` deja pasar solo una fracción de
+los registros INFO de los loggers ruidosos (LOG_MUESTREO); los WARNING y
+superiores siempre pasan.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+from . import metricas
+
+peticion_actual = contextvars.ContextVar('peticion_actual', default=None)
+
+CAMPOS_EXTRA = ('duracion_ms', 'estado', 'metodo', 'ruta')
+_FORMATO_TRAZA = logging.Formatter()
+
+
+class FiltroContexto(logging.Filter):
+    """Añade request_id, usuario_id y vista de la petición en curso."""
+
+    def filter(self, record):
+        contexto = peticion_actual.get()
+        if contexto is not None:
+            record.request_id = contexto.get('request_id')
+            record.usuario_id = contexto.get('usuario_id')
+            record.vista = contexto.get('vista')
+        return True
+
+
+class FiltroMuestreo(logging.Filter):
+    """Muestrea los registros INFO o inferiores según ``tasas`` (logger -> fracción)."""
+
+    def __init__(self, tasas=None):
+        super().__init__()
+        self.tasas = tasas or {}
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        tasa = self.tasas.get(record.name)
+        return tasa is None or random.random() < tasa
+
+
+class FormatoJSON(logging.Formatter):
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for campo in ('request_id', 'usuario_id', 'vista') + CAMPOS_EXTRA:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                datos[campo] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """
+    Encola los registros y los escribe desde un hilo de fondo.
+
+    ``archivo``: ruta del log (por defecto stderr). ``capacidad``: registros
+    pendientes como máximo antes de empezar a descartar.
+    """
+
+    def __init__(self, archivo=None, capacidad=10000):
+        super().__init__(queue.Queue(maxsize=capacidad))
+        self.archivo = archivo
+        self._escucha = None
+        self._pid = None
+        self._cerrojo = threading.Lock()
+
+    def _destino(self):
+        if self.archivo:
+            destino = logging.handlers.WatchedFileHandler(self.archivo, encoding='utf-8')
+        else:
+            destino = logging.StreamHandler(sys.stderr)
+        destino.setFormatter(FormatoJSON())
+        return destino
+
+    def _iniciar(self):
+        # El hilo no sobrevive a un fork (servidores con prefork): se arranca
+        # uno nuevo en cada proceso la primera vez que se registra algo
+        with self._cerrojo:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._escucha = logging.handlers.QueueListener(self.queue, self._destino())
+            self._escucha.start()
+            self._pid = os.getpid()
+            atexit.register(self.detener)
+
+    def prepare(self, record):
+        # Solo lo imprescindible en el hilo de la petición: resolver el
+        # mensaje (los argumentos pueden cambiar después) y la traza; el JSON
+        # se arma en el hilo escritor
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record = logging.makeLogRecord(record.__dict__)
+            record.exc_text = record.exc_text or _FORMATO_TRAZA.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metricas.LOGS_DESCARTADOS.inc()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._iniciar()
+        super().emit(record)
+
+    def detener(self):
+        if self._escucha is not None and self._pid == os.getpid():
+            self._escucha.stop()
+            self._escucha = None
+            self._pid = None
+
+    def close(self):
+        self.detener()
+        super().close()
+
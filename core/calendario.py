@@ -0,0 +1,209 @@
+"""
+Feeds iCalendar (.ics) de las citas de médicos y pacientes.
+
+Cada médico o paciente genera un enlace secreto ``/calendario.ics?token=...``
+y lo agrega a la app de calendario del teléfono. El token va en la query y no
+en la ruta para que no quede en los logs de peticiones, que guardan solo la
+ruta.
+
+Las apps consultan el enlace cada pocos minutos, así que una consulta sin
+cambios cuesta una sola consulta de agregados: ``huella`` lee el dueño del
+token junto con la última ``actualizado_en`` y el total de sus citas, y
+``condition`` responde 304 si coincide el ETag o la fecha. Los nombres de
+médicos, pacientes y especialidades también salen en el feed: el momento del
+último cambio de alguno (``catalogo.nombres_cambiados``, lo mueven las
+señales) entra en el ETag y en la fecha. Si algo cambió, el .ics sale de la
+caché (clave por usuario y huella) o se genera recorriendo las filas con
+``values().iterator()`` mientras se envía, y se guarda al terminar.
+
+El feed lleva las citas no canceladas desde VENTANA_PASADO atrás, con
+nombres y especialidad; el motivo de la consulta no sale del sistema.
+"""
+import hashlib
+import secrets
+from datetime import timedelta, timezone as tz
+
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef
+
+from . import fechas
+from .catalogo import nombres_cambiados
+from .disponibilidad import DURACION_TURNO
+from .frescura import agregado
+from .models import Cita, Usuario
+
+ROLES = ('MEDICO', 'PACIENTE')
+VENTANA_PASADO = timedelta(days=90)
+DURACION_CACHE = 60 * 60 * 24
+TIPO_CONTENIDO = 'text/calendar; charset=utf-8'
+TAMANO_LOTE = 500
+LARGO_LINEA = 75  # octetos, RFC 5545 §3.1
+
+ESTADO_ICS = {
+    'PENDIENTE': 'TENTATIVE',
+    'CONFIRMADA': 'CONFIRMED',
+    'COMPLETADA': 'CONFIRMED',
+}
+
+
+# --- token ---
+
+def token_de(usuario_id, regenerar=False):
+    """Token del enlace del usuario; lo crea si no tiene o si se pide regenerarlo."""
+    if not regenerar:
+        token = Usuario.objects.filter(pk=usuario_id).values_list('token_calendario', flat=True).first()
+        if token:
+            return token
+    token = secrets.token_urlsafe(32)
+    Usuario.objects.filter(pk=usuario_id).update(token_calendario=token)
+    return token
+
+
+# --- validación condicional (ETag / Last-Modified) ---
+
+def huella(request):
+    """
+    Dueño y versión del feed pedido (``usuario_id``, ``rol``, ``etag``,
+    ``modificado``), o ``None`` si el token no es válido. Una consulta,
+    memorizada en ``request`` para el ETag, la fecha y la vista.
+    """
+    if not hasattr(request, '_huella_calendario'):
+        request._huella_calendario = _calcular_huella(request.GET.get('token', ''))
+    return request._huella_calendario
+
+
+def _calcular_huella(token):
+    if not token:
+        return None
+    del_medico = Cita.objects.filter(medico=OuterRef('pk'))
+    del_paciente = Cita.objects.filter(paciente=OuterRef('pk'))
+    fila = (
+        Usuario.objects
+        .filter(token_calendario=token, is_active=True, rol__in=ROLES)
+        .values(
+            'pk', 'rol',
+            medico_actualizadas=agregado(del_medico, 'medico', Max('actualizado_en')),
+            medico_total=agregado(del_medico, 'medico', Count('pk')),
+            paciente_actualizadas=agregado(del_paciente, 'paciente', Max('actualizado_en')),
+            paciente_total=agregado(del_paciente, 'paciente', Count('pk')),
+        )
+        .first()
+    )
+    if fila is None:
+        return None
+
+    lado = fila['rol'].lower()
+    actualizadas = fila[f'{lado}_actualizadas']
+    # La ventana avanza cada día aunque ninguna cita cambie
+    hoy = fechas.hoy()
+    nombres = nombres_cambiados()
+    texto = f'{fila["pk"]}|{fila["rol"]}|{actualizadas}|{fila[f"{lado}_total"]}|{hoy}|{nombres.timestamp()}'
+    return {
+        'usuario_id': fila['pk'],
+        'rol': fila['rol'],
+        'etag': hashlib.md5(texto.encode(), usedforsecurity=False).hexdigest(),
+        'modificado': max(actualizadas or fechas.inicio_dia(hoy), fechas.inicio_dia(hoy), nombres),
+    }
+
+
+def etag_calendario(request, *args, **kwargs):
+    datos = huella(request)
+    return datos['etag'] if datos else None
+
+
+def modificado_calendario(request, *args, **kwargs):
+    datos = huella(request)
+    return datos['modificado'] if datos else None
+
+
+# --- contenido ---
+
+def _clave(datos):
+    return f'calendario:{datos["usuario_id"]}:{datos["etag"]}'
+
+
+def en_cache(datos):
+    return cache.get(_clave(datos))
+
+
+def generar(datos):
+    """Líneas del .ics a medida que se leen las citas; al terminar lo guarda en la caché."""
+    partes = []
+    for parte in _lineas(datos):
+        partes.append(parte)
+        yield parte
+    cache.set(_clave(datos), ''.join(partes), DURACION_CACHE)
+
+
+def _lineas(datos):
+    yield _linea('BEGIN', 'VCALENDAR')
+    yield _linea('VERSION', '2.0')
+    yield _linea('PRODID', '-//WebMiPosta//Citas//ES')
+    yield _linea('CALSCALE', 'GREGORIAN')
+    yield _linea('METHOD', 'PUBLISH')
+    yield _linea('X-WR-CALNAME', 'Citas WebMiPosta')
+    yield _linea('REFRESH-INTERVAL;VALUE=DURATION', 'PT15M')
+    yield _linea('X-PUBLISHED-TTL', 'PT15M')
+
+    if datos['rol'] == 'MEDICO':
+        filtro, otro = {'medico_id': datos['usuario_id']}, 'paciente'
+    else:
+        filtro, otro = {'paciente_id': datos['usuario_id']}, 'medico'
+    filas = (
+        Cita.objects
+        .filter(**filtro, fecha_hora__gte=fechas.inicio_dia(fechas.hoy()) - VENTANA_PASADO)
+        .exclude(estado='CANCELADA')
+        .order_by('fecha_hora')
+        .values(
+            'pk', 'fecha_hora', 'estado', 'actualizado_en', 'especialidad__nombre',
+            f'{otro}__first_name', f'{otro}__last_name', f'{otro}__username',
+        )
+        .iterator(chunk_size=TAMANO_LOTE)
+    )
+    for fila in filas:
+        nombre = (
+            f'{fila[f"{otro}__first_name"]} {fila[f"{otro}__last_name"]}'.strip()
+            or fila[f'{otro}__username']
+        )
+        resumen = f'Cita - {nombre}' if otro == 'paciente' else f'Cita con Dr. {nombre}'
+        yield _linea('BEGIN', 'VEVENT')
+        yield _linea('UID', f'cita-{fila["pk"]}@webmiposta')
+        yield _linea('DTSTAMP', _utc(fila['actualizado_en']))
+        yield _linea('LAST-MODIFIED', _utc(fila['actualizado_en']))
+        yield _linea('DTSTART', _utc(fila['fecha_hora']))
+        yield _linea('DTEND', _utc(fila['fecha_hora'] + DURACION_TURNO))
+        yield _linea('SUMMARY', _escapar(resumen))
+        if fila['especialidad__nombre']:
+            yield _linea('DESCRIPTION', _escapar(fila['especialidad__nombre']))
+        yield _linea('STATUS', ESTADO_ICS.get(fila['estado'], 'CONFIRMED'))
+        yield _linea('END', 'VEVENT')
+
+    yield _linea('END', 'VCALENDAR')
+
+
+def _utc(momento):
+    return momento.astimezone(tz.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _escapar(texto):
+    return (
+        texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _linea(nombre, valor):
+    """Línea de contenido con CRLF, plegada a LARGO_LINEA octetos sin partir caracteres."""
+    linea = f'{nombre}:{valor}'
+    if len(linea.encode()) <= LARGO_LINEA:
+        return linea + '\r\n'
+    trozos, actual, octetos = [], '', 0
+    for caracter in linea:
+        tamano = len(caracter.encode())
+        if octetos + tamano > LARGO_LINEA:
+            trozos.append(actual)
+            actual, octetos = ' ', 1
+        actual += caracter
+        octetos += tamano
+    trozos.append(actual)
+    return '\r\n'.join(trozos) + '\r\n'
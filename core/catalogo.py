@@ -0,0 +1,55 @@
+"""
+Versión del catálogo de médicos y especialidades.
+
+Las plantillas cachean los fragmentos que dependen del catálogo (listas de
+médicos y especialidades) con ``{% cache ... version_catalogo %}``. Cuando
+cambia un médico o una especialidad se incrementa la versión y los
+fragmentos anteriores dejan de usarse sin tener que borrarlos uno a uno.
+
+Aparte se guarda el momento del último cambio de un nombre de usuario o de
+especialidad (``nombres_cambiados``): entra en la huella de las páginas y
+feeds que muestran nombres de otros usuarios (panel del médico, .ics).
+"""
+import time
+from datetime import datetime, timezone as tz
+
+from django.core.cache import cache
+
+CLAVE_VERSION = 'catalogo:version'
+CLAVE_NOMBRES = 'catalogo:nombres'
+
+
+def version_catalogo():
+    """Versión vigente del catálogo (una lectura de caché)."""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Se parte de un valor basado en la hora para no reutilizar versiones
+        # antiguas si la clave fue expulsada de la caché.
+        cache.add(CLAVE_VERSION, int(time.time()), None)
+        version = cache.get(CLAVE_VERSION, int(time.time()))
+    return version
+
+
+def invalidar_catalogo():
+    """Incrementa la versión del catálogo."""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, int(time.time()), None)
+
+
+def nombres_cambiados():
+    """
+    Momento del último cambio de un nombre que muestran otras páginas (una
+    lectura de caché). Si la clave se perdió se toma ahora: las páginas se
+    regeneran una vez en lugar de servir nombres viejos.
+    """
+    momento = cache.get(CLAVE_NOMBRES)
+    if momento is None:
+        cache.add(CLAVE_NOMBRES, time.time(), None)
+        momento = cache.get(CLAVE_NOMBRES, time.time())
+    return datetime.fromtimestamp(momento, tz.utc)
+
+
+def invalidar_nombres():
+    cache.set(CLAVE_NOMBRES, time.time(), None)
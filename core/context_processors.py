@@ -0,0 +1,9 @@
+from .notificaciones import resumen
+
+
+def notificaciones(request):
+    """Resumen de notificaciones sin leer para las páginas del paciente."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or user.rol != 'PACIENTE':
+        return {}
+    return resumen(user.id)
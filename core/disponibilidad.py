@@ -0,0 +1,110 @@
+"""
+Primeros turnos libres de una especialidad entre todos sus médicos.
+
+Cada médico aporta un generador perezoso de turnos libres: sus franjas
+semanales partidas en bloques de ``DURACION_TURNO``, menos los que se cruzan
+con una cita que ocupa el turno (no cancelada, o cancelada con el hueco
+retenido por una oferta de la lista de espera). ``heapq.merge`` mezcla los generadores en orden
+cronológico y la búsqueda se corta al reunir K turnos. Las citas ocupadas se
+leen por tramos de ``DIAS_POR_TRAMO`` días (una consulta por tramo para todos
+los médicos) y solo mientras sigan faltando turnos.
+"""
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Cita, Franja, Usuario
+
+DURACION_TURNO = timedelta(minutes=30)
+DIAS_POR_TRAMO = 7
+CODIGO_DIA = [codigo for codigo, _ in Franja.DIAS]  # índice = date.weekday()
+
+
+def _momento(dia, hora):
+    return timezone.make_aware(datetime.combine(dia, hora))
+
+
+def turno_ocupado(ocupadas, inicio):
+    """Si alguna cita (inicios ordenados en ``ocupadas``) se cruza con el turno."""
+    i = bisect_right(ocupadas, inicio - DURACION_TURNO)
+    return i < len(ocupadas) and ocupadas[i] < inicio + DURACION_TURNO
+
+
+def _turnos_libres(medico_id, franjas_por_dia, ocupadas, dias, desde, hasta):
+    """Genera ``(inicio, medico_id)`` de los turnos libres del médico, en orden."""
+    ultimo = None
+    for dia in dias:
+        for franja in franjas_por_dia.get(CODIGO_DIA[dia.weekday()], ()):
+            inicio = _momento(dia, franja.hora_inicio)
+            fin = _momento(dia, franja.hora_fin)
+            while inicio + DURACION_TURNO <= fin:
+                # Franjas solapadas del mismo día no repiten turnos
+                if desde <= inicio < hasta and (ultimo is None or inicio > ultimo):
+                    if not turno_ocupado(ocupadas, inicio):
+                        ultimo = inicio
+                        yield inicio, medico_id
+                inicio += DURACION_TURNO
+
+
+def primeros_turnos(especialidad, desde, hasta, k=5):
+    """
+    Los ``k`` turnos libres más tempranos en ``[desde, hasta)`` entre los
+    médicos activos de ``especialidad``.
+
+    Devuelve una lista de dicts con ``inicio``, ``fin``, ``medico_id`` y
+    ``medico`` (nombre para mostrar).
+    """
+    medicos = {
+        medico.pk: medico
+        for medico in Usuario.objects
+        .filter(rol='MEDICO', is_active=True, especialidades=especialidad)
+        .only('id', 'username', 'first_name', 'last_name')
+    }
+    franjas = defaultdict(lambda: defaultdict(list))
+    for franja in Franja.objects.filter(medico__in=list(medicos)).order_by('hora_inicio'):
+        franjas[franja.medico_id][franja.dia].append(franja)
+    if not franjas:
+        return []
+
+    turnos = []
+    dia = timezone.localdate(desde)
+    ultimo_dia = timezone.localdate(hasta)
+    while dia <= ultimo_dia and len(turnos) < k:
+        fin_tramo = min(dia + timedelta(days=DIAS_POR_TRAMO), ultimo_dia + timedelta(days=1))
+        dias = [dia + timedelta(days=i) for i in range((fin_tramo - dia).days)]
+
+        ocupadas = defaultdict(list)
+        citas = (
+            Cita.objects
+            .filter(
+                medico_id__in=list(franjas),
+                fecha_hora__gt=_momento(dia, datetime.min.time()) - DURACION_TURNO,
+                fecha_hora__lt=_momento(fin_tramo, datetime.min.time()),
+            )
+            .ocupan_turno()
+            .order_by('fecha_hora')
+            .values_list('medico_id', 'fecha_hora')
+        )
+        for medico_id, fecha_hora in citas:
+            ocupadas[medico_id].append(fecha_hora)
+
+        flujos = [
+            _turnos_libres(medico_id, por_dia, ocupadas[medico_id], dias, desde, hasta)
+            for medico_id, por_dia in franjas.items()
+        ]
+        for inicio, medico_id in heapq.merge(*flujos):
+            medico = medicos[medico_id]
+            turnos.append({
+                'inicio': inicio,
+                'fin': inicio + DURACION_TURNO,
+                'medico_id': medico_id,
+                'medico': medico.get_full_name() or medico.username,
+            })
+            if len(turnos) == k:
+                break
+        dia = fin_tramo
+
+    return turnos
@@ -0,0 +1,75 @@
+"""
+Bandeja de salida de eventos de citas para integraciones (facturación,
+laboratorio, analítica).
+
+``EventoCita`` se escribe en la misma transacción que cada cita creada o
+cambio de estado (core/models.py), con ids en orden de commit. Cada
+integración tiene su cursor en ``ConsumidorEventos``:
+
+* ``leer`` devuelve el lote siguiente al último id confirmado, en una sola
+  lectura por rango de la clave primaria.
+* ``confirmar`` avanza el cursor cuando el lote ya se procesó, nunca más
+  allá del último evento escrito. Hasta entonces el mismo lote se vuelve a
+  entregar: la entrega es "al menos una vez" y el consumidor descarta
+  repetidos por ``id``.
+
+Se consume por HTTP (``/eventos/`` con el token del consumidor definido en
+EVENTOS_CONSUMIDORES) o con ``manage.py consumir_eventos``.
+``manage.py purgar_eventos`` borra los eventos con más de
+EVENTOS_RETENCION_DIAS.
+"""
+import hmac
+
+from django.conf import settings
+from django.db.models import BigIntegerField, Subquery, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import ConsumidorEventos, EventoCita
+
+CAMPOS = (
+    'id', 'tipo', 'cita_id', 'paciente_id', 'medico_id', 'especialidad_id',
+    'fecha_hora', 'estado_anterior', 'estado', 'creado_en',
+)
+
+
+def consumidor_de(request):
+    """Nombre del consumidor dueño del token ``Authorization: Bearer``, o ``None``."""
+    autorizacion = request.headers.get('Authorization', '')
+    for nombre, token in settings.EVENTOS_CONSUMIDORES.items():
+        if token and hmac.compare_digest(autorizacion, f'Bearer {token}'):
+            return nombre
+    return None
+
+
+def leer(nombre, limite=None):
+    """``(eventos, mas)``: hasta ``limite`` eventos después del último confirmado por ``nombre``."""
+    limite = limite or settings.EVENTOS_LOTE
+    confirmado = ConsumidorEventos.objects.filter(nombre=nombre).values('ultimo_id')
+    eventos = list(
+        EventoCita.objects
+        .filter(id__gt=Coalesce(Subquery(confirmado), Value(0)))
+        .order_by('id')
+        .values(*CAMPOS)[:limite + 1]
+    )
+    return eventos[:limite], len(eventos) > limite
+
+
+def confirmar(nombre, hasta_id):
+    """
+    Avanza el cursor de ``nombre`` hasta ``hasta_id``; nunca lo retrocede ni
+    lo pasa del último evento que existe (un id mal escrito o futuro saltaría
+    para siempre los eventos que aún no se escribieron).
+    """
+    ahora = timezone.now()
+    ultimo = EventoCita.objects.order_by('-id').values('id')[:1]
+    tope = Least(Value(hasta_id), Coalesce(Subquery(ultimo), Value(0)), output_field=BigIntegerField())
+    avanzados = (
+        ConsumidorEventos.objects
+        .filter(nombre=nombre, ultimo_id__lt=tope)
+        .update(ultimo_id=tope, confirmado_en=ahora)
+    )
+    if not avanzados:
+        ConsumidorEventos.objects.get_or_create(
+            nombre=nombre, defaults={'ultimo_id': tope, 'confirmado_en': ahora}
+        )
@@ -0,0 +1,61 @@
+"""
+Días, semanas y meses locales como rangos de ``fecha_hora``.
+
+Las fechas se guardan en UTC y los días se cuentan en TIME_ZONE
+(America/Lima): "hoy" sacado de ``timezone.now()`` empieza a las 19:00 de
+Lima. Filtrar con ``fecha_hora__date`` o ``TruncDate`` además envuelve la
+columna en una función y el motor deja de usar los índices sobre
+``fecha_hora``. Aquí cada ventana local se convierte en un rango semiabierto
+``[inicio, fin)`` de instantes aware que se compara con la columna tal cual::
+
+    inicio, fin = fechas.rango_dia()
+    Cita.objects.filter(medico=medico, fecha_hora__gte=inicio, fecha_hora__lt=fin)
+
+Para agrupar por día está la columna indexada ``Cita.fecha_local``, que
+guarda ``dia_local(fecha_hora)``.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def hoy():
+    return timezone.localdate()
+
+
+def dia_local(momento):
+    """Día local de ``momento`` (un datetime naive se toma como hora local)."""
+    if timezone.is_naive(momento):
+        return momento.date()
+    return timezone.localtime(momento).date()
+
+
+def inicio_dia(dia):
+    """Inicio del día local ``dia`` como datetime aware."""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def rango_dias(desde, hasta):
+    """Días locales ``desde`` a ``hasta`` inclusive como ``(inicio, fin)``."""
+    return inicio_dia(desde), inicio_dia(hasta + timedelta(days=1))
+
+
+def rango_dia(dia=None):
+    dia = dia or hoy()
+    return rango_dias(dia, dia)
+
+
+def inicio_semana(dia):
+    """Lunes de la semana de ``dia``."""
+    return dia - timedelta(days=dia.weekday())
+
+
+def rango_semana(dia=None):
+    lunes = inicio_semana(dia or hoy())
+    return rango_dias(lunes, lunes + timedelta(days=6))
+
+
+def rango_mes(dia=None):
+    primero = (dia or hoy()).replace(day=1)
+    siguiente = (primero + timedelta(days=32)).replace(day=1)
+    return inicio_dia(primero), inicio_dia(siguiente)
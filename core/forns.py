@@ -2,14 +2,24 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from .registro import ROLES_REGISTRO, RegistroError, registrar_usuario
+
 User = get_user_model()
 
-ROL_CHOICES = (
-    ('PACIENTE', 'Paciente'),
-    ('MEDICO', 'Médico'),
+ROL_CHOICES = tuple(
+    (valor, etiqueta) for valor, etiqueta in User.ROLES if valor in ROLES_REGISTRO
 )
 
-class RegistrationForm(forms.ModelForm):
+class RegistrationForm(forms.Form):
+    # Formulario simple (no ModelForm): la unicidad de username y email la
+    # garantizan los índices al guardar, sin consultas previas (core/registro.py)
+    username = forms.CharField(
+        label='Usuario',
+        max_length=150,
+        validators=[User.username_validator],
+    )
+    first_name = forms.CharField(label='Nombre', max_length=150)
+    email = forms.EmailField(label='Correo')
     password = forms.CharField(
         label='Contraseña',
         widget=forms.PasswordInput,
@@ -23,22 +33,6 @@ class RegistrationForm(forms.ModelForm):
     )
     rol = forms.ChoiceField(choices=ROL_CHOICES, required=True, label='Registrarse como')
 
-    class Meta:
-        model = User
-        fields = ('username', 'first_name', 'email')
-
-    def clean_username(self):
-        username = self.cleaned_data.get('username')
-        if User.objects.filter(username=username).exists():
-            raise forms.ValidationError("El nombre de usuario ya existe.")
-        return username
-
-    def clean_email(self):
-        email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
-            raise forms.ValidationError("Ya existe una cuenta con este correo.")
-        return email
-
     def clean(self):
         cleaned = super().clean()
         pw = cleaned.get('password')
@@ -53,11 +47,16 @@ class RegistrationForm(forms.ModelForm):
             self.add_error('password', e)
         return cleaned
 
-    def save(self, commit=True):
-        user = super().save(commit=False)
-        pw = self.cleaned_data.get('password')
-        if pw:
-            user.set_password(pw)
-        if commit:
-            user.save()
-        return user
\ No newline at end of file
+    def save(self):
+        try:
+            return registrar_usuario(
+                username=self.cleaned_data['username'],
+                email=self.cleaned_data['email'],
+                password=self.cleaned_data['password'],
+                rol=self.cleaned_data['rol'],
+                first_name=self.cleaned_data.get('first_name', ''),
+            )
+        except RegistroError as e:
+            # Conflicto de unicidad: queda como error del formulario
+            self.add_error(e.campo, e.mensaje)
+            return None
\ No newline at end of file
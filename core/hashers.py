@@ -0,0 +1,23 @@
+"""
+Hashers de contraseñas con coste configurable.
+
+Se activan con PERFIL_HASH_CONTRASENAS en config/settings.py. Mantienen el
+mismo nombre de algoritmo que los de Django, así que al cambiar el coste los
+hashes existentes siguen siendo válidos y Django los rehashea de forma
+transparente en el siguiente login (``must_update``).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+
+
+class ScryptAjustadoPasswordHasher(ScryptPasswordHasher):
+    work_factor = getattr(settings, 'SCRYPT_WORK_FACTOR', ScryptPasswordHasher.work_factor)
+    block_size = getattr(settings, 'SCRYPT_BLOCK_SIZE', ScryptPasswordHasher.block_size)
+    parallelism = getattr(settings, 'SCRYPT_PARALLELISM', ScryptPasswordHasher.parallelism)
+
+
+class Argon2AjustadoPasswordHasher(Argon2PasswordHasher):
+    """Requiere el paquete argon2-cffi."""
+    time_cost = getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
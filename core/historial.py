@@ -0,0 +1,88 @@
+"""
+Historial del paciente para el médico.
+
+Las citas pasadas se leen por bloques con paginación por cursor
+(``fecha_hora``, ``id``). Los recordatorios de cada cita y las últimas
+notificaciones del paciente se cargan con ``Prefetch`` sobre querysets
+recortados: Django los resuelve con ``ROW_NUMBER()`` por relación, así que
+cada bloque son siempre las mismas pocas consultas, sin importar cuán largo
+sea el historial.
+"""
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+
+from .models import Cita, Notificacion, Recordatorio, Usuario
+from .pacientes import codificar_cursor, decodificar_cursor
+
+CITAS_POR_BLOQUE = 10
+CITAS_EN_DETALLE = 3
+RECORDATORIOS_POR_CITA = 3
+NOTIFICACIONES_RECIENTES = 5
+
+
+def paciente_con_notificaciones(pk, medico):
+    """
+    Paciente con sus últimas notificaciones precargadas (2 consultas).
+
+    Solo lo devuelve si tiene alguna cita con ``medico``; si no, lanza
+    ``Usuario.DoesNotExist``.
+    """
+    return (
+        Usuario.objects
+        .filter(pk=pk, rol='PACIENTE', citas_paciente__medico=medico)
+        .prefetch_related(Prefetch(
+            'notificaciones',
+            queryset=Notificacion.objects.order_by('-creada_en')[:NOTIFICACIONES_RECIENTES],
+            to_attr='notificaciones_recientes',
+        ))
+        .distinct()
+        .get()
+    )
+
+
+def paciente_de(pk, medico):
+    """
+    Paciente ``pk`` si tiene alguna cita con ``medico`` (una consulta); si no,
+    lanza ``Usuario.DoesNotExist``.
+    """
+    return Usuario.objects.filter(
+        Exists(Cita.objects.filter(paciente=OuterRef('pk'), medico=medico)),
+        pk=pk,
+        rol='PACIENTE',
+    ).get()
+
+
+def bloque_de_citas(paciente, medico, cursor=None, limite=CITAS_POR_BLOQUE, excluir=None):
+    """
+    Siguiente bloque de citas pasadas del paciente con ``medico``, de la más
+    reciente a la más antigua (2 consultas).
+
+    Devuelve ``(citas, cursor_siguiente)``; cada cita trae
+    ``recordatorios_recientes``. Lanza ``CursorInvalido`` si el cursor no se
+    puede leer.
+    """
+    citas = (
+        Cita.objects
+        .filter(paciente=paciente, medico=medico, fecha_hora__lt=timezone.now())
+        .select_related('especialidad')
+        .prefetch_related(Prefetch(
+            'recordatorios',
+            queryset=Recordatorio.objects.order_by('-fecha_envio')[:RECORDATORIOS_POR_CITA],
+            to_attr='recordatorios_recientes',
+        ))
+        .order_by('-fecha_hora', '-id')
+    )
+    if excluir is not None:
+        citas = citas.exclude(pk=excluir)
+    if cursor:
+        fecha_hora, cita_id = decodificar_cursor(cursor, es_fecha=True)
+        citas = citas.filter(
+            Q(fecha_hora__lt=fecha_hora) | Q(fecha_hora=fecha_hora, id__lt=cita_id)
+        )
+
+    citas = list(citas[:limite + 1])
+    siguiente = None
+    if len(citas) > limite:
+        citas = citas[:limite]
+        siguiente = codificar_cursor(citas[-1].fecha_hora, citas[-1].pk)
+    return citas, siguiente
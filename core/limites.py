@@ -0,0 +1,143 @@
+"""
+Limitación de peticiones por IP, por nombre de usuario o por usuario.
+
+Cada regla de LIMITES_PETICIONES (``capacidad`` peticiones cada ``periodo``
+segundos) funciona como un cubo de fichas aproximado con contadores en la
+caché: se cuenta con ``incr`` atómico en la ventana actual y se pondera la
+ventana anterior, así la reposición es gradual y no hay ráfagas dobles en el
+cambio de ventana. El rechazo se resuelve antes de ejecutar la vista, sin
+hashear contraseñas ni consultar la base de datos. Las peticiones rechazadas
+no cuentan: quien insiste sobre un nombre de usuario ajeno no alarga el
+bloqueo más allá de la ventana.
+
+El ``incr`` es atómico en LocMemCache (dentro de un proceso) y en Redis
+(entre procesos), que es la caché obligatoria en producción; en
+FileBasedCache o DatabaseCache es un get + set y los workers concurrentes
+perderían cuentas.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+def por_ip(request):
+    if getattr(settings, 'LIMITES_CONFIAR_PROXY', False):
+        reenviada = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if reenviada:
+            return reenviada.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def por_username(request):
+    """Nombre de usuario enviado en el formulario (login), normalizado."""
+    return request.POST.get('username', '').strip().casefold() or None
+
+
+def por_usuario(request):
+    """Usuario autenticado de la petición."""
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def _contar(clave, periodo):
+    cache.add(clave, 0, periodo * 2)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave expiró entre add e incr
+        cache.set(clave, 1, periodo * 2)
+        return 1
+
+
+def _descontar(clave):
+    try:
+        cache.decr(clave)
+    except ValueError:
+        pass
+
+
+def consumir(nombre, identificador):
+    """
+    Consume una ficha de la regla ``nombre`` para ``identificador``.
+
+    Devuelve ``None`` si la petición está permitida o los segundos a esperar
+    si se superó el límite; en ese caso la ficha se devuelve.
+    """
+    capacidad, periodo = settings.LIMITES_PETICIONES[nombre]
+    ahora = time.time()
+    ventana = int(ahora // periodo)
+    base = f'rl:{nombre}:{identificador}'
+
+    actual = _contar(f'{base}:{ventana}', periodo)
+    anterior = cache.get(f'{base}:{ventana - 1}', 0)
+    transcurrido = (ahora % periodo) / periodo
+    estimado = anterior * (1 - transcurrido) + actual
+
+    if estimado <= capacidad:
+        _contar(f'rl:permitidas:{nombre}', 86400)
+        return None
+    _descontar(f'{base}:{ventana}')
+    _contar(f'rl:rechazadas:{nombre}', 86400)
+    # Tiempo hasta que el estimado vuelva a la capacidad si no llegan más peticiones
+    if actual > capacidad:
+        espera = periodo * (1 - transcurrido + 1 - capacidad / actual)
+    else:
+        espera = periodo * (1 - (capacidad - actual) / anterior - transcurrido)
+    return max(1, math.ceil(espera))
+
+
+def contadores():
+    """Peticiones permitidas y rechazadas por regla (últimas 24 h aprox.)."""
+    claves = [
+        f'rl:{tipo}:{nombre}'
+        for nombre in settings.LIMITES_PETICIONES
+        for tipo in ('permitidas', 'rechazadas')
+    ]
+    valores = cache.get_many(claves)
+    return {
+        nombre: {
+            'capacidad': capacidad,
+            'periodo': periodo,
+            'permitidas': valores.get(f'rl:permitidas:{nombre}', 0),
+            'rechazadas': valores.get(f'rl:rechazadas:{nombre}', 0),
+        }
+        for nombre, (capacidad, periodo) in settings.LIMITES_PETICIONES.items()
+    }
+
+
+def limitar_peticiones(*reglas, json=False, metodos=('POST',)):
+    """
+    Aplica las ``reglas`` (pares ``(nombre, extractor)``) a la vista.
+
+    Solo se limitan los ``metodos`` indicados. Las peticiones rechazadas
+    reciben 429 con ``Retry-After``.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method in metodos:
+                for nombre, extractor in reglas:
+                    identificador = extractor(request)
+                    if identificador is None:
+                        continue
+                    espera = consumir(nombre, identificador)
+                    if espera is not None:
+                        if json:
+                            respuesta = JsonResponse(
+                                {'success': False, 'error': 'Demasiadas solicitudes, intenta más tarde'},
+                                status=429,
+                            )
+                        else:
+                            respuesta = HttpResponse(
+                                f'Demasiados intentos. Espera {espera} segundos.',
+                                status=429,
+                                content_type='text/plain; charset=utf-8',
+                            )
+                        respuesta['Retry-After'] = str(espera)
+                        return respuesta
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
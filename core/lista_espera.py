@@ -0,0 +1,294 @@
+"""
+Lista de espera y reasignación de huecos liberados.
+
+Al cancelarse una cita futura, ``ofrecer_hueco`` busca con una sola consulta
+(índices parciales sobre las entradas en estado ESPERANDO) la entrada más
+antigua cuyo médico coincide, o cuya especialidad atiende el médico, y cuya
+ventana contiene el turno. La entrada se reserva con una actualización
+condicional y se crea una ``OfertaHueco`` que retiene el hueco durante
+LISTA_ESPERA_PLAZO_OFERTA segundos: mientras esté pendiente, las reservas y la
+búsqueda de turnos lo tratan como ocupado (``CitaQuerySet.ocupan_turno``). Si
+vence o se rechaza, el hueco pasa a la siguiente entrada; al aceptarla se
+comprueba de nuevo que nadie lo haya tomado.
+
+Al cancelar una serie, ``ofrecer_huecos`` hace una búsqueda acotada por turno
+liberado y escribe las reservas, las ofertas y los avisos en bloque.
+
+Concurrencia: dos procesos no pueden reservar la misma entrada (UPDATE ...
+WHERE estado='ESPERANDO') ni crear dos ofertas pendientes para el mismo hueco
+(índice único parcial ``ofertas_una_pendiente_por_hueco``).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import notificaciones
+from .disponibilidad import DURACION_TURNO, turno_ocupado
+from .models import Cita, EsperaCita, OfertaHueco, Usuario
+
+INTENTOS_RESERVA = 5
+
+
+class ListaEsperaError(Exception):
+    pass
+
+
+class _Conflicto(Exception):
+    """Otro proceso reservó alguna de las entradas elegidas para un lote."""
+
+
+def _plazo_oferta():
+    return timedelta(seconds=getattr(settings, 'LISTA_ESPERA_PLAZO_OFERTA', 900))
+
+
+def turno_tomado(medico_id, fecha_hora, excluir=None):
+    """
+    Si el turno del médico se cruza con una cita que lo ocupa: no cancelada,
+    o cancelada con una oferta pendiente que retiene el hueco.
+    """
+    citas = Cita.objects.filter(
+        medico_id=medico_id,
+        fecha_hora__gt=fecha_hora - DURACION_TURNO,
+        fecha_hora__lt=fecha_hora + DURACION_TURNO,
+    )
+    if excluir is not None:
+        citas = citas.exclude(pk=excluir)
+    return citas.ocupan_turno().exists()
+
+
+def hueco_ocupado(cita_liberada):
+    """Si otra cita del médico ocupa o retiene el turno liberado."""
+    return turno_tomado(cita_liberada.medico_id, cita_liberada.fecha_hora, excluir=cita_liberada.pk)
+
+
+def _candidata(cita_liberada, especialidades, excluir=()):
+    """
+    Entrada en espera más antigua que acepta el hueco (una consulta indexada,
+    LIMIT 1), salvo las de ``excluir``. Solo bloquea la fila que devuelve.
+    """
+    inicio = cita_liberada.fecha_hora
+    consulta = (
+        EsperaCita.objects
+        .filter(
+            Q(medico_id=cita_liberada.medico_id)
+            | Q(medico__isnull=True, especialidad_id__in=especialidades),
+            estado='ESPERANDO',
+            desde__lte=inicio,
+            hasta__gte=inicio + DURACION_TURNO,
+        )
+        .exclude(paciente_id=cita_liberada.paciente_id)
+        .exclude(ofertas__cita_liberada=cita_liberada)
+        .exclude(pk__in=excluir)
+        .order_by('creado_en', 'pk')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        consulta = consulta.select_for_update(skip_locked=True, of=('self',))
+    return consulta.first()
+
+
+def ofrecer_hueco(cita_liberada):
+    """
+    Ofrece el turno de ``cita_liberada`` (ya cancelada) a la siguiente entrada
+    de la lista de espera. Devuelve la ``OfertaHueco`` creada o ``None``.
+    """
+    ahora = timezone.now()
+    if cita_liberada.fecha_hora <= ahora or hueco_ocupado(cita_liberada):
+        return None
+
+    especialidades = list(
+        cita_liberada.medico.especialidades.values_list('id', flat=True)
+    )
+    oferta = None
+    for _ in range(INTENTOS_RESERVA):
+        with transaction.atomic():
+            espera = _candidata(cita_liberada, especialidades)
+            if espera is None:
+                return None
+            reservada = EsperaCita.objects.filter(pk=espera.pk, estado='ESPERANDO').update(
+                estado='OFRECIDA', actualizado_en=ahora
+            )
+            if not reservada:
+                # Otro proceso la reservó entre la lectura y el UPDATE
+                continue
+            try:
+                with transaction.atomic():
+                    oferta = OfertaHueco.objects.create(
+                        cita_liberada=cita_liberada,
+                        espera=espera,
+                        vence_en=ahora + _plazo_oferta(),
+                    )
+            except IntegrityError:
+                # El hueco ya tiene una oferta pendiente: se devuelve la entrada
+                EsperaCita.objects.filter(pk=espera.pk).update(estado='ESPERANDO', actualizado_en=ahora)
+                return None
+        break
+
+    if oferta is None:
+        return None
+
+    notificaciones.notificar(**_aviso(oferta, cita_liberada, espera))
+    return oferta
+
+
+def _aviso(oferta, cita_liberada, espera):
+    """Argumentos de ``notificar`` para avisar la oferta al paciente."""
+    local = timezone.localtime(cita_liberada.fecha_hora)
+    medico = cita_liberada.medico
+    # Las ofertas sucesivas a la misma entrada de la lista se agrupan en una notificación
+    return {
+        'usuario_id': espera.paciente_id,
+        'titulo': 'Turno disponible',
+        'mensaje': (
+            f'Se liberó un turno el {local:%d/%m/%Y} a las {local:%H:%M} con '
+            f'Dr. {medico.get_full_name() or medico.username}. Acéptalo en "Mis Citas" '
+            f'antes de las {timezone.localtime(oferta.vence_en):%H:%M}.'
+        ),
+        'tipo': 'URGENTE',
+        'asunto': f'espera:{espera.pk}',
+    }
+
+
+def ofrecer_huecos(citas_liberadas):
+    """
+    ``ofrecer_hueco`` para varias citas ya canceladas (una serie): los turnos
+    tomados se leen de una vez; cada turno libre busca su entrada con la misma
+    consulta indexada y acotada de ``ofrecer_hueco``, y las reservas, las
+    ofertas y los avisos se escriben en bloque. Cada entrada recibe a lo sumo
+    una oferta. Devuelve las ofertas creadas.
+    """
+    ahora = timezone.now()
+    citas = sorted((c for c in citas_liberadas if c.fecha_hora > ahora), key=lambda c: c.fecha_hora)
+    if not citas:
+        return []
+    medicos = {cita.medico_id for cita in citas}
+    pks = [cita.pk for cita in citas]
+
+    tomadas = defaultdict(list)
+    filas = (
+        Cita.objects
+        .filter(
+            medico_id__in=medicos,
+            fecha_hora__gt=citas[0].fecha_hora - DURACION_TURNO,
+            fecha_hora__lt=citas[-1].fecha_hora + DURACION_TURNO,
+        )
+        .exclude(pk__in=pks)
+        .ocupan_turno()
+        .order_by('fecha_hora')
+        .values_list('medico_id', 'fecha_hora')
+    )
+    for medico_id, fecha_hora in filas:
+        tomadas[medico_id].append(fecha_hora)
+    libres = [cita for cita in citas if not turno_ocupado(tomadas[cita.medico_id], cita.fecha_hora)]
+    if not libres:
+        return []
+
+    especialidades = defaultdict(set)
+    for medico_id, especialidad_id in Usuario.especialidades.through.objects.filter(
+        usuario_id__in=medicos
+    ).values_list('usuario_id', 'especialidad_id'):
+        especialidades[medico_id].add(especialidad_id)
+
+    try:
+        with transaction.atomic():
+            asignadas = {}  # pk de la cita -> entrada
+            for cita in libres:
+                espera = _candidata(cita, especialidades[cita.medico_id],
+                                    excluir=[e.pk for e in asignadas.values()])
+                if espera is not None:
+                    asignadas[cita.pk] = espera
+            if not asignadas:
+                return []
+
+            reservadas = EsperaCita.objects.filter(
+                pk__in=[espera.pk for espera in asignadas.values()], estado='ESPERANDO'
+            ).update(estado='OFRECIDA', actualizado_en=ahora)
+            if reservadas != len(asignadas):
+                raise _Conflicto
+            por_pk = {cita.pk: cita for cita in libres}
+            ofertas = OfertaHueco.objects.bulk_create([
+                OfertaHueco(cita_liberada=por_pk[pk], espera=espera, vence_en=ahora + _plazo_oferta())
+                for pk, espera in asignadas.items()
+            ])
+    except (_Conflicto, IntegrityError):
+        # Otro proceso tomó alguna entrada u ofreció algún hueco: uno por uno
+        return [oferta for oferta in map(ofrecer_hueco, libres) if oferta]
+
+    notificaciones.notificar_varios([_aviso(oferta, oferta.cita_liberada, oferta.espera) for oferta in ofertas])
+    return ofertas
+
+
+def responder_oferta(oferta_id, paciente, aceptar):
+    """
+    Acepta (crea la cita) o rechaza una oferta pendiente del paciente.
+    Lanza ``ListaEsperaError`` si la oferta ya no está disponible.
+    """
+    ahora = timezone.now()
+    try:
+        oferta = OfertaHueco.objects.select_related('cita_liberada', 'espera').get(
+            pk=oferta_id, espera__paciente=paciente
+        )
+    except OfertaHueco.DoesNotExist:
+        raise ListaEsperaError('Oferta no encontrada')
+
+    with transaction.atomic():
+        tomada = OfertaHueco.objects.filter(
+            pk=oferta.pk, estado='PENDIENTE', vence_en__gt=ahora
+        ).update(estado='ACEPTADA' if aceptar else 'RECHAZADA')
+        if not tomada:
+            raise ListaEsperaError('La oferta ya venció o fue respondida')
+
+        ocupado = aceptar and hueco_ocupado(oferta.cita_liberada)
+        if ocupado:
+            # Otra cita tomó el turno: la oferta se da por vencida y la entrada sigue esperando
+            OfertaHueco.objects.filter(pk=oferta.pk).update(estado='VENCIDA')
+            EsperaCita.objects.filter(pk=oferta.espera_id, estado='OFRECIDA').update(
+                estado='ESPERANDO', actualizado_en=ahora
+            )
+        elif aceptar:
+            liberada = oferta.cita_liberada
+            cita = Cita.objects.create(
+                paciente=paciente,
+                medico_id=liberada.medico_id,
+                especialidad_id=liberada.especialidad_id or oferta.espera.especialidad_id,
+                fecha_hora=liberada.fecha_hora,
+                motivo='Turno asignado desde la lista de espera',
+                estado='PENDIENTE',
+            )
+            OfertaHueco.objects.filter(pk=oferta.pk).update(cita_asignada=cita)
+            EsperaCita.objects.filter(pk=oferta.espera_id).update(estado='ASIGNADA', actualizado_en=ahora)
+            return cita
+        else:
+            # Rechazada: la entrada sigue esperando otros huecos
+            EsperaCita.objects.filter(pk=oferta.espera_id, estado='OFRECIDA').update(
+                estado='ESPERANDO', actualizado_en=ahora
+            )
+
+    if ocupado:
+        raise ListaEsperaError('El turno ya fue tomado por otra cita')
+    ofrecer_hueco(oferta.cita_liberada)
+    return None
+
+
+def vencer_ofertas():
+    """Vence las ofertas sin respuesta y pasa cada hueco a la siguiente entrada."""
+    ahora = timezone.now()
+    vencidas = list(
+        OfertaHueco.objects
+        .filter(estado='PENDIENTE', vence_en__lte=ahora)
+        .select_related('cita_liberada__medico')
+    )
+    reofrecidas = 0
+    for oferta in vencidas:
+        with transaction.atomic():
+            if not OfertaHueco.objects.filter(pk=oferta.pk, estado='PENDIENTE').update(estado='VENCIDA'):
+                continue
+            EsperaCita.objects.filter(pk=oferta.espera_id, estado='OFRECIDA').update(
+                estado='ESPERANDO', actualizado_en=ahora
+            )
+        if ofrecer_hueco(oferta.cita_liberada):
+            reofrecidas += 1
+    return len(vencidas), reofrecidas
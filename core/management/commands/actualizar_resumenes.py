@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.reportes import actualizar_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Actualizar los resúmenes diarios de citas usados por los reportes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Reconstruir todos los resúmenes en lugar de solo los días modificados',
+        )
+
+    def handle(self, *args, **options):
+        dias, filas = actualizar_resumenes(completo=options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Resúmenes actualizados: {dias} días procesados, {filas} filas escritas'
+        ))
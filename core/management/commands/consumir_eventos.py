@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core import eventos
+
+
+class Command(BaseCommand):
+    help = 'Entregar por stdout (JSON por líneas) los eventos de citas pendientes de un consumidor y confirmarlos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('consumidor', help='Nombre del consumidor (su cursor se guarda en la base)')
+        parser.add_argument('--lote', type=int, default=settings.EVENTOS_LOTE, help='Eventos por lectura')
+        parser.add_argument('--sin-confirmar', action='store_true', help='Solo mostrar: no avanzar el cursor')
+        parser.add_argument('--seguir', action='store_true', help='Al vaciar la cola, esperar eventos nuevos')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre consultas con --seguir')
+
+    def handle(self, *args, **options):
+        nombre = options['consumidor']
+        total = 0
+        while True:
+            lote, mas = eventos.leer(nombre, options['lote'])
+            if lote:
+                self.stdout.write(''.join(
+                    json.dumps(evento, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n' for evento in lote
+                ), ending='')
+                self.stdout.flush()
+                total += len(lote)
+                if options['sin_confirmar']:
+                    break
+                # Solo después de escribir el lote: si el proceso muere antes, se vuelve a entregar
+                eventos.confirmar(nombre, lote[-1]['id'])
+            if mas:
+                continue
+            if not options['seguir']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stderr.write(self.style.SUCCESS(f'✓ Eventos entregados a {nombre}: {total}'))
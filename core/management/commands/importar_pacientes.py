@@ -0,0 +1,155 @@
+import csv
+import sys
+from datetime import date
+
+from django.contrib.auth.hashers import identify_hasher
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from core.models import Usuario
+from core.registro import campo_duplicado, mensaje_duplicado, normalizar_email
+
+COLUMNAS = [
+    'username', 'email', 'first_name', 'last_name',
+    'telefono', 'direccion', 'fecha_nacimiento', 'password_hash',
+]
+
+
+class Command(BaseCommand):
+    help = 'Importar pacientes desde un CSV en lotes, con reporte de errores por fila'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help=f'CSV con cabecera; columnas: {", ".join(COLUMNAS)}')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por bulk_create')
+        parser.add_argument('--reporte', help='Ruta del CSV de errores (por defecto se escribe en stderr)')
+
+    def handle(self, *args, **options):
+        self.errores = []
+        self.creados = 0
+
+        try:
+            archivo = open(options['archivo'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+
+        with archivo:
+            lector = csv.DictReader(archivo)
+            faltantes = {'username', 'email'} - set(lector.fieldnames or [])
+            if faltantes:
+                raise CommandError(f'Faltan columnas obligatorias: {", ".join(sorted(faltantes))}')
+
+            vistos_username, vistos_email = set(), set()
+            lote = []
+            for linea, fila in enumerate(lector, start=2):
+                usuario = self._construir(linea, fila, vistos_username, vistos_email)
+                if usuario is not None:
+                    lote.append((linea, usuario))
+                if len(lote) >= options['lote']:
+                    self._insertar(lote)
+                    lote = []
+            if lote:
+                self._insertar(lote)
+
+        self._escribir_reporte(options.get('reporte'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Pacientes importados: {self.creados}; filas con error: {len(self.errores)}'
+        ))
+
+    def _construir(self, linea, fila, vistos_username, vistos_email):
+        """Valida la fila y devuelve un Usuario sin guardar, o None si tiene errores."""
+        username = (fila.get('username') or '').strip()
+        email = normalizar_email(fila.get('email') or '')
+
+        try:
+            if not username:
+                raise ValidationError('username vacío')
+            Usuario.username_validator(username)
+            validate_email(email)
+            fecha = (fila.get('fecha_nacimiento') or '').strip()
+            fecha_nacimiento = date.fromisoformat(fecha) if fecha else None
+            password = (fila.get('password_hash') or '').strip()
+            if password:
+                identify_hasher(password)
+        except (ValidationError, ValueError) as e:
+            mensaje = '; '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+            self.errores.append((linea, username, mensaje))
+            return None
+
+        if username in vistos_username:
+            self.errores.append((linea, username, 'username repetido en el archivo'))
+            return None
+        if email in vistos_email:
+            self.errores.append((linea, username, 'email repetido en el archivo'))
+            return None
+        vistos_username.add(username)
+        vistos_email.add(email)
+
+        usuario = Usuario(
+            username=username,
+            email=email,
+            password=password,
+            first_name=(fila.get('first_name') or '').strip(),
+            last_name=(fila.get('last_name') or '').strip(),
+            telefono=(fila.get('telefono') or '').strip()[:15],
+            direccion=(fila.get('direccion') or '').strip(),
+            fecha_nacimiento=fecha_nacimiento,
+            rol='PACIENTE',
+        )
+        if not password:
+            # Contraseña inutilizable (distinta en cada fila, sin hashear): el
+            # paciente la define luego con el flujo de recuperación
+            usuario.set_unusable_password()
+        return usuario
+
+    def _insertar(self, lote):
+        """Descarta los ya existentes (2 consultas por lote) e inserta el resto con bulk_create."""
+        usernames = {u.username for _, u in lote}
+        emails = {u.email for _, u in lote}
+        existentes_username = set(
+            Usuario.objects.filter(username__in=usernames).values_list('username', flat=True)
+        )
+        existentes_email = set(
+            Usuario.objects.annotate(email_min=Lower('email'))
+            .filter(email_min__in=emails)
+            .values_list('email_min', flat=True)
+        )
+
+        nuevos = []
+        for linea, usuario in lote:
+            if usuario.username in existentes_username:
+                self.errores.append((linea, usuario.username, mensaje_duplicado('username')))
+            elif usuario.email in existentes_email:
+                self.errores.append((linea, usuario.username, mensaje_duplicado('email')))
+            else:
+                nuevos.append((linea, usuario))
+
+        try:
+            with transaction.atomic():
+                Usuario.objects.bulk_create([u for _, u in nuevos])
+            self.creados += len(nuevos)
+        except IntegrityError:
+            # Otro proceso insertó alguno entre la comprobación y el insert:
+            # se reintenta fila a fila para reportar exactamente cuáles fallan
+            for linea, usuario in nuevos:
+                try:
+                    with transaction.atomic():
+                        usuario.save(force_insert=True)
+                    self.creados += 1
+                except IntegrityError:
+                    campo = campo_duplicado(usuario.username, usuario.email)
+                    self.errores.append((linea, usuario.username, mensaje_duplicado(campo)))
+
+    def _escribir_reporte(self, ruta):
+        if not self.errores:
+            return
+        destino = open(ruta, 'w', newline='', encoding='utf-8') if ruta else sys.stderr
+        try:
+            escritor = csv.writer(destino)
+            escritor.writerow(['linea', 'username', 'error'])
+            escritor.writerows(sorted(self.errores))
+        finally:
+            if ruta:
+                destino.close()
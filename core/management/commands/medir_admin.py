@@ -0,0 +1,124 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from core.models import Cita, Notificacion, Recordatorio, Usuario
+
+PREFIJO = 'carga_'
+
+URLS = [
+    '/admin/core/cita/',
+    '/admin/core/cita/?p=50',
+    '/admin/core/cita/?estado__exact=PENDIENTE',
+    f'/admin/core/cita/?q={PREFIJO}p1',
+    '/admin/core/cita/add/',
+    '/admin/core/recordatorio/',
+    '/admin/core/notificacion/',
+    '/admin/core/usuario/',
+    f'/admin/core/usuario/?q={PREFIJO}m',
+    f'/admin/autocomplete/?app_label=core&model_name=cita&field_name=paciente&term={PREFIJO}p1',
+]
+
+
+class Command(BaseCommand):
+    help = 'Medir los listados del admin sobre un volumen grande de datos (opcionalmente sembrado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sembrar', type=int, default=0, help='Citas de carga a crear antes de medir')
+        parser.add_argument('--limpiar', action='store_true', help='Borrar los datos de carga y salir')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--usuario', help='Usuario staff (por defecto el primer superusuario)')
+
+    # El Client de pruebas envía Host: testserver
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            borrados, _ = Usuario.objects.filter(username__startswith=PREFIJO).delete()
+            self.stdout.write(self.style.SUCCESS(f'✓ Filas borradas: {borrados}'))
+            return
+        if options['sembrar']:
+            self._sembrar(options['sembrar'])
+
+        staff = Usuario.objects.filter(is_staff=True, is_active=True)
+        if options['usuario']:
+            staff = staff.filter(username=options['usuario'])
+        else:
+            staff = staff.filter(is_superuser=True)
+        usuario = staff.first()
+        if usuario is None:
+            raise CommandError('No hay un usuario staff con acceso al admin (crea uno con createsuperuser)')
+        client = Client()
+        client.force_login(usuario)
+
+        self.stdout.write(f'Citas: {Cita.objects.count()}; usuarios: {Usuario.objects.count()}')
+        self.stdout.write(f'{"url":<90}{"estado":>7}{"ms":>9}{"consultas":>11}')
+        for url in URLS:
+            client.get(url)
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    respuesta = client.get(url)
+                    tiempos.append(time.perf_counter() - inicio)
+                # Los tiempos de una página de error no sirven
+                if respuesta.status_code != 200:
+                    raise CommandError(f'{url}: respuesta {respuesta.status_code}')
+            self.stdout.write(
+                f'{url:<90}{respuesta.status_code:>7}{min(tiempos) * 1000:>9.1f}{len(consultas):>11}'
+            )
+
+    def _sembrar(self, total, lote=5000):
+        """Crea médicos, pacientes, citas, recordatorios y notificaciones con bulk_create."""
+        password = make_password(None)
+        n_medicos = max(1, total // 2000)
+        n_pacientes = max(1, total // 5)
+        inicio = Usuario.objects.filter(username__startswith=PREFIJO).count()
+
+        with transaction.atomic():
+            Usuario.objects.bulk_create([
+                Usuario(username=f'{PREFIJO}m{inicio + i}', email=f'{PREFIJO}m{inicio + i}@carga.local',
+                        password=password, rol='MEDICO')
+                for i in range(n_medicos)
+            ], batch_size=lote)
+            Usuario.objects.bulk_create([
+                Usuario(username=f'{PREFIJO}p{inicio + i}', email=f'{PREFIJO}p{inicio + i}@carga.local',
+                        password=password, rol='PACIENTE')
+                for i in range(n_pacientes)
+            ], batch_size=lote)
+
+        medicos = list(Usuario.objects.filter(username__startswith=f'{PREFIJO}m').values_list('pk', flat=True))
+        pacientes = list(Usuario.objects.filter(username__startswith=f'{PREFIJO}p').values_list('pk', flat=True))
+        ahora = timezone.now()
+        estados = [valor for valor, _ in Cita.ESTADOS]
+
+        creadas = 0
+        while creadas < total:
+            n = min(lote, total - creadas)
+            with transaction.atomic():
+                citas = Cita.objects.bulk_create([
+                    Cita(
+                        paciente_id=random.choice(pacientes),
+                        medico_id=random.choice(medicos),
+                        fecha_hora=ahora + timedelta(minutes=random.randint(-525600, 525600)),
+                        motivo='Carga',
+                        estado=random.choice(estados),
+                    )
+                    for _ in range(n)
+                ])
+                Recordatorio.objects.bulk_create([
+                    Recordatorio(cita=cita, fecha_envio=cita.fecha_hora - timedelta(days=1), mensaje='Carga')
+                    for cita in citas
+                ])
+                Notificacion.objects.bulk_create([
+                    Notificacion(usuario_id=cita.paciente_id, titulo='Carga', mensaje='Carga')
+                    for cita in citas
+                ])
+            creadas += n
+            self.stdout.write(f'  sembradas {creadas}/{total}')
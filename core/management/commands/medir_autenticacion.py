@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+MIDDLEWARE_DJANGO = [
+    'django.contrib.auth.middleware.AuthenticationMiddleware'
+    if m == 'core.autenticacion.AutenticacionCacheadaMiddleware' else m
+    for m in settings.MIDDLEWARE
+]
+
+
+class Command(BaseCommand):
+    help = 'Medir la latencia del login por hasher y el coste de autenticación por petición'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intentos', type=int, default=5, help='Verificaciones de contraseña por hasher')
+        parser.add_argument('--peticiones', type=int, default=300)
+        parser.add_argument('--usuario', default='carlos')
+        parser.add_argument('--password', default='paciente123')
+        parser.add_argument('--url', default='/paciente/historial/')
+
+    # El Client de pruebas envía Host: testserver
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        self.stdout.write('Login (verificación de contraseña):')
+        for perfil, ruta in settings.HASHERS_POR_PERFIL.items():
+            algoritmo = ruta.rsplit('.', 1)[-1]
+            try:
+                with override_settings(PASSWORD_HASHERS=[ruta]):
+                    hasher = get_hasher('default')
+                    codificada = make_password(options['password'], hasher=hasher)
+                    inicio = time.perf_counter()
+                    for _ in range(options['intentos']):
+                        check_password(options['password'], codificada)
+                    ms = (time.perf_counter() - inicio) * 1000 / options['intentos']
+            except ValueError as e:
+                self.stdout.write(f'  {perfil:<8} {algoritmo:<32} no disponible ({e})')
+                continue
+            self.stdout.write(f'  {perfil:<8} {algoritmo:<32} {ms:>8.1f} ms')
+
+        self.stdout.write('')
+        self.stdout.write('Autenticación por petición:')
+        for nombre, middleware in [('Django', MIDDLEWARE_DJANGO), ('cacheada', settings.MIDDLEWARE)]:
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                if not client.login(username=options['usuario'], password=options['password']):
+                    raise CommandError('No se pudo iniciar sesión con el usuario indicado')
+                self._comprobar(client.get(options['url']), options['url'])
+
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    for _ in range(options['peticiones']):
+                        self._comprobar(client.get(options['url']), options['url'])
+                    total = time.perf_counter() - inicio
+
+            de_usuario = sum(1 for q in consultas.captured_queries if 'FROM "usuarios"' in q['sql'])
+            self.stdout.write(
+                f'  {nombre:<10}{total * 1000 / options["peticiones"]:>8.2f} ms/petición'
+                f'{de_usuario / options["peticiones"]:>8.2f} consultas a usuarios/petición'
+            )
+
+    def _comprobar(self, respuesta, url):
+        # Una página de error no pasa por la autenticación que se quiere medir
+        if respuesta.status_code != 200:
+            raise CommandError(f'{url}: respuesta {respuesta.status_code}')
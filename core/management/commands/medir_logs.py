@@ -0,0 +1,104 @@
+import logging
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.bitacora import FiltroContexto, FiltroMuestreo, FormatoJSON, ManejadorCola, peticion_actual
+
+NOMBRE_LOGGER = 'core.medicion_logs'
+LATENCIA_DISCO_LENTO = 0.0002  # segundos por escritura (disco o tubería saturados)
+
+
+class ArchivoLento(logging.FileHandler):
+    def emit(self, record):
+        time.sleep(LATENCIA_DISCO_LENTO)
+        super().emit(record)
+
+
+class ColaLenta(ManejadorCola):
+    def _destino(self):
+        destino = ArchivoLento(self.archivo, encoding='utf-8')
+        destino.setFormatter(FormatoJSON())
+        return destino
+
+
+def _sincrono(archivo, clase=logging.FileHandler):
+    manejador = clase(archivo, encoding='utf-8')
+    manejador.setFormatter(FormatoJSON())
+    manejador.addFilter(FiltroContexto())
+    return manejador
+
+
+def _cola(archivo, tasa=None, clase=ManejadorCola):
+    manejador = clase(archivo=archivo, capacidad=1_000_000)
+    if tasa is not None:
+        manejador.addFilter(FiltroMuestreo({NOMBRE_LOGGER: tasa}))
+    manejador.addFilter(FiltroContexto())
+    return manejador
+
+
+PERFILES = [
+    ('síncrono (FileHandler + JSON)', _sincrono),
+    ('cola (ManejadorCola)', _cola),
+    ('cola + muestreo 10%', lambda archivo: _cola(archivo, 0.1)),
+    ('síncrono, disco lento', lambda archivo: _sincrono(archivo, ArchivoLento)),
+    ('cola, disco lento', lambda archivo: _cola(archivo, clase=ColaLenta)),
+]
+
+
+class Command(BaseCommand):
+    help = 'Medir el costo de registrar logs en el hilo de la petición con cada configuración'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registros', type=int, default=5000)
+        parser.add_argument('--por-peticion', type=int, default=3,
+                            help='Registros por petición simulada (vista + línea de petición)')
+
+    def handle(self, *args, **options):
+        n = options['registros']
+        por_peticion = options['por_peticion']
+        logger = logging.getLogger(NOMBRE_LOGGER)
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        peticion_actual.set({'request_id': 'medicion', 'usuario_id': 1, 'vista': 'medir_logs'})
+
+        self.stdout.write(f'{"perfil":<34}{"µs/registro":>14}{"µs/petición":>14}{"vaciado ms":>12}')
+        with tempfile.TemporaryDirectory() as carpeta:
+            for nombre, fabrica in PERFILES:
+                manejador = fabrica(os.path.join(carpeta, 'medicion.log'))
+                logger.handlers = [manejador]
+                logger.info('calentamiento %s', 0)
+
+                inicio = time.perf_counter()
+                for i in range(n):
+                    logger.info('Cita %s cambió de %s a %s por %s', i, 'PENDIENTE', 'CONFIRMADA', 'drjuan')
+                en_peticion = time.perf_counter() - inicio
+
+                # Lo que queda en la cola se escribe en segundo plano
+                inicio = time.perf_counter()
+                manejador.close()
+                vaciado = time.perf_counter() - inicio
+
+                por_registro = en_peticion / n * 1e6
+                self.stdout.write(
+                    f'{nombre:<34}{por_registro:>14.2f}{por_registro * por_peticion:>14.2f}{vaciado * 1000:>12.1f}'
+                )
+
+            # Argumentos perezosos frente a f-strings con el nivel desactivado
+            logger.handlers = []
+            logger.setLevel(logging.WARNING)
+            usuario = 'drjuan'
+            inicio = time.perf_counter()
+            for i in range(n):
+                logger.info(f'Cita {i} cambió de PENDIENTE a CONFIRMADA por {usuario}')
+            con_fstring = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            for i in range(n):
+                logger.info('Cita %s cambió de %s a %s por %s', i, 'PENDIENTE', 'CONFIRMADA', usuario)
+            perezoso = time.perf_counter() - inicio
+            self.stdout.write(
+                f'INFO desactivado: f-string {con_fstring / n * 1e6:.3f} µs, '
+                f'argumentos % {perezoso / n * 1e6:.3f} µs por llamada'
+            )
@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core import views
+from core.models import Usuario
+
+# Antes: plantillas leídas y compiladas en cada petición, sin caché de fragmentos
+ANTES = {
+    'loaders': [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ],
+    'cache': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Después: loader con caché (como en config/settings_produccion.py) y fragmentos cacheados
+DESPUES = {
+    'loaders': [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+    'cache': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+class Command(BaseCommand):
+    help = 'Medir el tiempo de render de los dashboards con y sin caché de plantillas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=200)
+        parser.add_argument('--paciente', default='carlos')
+        parser.add_argument('--medico', default='drjuan')
+
+    def handle(self, *args, **options):
+        try:
+            paciente = Usuario.objects.get(username=options['paciente'], rol='PACIENTE')
+            medico = Usuario.objects.get(username=options['medico'], rol='MEDICO')
+        except Usuario.DoesNotExist:
+            raise CommandError('No existen los usuarios indicados (ejecuta poblar_datos)')
+
+        paginas = [
+            ('paciente_dashboard', views.paciente_dashboard, paciente),
+            ('medico_dashboard', views.medico_dashboard, medico),
+            ('medico_mis_citas', views.medico_mis_citas, medico),
+        ]
+        n = options['iteraciones']
+
+        self.stdout.write(f'{"vista":<22}{"antes ms":>10}{"después ms":>12}{"consultas":>14}')
+        for nombre, vista, usuario in paginas:
+            antes = self._medir(vista, usuario, n, ANTES)
+            despues = self._medir(vista, usuario, n, DESPUES)
+            self.stdout.write(
+                f'{nombre:<22}{antes[0]:>10.2f}{despues[0]:>12.2f}'
+                f'{antes[1]:>8} -> {despues[1]}'
+            )
+
+    def _medir(self, vista, usuario, n, perfil):
+        """Devuelve (ms promedio por petición, consultas en la última petición)."""
+        templates = [{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [settings.BASE_DIR / 'templates'],
+            'OPTIONS': {
+                'loaders': perfil['loaders'],
+                'context_processors': [
+                    'django.template.context_processors.request',
+                    'django.contrib.auth.context_processors.auth',
+                    'django.contrib.messages.context_processors.messages',
+                ],
+            },
+        }]
+        caches = {'default': {'BACKEND': perfil['cache']}}
+        factory = RequestFactory()
+
+        with override_settings(TEMPLATES=templates, CACHES=caches):
+            # Primera petición fuera de la medición (compila y llena la caché)
+            vista(self._request(factory, usuario))
+            inicio = time.perf_counter()
+            for _ in range(n):
+                vista(self._request(factory, usuario))
+            total = time.perf_counter() - inicio
+            with CaptureQueriesContext(connection) as consultas:
+                vista(self._request(factory, usuario))
+        return total * 1000 / n, len(consultas)
+
+    def _request(self, factory, usuario):
+        request = factory.get('/')
+        request.user = usuario
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
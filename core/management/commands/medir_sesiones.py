@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+MIDDLEWARE_SIN_RENOVACION = [
+    m for m in settings.MIDDLEWARE if m != 'core.middleware.RenovarSesionMiddleware'
+]
+
+PERFILES = [
+    ('antes (db, guardar siempre)', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+        'MIDDLEWARE': MIDDLEWARE_SIN_RENOVACION,
+    }),
+    ('después (cached_db, renovar)', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+        'MIDDLEWARE': settings.MIDDLEWARE,
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = 'Medir peticiones por segundo con la configuración de sesiones anterior y la nueva'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=300)
+        parser.add_argument('--usuario', default='carlos')
+        parser.add_argument('--password', default='paciente123')
+        parser.add_argument('--url', default='/paciente/historial/')
+
+    # El Client de pruebas envía Host: testserver
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        n = options['peticiones']
+        self.stdout.write(f'{"perfil":<32}{"req/s":>10}{"escrituras sesión":>20}')
+        for nombre, ajustes in PERFILES:
+            with override_settings(**ajustes):
+                client = Client()
+                if not client.login(username=options['usuario'], password=options['password']):
+                    raise CommandError('No se pudo iniciar sesión con el usuario indicado')
+                self._comprobar(client.get(options['url']), options['url'])
+
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    for _ in range(n):
+                        self._comprobar(client.get(options['url']), options['url'])
+                    total = time.perf_counter() - inicio
+
+            escrituras = sum(
+                1 for q in consultas.captured_queries
+                if q['sql'].startswith(('UPDATE "django_session"', 'INSERT INTO "django_session"'))
+            )
+            self.stdout.write(f'{nombre:<32}{n / total:>10.1f}{escrituras:>20}')
+
+    def _comprobar(self, respuesta, url):
+        # Medir una página de error no dice nada de las sesiones
+        if respuesta.status_code not in (200, 302):
+            raise CommandError(f'{url}: respuesta {respuesta.status_code}')
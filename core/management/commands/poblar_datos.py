@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
-from core.models import Rol, Especialidad, Usuario
+from datetime import time
+
+from core.models import Rol, Especialidad, Franja, Usuario
 
 class Command(BaseCommand):
     help = 'Poblar datos iniciales del sistema'
@@ -71,6 +73,18 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.WARNING(f'- Usuario ya existe: {username}'))
         
+        # Horario de lunes a viernes (08:00-13:00) y especialidades de los médicos de prueba
+        especialidades = list(Especialidad.objects.filter(activo=True).order_by('id')[:2])
+        for i, medico in enumerate(Usuario.objects.filter(username__in=['drjuan', 'dramaria'])):
+            if not medico.franjas.exists():
+                Franja.objects.bulk_create([
+                    Franja(medico=medico, dia=dia, hora_inicio=time(8), hora_fin=time(13))
+                    for dia in ['MON', 'TUE', 'WED', 'THU', 'FRI']
+                ])
+                self.stdout.write(self.style.SUCCESS(f'✓ Horario creado: {medico.username}'))
+            if especialidades and not medico.especialidades.exists():
+                medico.especialidades.add(especialidades[i % len(especialidades)])
+
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('='*50))
         self.stdout.write(self.style.SUCCESS('Datos poblados correctamente'))
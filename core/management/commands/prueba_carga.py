@@ -0,0 +1,352 @@
+"""
+Prueba de carga con recorridos de pacientes y médicos contra un servidor real.
+
+Cada llegada (proceso de Poisson a ``--tasa`` recorridos por segundo) es un
+usuario virtual con su propia conexión y sus cookies: pide la página de login
+para obtener ``csrftoken``, inicia sesión y sigue su recorrido enviando el
+token en ``X-CSRFToken`` como hace el JavaScript de las páginas. Las páginas
+con ETag se vuelven a pedir con ``If-None-Match``, como un navegador.
+
+Sin ``--url`` se arranca ``runserver`` en un puerto libre con
+LIMITES_CONFIAR_PROXY=1, y cada usuario virtual envía su propia IP en
+X-Forwarded-For para que los límites por IP se apliquen como con clientes
+reales. Los usuarios de carga (prefijo ``carga_``) se borran con
+``manage.py medir_admin --limpiar``.
+"""
+import asyncio
+import itertools
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Usuario
+
+PREFIJO = 'carga_'
+CONTRASENA = 'carga12345'
+FILA_CITA = re.compile(r'data-estado="(?P<estado>[A-Z]+)" data-id="(?P<id>\d+)"')
+
+
+class ErrorHTTP(Exception):
+    pass
+
+
+class Cliente:
+    """Cliente HTTP/1.1 mínimo con keep-alive y cookies, sobre asyncio."""
+
+    def __init__(self, host, puerto, ip):
+        self.host = host
+        self.puerto = puerto
+        self.ip = ip
+        self.cookies = {}
+        self.etags = {}
+        self._lector = self._escritor = None
+
+    async def _conectar(self):
+        self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            try:
+                await self._escritor.wait_closed()
+            except OSError:
+                pass
+            self._escritor = None
+
+    async def peticion(self, metodo, ruta, datos=None, ajax=False):
+        cabeceras = {
+            'Host': f'{self.host}:{self.puerto}',
+            'Connection': 'keep-alive',
+            'X-Forwarded-For': self.ip,
+            'User-Agent': 'miposta-prueba-carga',
+        }
+        if self.cookies:
+            cabeceras['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if metodo == 'POST':
+            cabeceras['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        if ajax:
+            cabeceras['X-Requested-With'] = 'XMLHttpRequest'
+        if metodo == 'GET' and ruta in self.etags:
+            cabeceras['If-None-Match'] = self.etags[ruta]
+        cuerpo = b''
+        if datos is not None:
+            cuerpo = urlencode(datos).encode()
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        cabeceras['Content-Length'] = str(len(cuerpo))
+        crudo = f'{metodo} {ruta} HTTP/1.1\r\n'.encode() + b''.join(
+            f'{k}: {v}\r\n'.encode('latin-1') for k, v in cabeceras.items()
+        ) + b'\r\n' + cuerpo
+
+        for intento in range(2):
+            if self._escritor is None:
+                await self._conectar()
+            try:
+                self._escritor.write(crudo)
+                await self._escritor.drain()
+                return await self._leer_respuesta(ruta)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # El servidor cerró la conexión reutilizada: se reintenta una vez
+                await self.cerrar()
+                if intento:
+                    raise
+
+    async def _leer_respuesta(self, ruta):
+        linea = await self._lector.readuntil(b'\r\n')
+        estado = int(linea.split()[1])
+        cabeceras = defaultdict(list)
+        while True:
+            linea = await self._lector.readuntil(b'\r\n')
+            if linea == b'\r\n':
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()].append(valor.strip())
+
+        if 'content-length' in cabeceras:
+            cuerpo = await self._lector.readexactly(int(cabeceras['content-length'][0]))
+        elif estado in (204, 304):
+            cuerpo = b''
+        else:
+            cuerpo = await self._lector.read()
+            await self.cerrar()
+
+        for cookie in cabeceras.get('set-cookie', []):
+            nombre, _, valor = cookie.split(';', 1)[0].partition('=')
+            if valor in ('', '""'):
+                self.cookies.pop(nombre, None)
+            else:
+                self.cookies[nombre] = valor
+        if 'etag' in cabeceras:
+            self.etags[ruta] = cabeceras['etag'][0]
+        if 'close' in cabeceras.get('connection', []):
+            await self.cerrar()
+        return estado, cuerpo
+
+
+class Estadisticas:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.estados = defaultdict(lambda: defaultdict(int))
+        self.fallos = defaultdict(int)
+        self.recorridos = defaultdict(int)
+
+    def registrar(self, paso, estado, segundos):
+        self.latencias[paso].append(segundos)
+        self.estados[paso][estado] += 1
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga con recorridos de pacientes y médicos (cliente HTTP asíncrono)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Servidor ya levantado (por defecto se arranca runserver)')
+        parser.add_argument('--duracion', type=float, default=30, help='Segundos generando llegadas')
+        parser.add_argument('--tasa', type=float, default=5, help='Recorridos nuevos por segundo')
+        parser.add_argument('--mezcla', type=float, default=0.8, help='Fracción de recorridos de pacientes')
+        parser.add_argument('--max-concurrentes', type=int, default=200)
+        parser.add_argument('--pacientes', type=int, default=200, help='Pacientes de carga a usar (se crean)')
+        parser.add_argument('--medicos', type=int, default=20, help='Médicos de carga a usar (se crean)')
+        parser.add_argument('--semilla', type=int)
+
+    def handle(self, *args, **options):
+        if options['semilla'] is not None:
+            random.seed(options['semilla'])
+        pacientes, medicos = self._usuarios(options['pacientes'], options['medicos'])
+
+        servidor = None
+        url = options['url']
+        if not url:
+            servidor, url = self._arrancar_servidor()
+        partes = urlsplit(url)
+        try:
+            estadisticas, total = asyncio.run(
+                self._ejecutar(partes.hostname, partes.port or 80, pacientes, medicos, options)
+            )
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.wait(10)
+        self._informe(estadisticas, total)
+
+    # --- preparación ---
+
+    def _usuarios(self, n_pacientes, n_medicos):
+        """Usuarios de carga con contraseña conocida (reutiliza los existentes)."""
+        password = make_password(CONTRASENA)
+        nuevos = [
+            Usuario(username=f'{PREFIJO}lp{i}', email=f'{PREFIJO}lp{i}@carga.local', password=password,
+                    rol='PACIENTE', first_name='Carga')
+            for i in range(n_pacientes)
+        ] + [
+            Usuario(username=f'{PREFIJO}lm{i}', email=f'{PREFIJO}lm{i}@carga.local', password=password,
+                    rol='MEDICO', first_name='Carga')
+            for i in range(n_medicos)
+        ]
+        Usuario.objects.bulk_create(nuevos, ignore_conflicts=True)
+        pacientes = list(Usuario.objects.filter(username__startswith=f'{PREFIJO}lp').values_list('username', flat=True))
+        medicos = list(Usuario.objects.filter(username__startswith=f'{PREFIJO}lm').values_list('pk', 'username'))
+        return pacientes[:n_pacientes], medicos[:n_medicos]
+
+    def _arrancar_servidor(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            puerto = s.getsockname()[1]
+        entorno = dict(os.environ, LIMITES_CONFIAR_PROXY='1')
+        servidor = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', '--noreload', f'127.0.0.1:{puerto}'],
+            env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if servidor.poll() is not None:
+                raise CommandError('El servidor de pruebas terminó al arrancar')
+            try:
+                socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+                return servidor, f'http://127.0.0.1:{puerto}'
+            except OSError:
+                time.sleep(0.2)
+        servidor.terminate()
+        raise CommandError('El servidor de pruebas no respondió a tiempo')
+
+    # --- recorridos ---
+
+    async def _paso(self, estadisticas, cliente, paso, metodo, ruta, datos=None, ajax=False, esperados=(200,)):
+        inicio = time.perf_counter()
+        try:
+            estado, cuerpo = await cliente.peticion(metodo, ruta, datos, ajax)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            estadisticas.registrar(paso, 'conexión', time.perf_counter() - inicio)
+            raise ErrorHTTP(paso)
+        estadisticas.registrar(paso, estado, time.perf_counter() - inicio)
+        if estado not in esperados and estado != 304:
+            raise ErrorHTTP(paso)
+        return cuerpo
+
+    async def _iniciar_sesion(self, estadisticas, cliente, tipo, username):
+        await self._paso(estadisticas, cliente, f'{tipo}:login (GET)', 'GET', '/login/')
+        await self._paso(
+            estadisticas, cliente, f'{tipo}:login (POST)', 'POST', '/login/',
+            {'username': username, 'password': CONTRASENA}, esperados=(302,),
+        )
+
+    async def _recorrido_paciente(self, estadisticas, cliente, username, medicos):
+        await self._iniciar_sesion(estadisticas, cliente, 'paciente', username)
+        await self._paso(estadisticas, cliente, 'paciente:dashboard', 'GET', '/dashboard/paciente/')
+        fecha = timezone.localtime() + timedelta(days=random.randint(1, 60))
+        fecha = fecha.replace(hour=random.randint(8, 12), minute=random.choice((0, 30)))
+        await self._paso(
+            estadisticas, cliente, 'paciente:crear_cita', 'POST', '/citas/crear/',
+            {'medico': random.choice(medicos)[0], 'fecha_hora': fecha.strftime('%Y-%m-%dT%H:%M'),
+             'motivo': 'Prueba de carga'},
+            esperados=(302,),
+        )
+        # El navegador sigue la redirección y ve el mensaje de confirmación
+        await self._paso(estadisticas, cliente, 'paciente:dashboard', 'GET', '/dashboard/paciente/')
+        await self._paso(estadisticas, cliente, 'paciente:mis_citas', 'GET', '/paciente/citas/')
+        await self._paso(estadisticas, cliente, 'paciente:mis_citas (otra vez)', 'GET', '/paciente/citas/')
+
+    async def _recorrido_medico(self, estadisticas, cliente, username):
+        await self._iniciar_sesion(estadisticas, cliente, 'medico', username)
+        await self._paso(estadisticas, cliente, 'medico:dashboard', 'GET', '/dashboard/medico/')
+        cuerpo = await self._paso(estadisticas, cliente, 'medico:mis_citas', 'GET', '/medico/citas/')
+        filas = FILA_CITA.findall(cuerpo.decode('utf-8', 'replace'))
+        pendientes = [pk for estado, pk in filas if estado == 'PENDIENTE']
+        confirmadas = [pk for estado, pk in filas if estado == 'CONFIRMADA']
+        if pendientes:
+            await self._paso(
+                estadisticas, cliente, 'medico:confirmar', 'POST',
+                f'/medico/citas/{random.choice(pendientes)}/confirmar/', {}, ajax=True,
+            )
+        if confirmadas:
+            await self._paso(
+                estadisticas, cliente, 'medico:completar', 'POST',
+                f'/medico/citas/{random.choice(confirmadas)}/completar/', {}, ajax=True,
+            )
+
+    async def _usuario_virtual(self, estadisticas, semaforo, host, puerto, tipo, usuario, medicos, ip):
+        async with semaforo:
+            cliente = Cliente(host, puerto, ip)
+            try:
+                if tipo == 'paciente':
+                    await self._recorrido_paciente(estadisticas, cliente, usuario, medicos)
+                else:
+                    await self._recorrido_medico(estadisticas, cliente, usuario[1])
+                estadisticas.recorridos[f'{tipo} completo'] += 1
+            except ErrorHTTP as e:
+                estadisticas.fallos[str(e)] += 1
+                estadisticas.recorridos[f'{tipo} fallido'] += 1
+            finally:
+                await cliente.cerrar()
+
+    async def _ejecutar(self, host, puerto, pacientes, medicos, options):
+        estadisticas = Estadisticas()
+        semaforo = asyncio.Semaphore(options['max_concurrentes'])
+        siguiente_paciente = itertools.cycle(pacientes)
+        siguiente_medico = itertools.cycle(medicos)
+        ips = (f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}' for i in itertools.count(1))
+
+        tareas = []
+        inicio = time.perf_counter()
+        fin = inicio + options['duracion']
+        while time.perf_counter() < fin:
+            if random.random() < options['mezcla']:
+                tipo, usuario = 'paciente', next(siguiente_paciente)
+            else:
+                tipo, usuario = 'medico', next(siguiente_medico)
+            tareas.append(asyncio.create_task(self._usuario_virtual(
+                estadisticas, semaforo, host, puerto, tipo, usuario, medicos, next(ips)
+            )))
+            await asyncio.sleep(random.expovariate(options['tasa']))
+        await asyncio.gather(*tareas)
+        return estadisticas, time.perf_counter() - inicio
+
+    # --- informe ---
+
+    def _informe(self, estadisticas, total):
+        peticiones = sum(len(v) for v in estadisticas.latencias.values())
+        self.stdout.write(f'\n{"paso":<32}{"n":>7}{"error %":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}  estados')
+        for paso, latencias in estadisticas.latencias.items():
+            estados = estadisticas.estados[paso]
+            errores = sum(n for estado, n in estados.items() if not isinstance(estado, int) or estado >= 400)
+            self.stdout.write(
+                f'{paso:<32}{len(latencias):>7}{errores / len(latencias) * 100:>9.1f}'
+                f'{_percentil(latencias, 50) * 1000:>9.1f}{_percentil(latencias, 95) * 1000:>9.1f}'
+                f'{_percentil(latencias, 99) * 1000:>9.1f}  '
+                + ', '.join(f'{estado}: {n}' for estado, n in sorted(estados.items(), key=str))
+            )
+
+        errores = sum(
+            n for estados in estadisticas.estados.values()
+            for estado, n in estados.items() if not isinstance(estado, int) or estado >= 400
+        )
+        todas = [x for v in estadisticas.latencias.values() for x in v]
+        self.stdout.write('')
+        self.stdout.write(f'Duración: {total:.1f} s; peticiones: {peticiones} ({peticiones / total:.1f} req/s)')
+        self.stdout.write(
+            'Recorridos: ' + ', '.join(f'{k}: {v}' for k, v in sorted(estadisticas.recorridos.items()))
+        )
+        if todas:
+            self.stdout.write(
+                f'Errores: {errores / peticiones * 100:.2f} %; latencia global p50 {_percentil(todas, 50) * 1000:.1f} ms, '
+                f'p95 {_percentil(todas, 95) * 1000:.1f} ms, p99 {_percentil(todas, 99) * 1000:.1f} ms'
+            )
+        if estadisticas.fallos:
+            self.stdout.write(self.style.WARNING(
+                'Recorridos cortados en: ' + ', '.join(f'{k} ({v})' for k, v in estadisticas.fallos.items())
+            ))
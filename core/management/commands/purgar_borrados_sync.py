@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import BorradoSync, SecuenciaSync
+
+
+class Command(BaseCommand):
+    help = 'Eliminar en lotes las lápidas de sincronización más antiguas que la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.SYNC_RETENCION_BORRADOS_DIAS,
+            help='Días que se guardan las lápidas (SYNC_RETENCION_BORRADOS_DIAS por defecto)',
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Lápidas eliminadas por transacción')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        total = 0
+        while True:
+            with transaction.atomic():
+                lote = list(
+                    BorradoSync.objects
+                    .filter(borrado_en__lt=limite)
+                    .order_by('borrado_en')
+                    .values_list('pk', 'version')[:options['lote']]
+                )
+                if not lote:
+                    break
+                # Antes de borrar: un cursor anterior a estas versiones ya no puede ponerse al día
+                hasta = max(version for _, version in lote)
+                SecuenciaSync.objects.filter(pk=1, purgado_hasta__lt=hasta).update(purgado_hasta=hasta)
+                total += BorradoSync.objects.filter(pk__in=[pk for pk, _ in lote]).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Lápidas eliminadas: {total}'))
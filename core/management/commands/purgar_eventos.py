@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ConsumidorEventos, EventoCita
+
+
+class Command(BaseCommand):
+    help = 'Eliminar en lotes los eventos de citas más antiguos que la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.EVENTOS_RETENCION_DIAS,
+            help='Días que se guardan los eventos (EVENTOS_RETENCION_DIAS por defecto)',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Eventos eliminados por transacción')
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        # Los ids crecen con creado_en: basta con el último id anterior al límite
+        hasta = (
+            EventoCita.objects.filter(creado_en__lt=limite)
+            .order_by('-id').values_list('id', flat=True).first()
+        )
+        if hasta is None:
+            self.stdout.write(self.style.SUCCESS('✓ Eventos eliminados: 0'))
+            return
+
+        for nombre, ultimo_id in ConsumidorEventos.objects.filter(ultimo_id__lt=hasta).values_list('nombre', 'ultimo_id'):
+            self.stdout.write(self.style.WARNING(
+                f'{nombre} va en #{ultimo_id}: se eliminan eventos que no confirmó (hasta #{hasta})'
+            ))
+
+        total = 0
+        while True:
+            ids = list(
+                EventoCita.objects.filter(id__lte=hasta)
+                .order_by('id').values_list('id', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            total += EventoCita.objects.filter(id__gte=ids[0], id__lte=ids[-1]).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Eventos eliminados: {total}'))
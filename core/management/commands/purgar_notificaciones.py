@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import notificaciones
+
+
+class Command(BaseCommand):
+    help = 'Compactar las notificaciones leídas antiguas y eliminar las que superan la retención, en lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.NOTIFICACIONES_RETENCION_DIAS,
+            help='Días que se guardan las notificaciones (NOTIFICACIONES_RETENCION_DIAS por defecto)',
+        )
+        parser.add_argument(
+            '--dias-compactar', type=int, default=settings.NOTIFICACIONES_COMPACTAR_DIAS,
+            help='Antigüedad desde la que se juntan las leídas (NOTIFICACIONES_COMPACTAR_DIAS por defecto)',
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Usuarios o notificaciones por transacción')
+
+    def handle(self, *args, **options):
+        ahora = timezone.now()
+        purgadas = notificaciones.purgar(ahora - timedelta(days=options['dias']), options['lote'])
+        compactadas = notificaciones.compactar_leidas(
+            ahora - timedelta(days=options['dias_compactar']), options['lote']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Notificaciones eliminadas: {purgadas} por antigüedad, {compactadas} al compactar leídas'
+        ))
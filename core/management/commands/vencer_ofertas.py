@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.lista_espera import vencer_ofertas
+
+
+class Command(BaseCommand):
+    help = 'Vencer las ofertas de huecos sin respuesta y ofrecerlos a la siguiente entrada de la lista de espera (ejecutar cada minuto)'
+
+    def handle(self, *args, **options):
+        vencidas, reofrecidas = vencer_ofertas()
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Ofertas vencidas: {vencidas}; huecos ofrecidos de nuevo: {reofrecidas}'
+        ))
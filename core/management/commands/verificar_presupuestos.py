@@ -0,0 +1,308 @@
+"""
+Comprueba los presupuestos de consultas de las vistas (core/presupuestos.py).
+
+Crea sus propios usuarios y datos dentro de una transacción que se deshace al
+final, mide cada caso con pocos datos y otra vez con muchos, y falla si una
+vista no declara presupuesto, si lo supera o si sus consultas crecen con los
+datos (un N+1). Los POST se miden dentro de un savepoint que se deshace, así
+cada caso parte del mismo estado.
+
+Nada sale de la transacción: la auditoría de accesos (que escribe desde su
+propio hilo y conexión) se apaga durante la medición, y la caché es una
+LocMemCache propia, para no vaciar la compartida (límites, contadores).
+"""
+import random
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from core.models import (
+    Cita, Especialidad, EsperaCita, Franja, Notificacion, OfertaHueco, Recordatorio, SecuenciaSync, SerieCitas,
+    Usuario,
+)
+from core.calendario import token_de
+from core.presupuestos import ContadorConsultas, presupuesto_de
+from core.sincronizacion import codificar_cursor
+
+PREFIJO = 'presupuesto_'
+# Las primeras citas de cada siembra recorren ayer/hoy/mañana, los estados y
+# los dos tipos de paciente (mcm 12, dos vueltas): así ninguna lista queda
+# vacía con pocos datos, porque Django se salta los prefetch de listas vacías
+# y las consultas no serían comparables.
+POCOS = 24
+CLAVE = 'presupuesto123'
+CACHES_MEDICION = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'verificar_presupuestos',
+    }
+}
+
+# (nombre de la URL, rol del cliente, método, kwargs de la URL, datos del POST)
+# Los valores callables reciben el diccionario de objetos sembrados. El rol
+# 'integracion' es un cliente sin sesión con el token de consumidor de eventos.
+CASOS = [
+    ('index', None, 'GET', {}, None),
+    ('login', None, 'GET', {}, None),
+    ('login', None, 'POST', {}, {'username': f'{PREFIJO}paciente', 'password': CLAVE}),
+    ('registro', None, 'GET', {}, None),
+    ('registro', None, 'POST', {}, {
+        'username': f'{PREFIJO}nuevo', 'first_name': 'Nuevo', 'email': 'presupuesto.nuevo@example.com',
+        'password': CLAVE, 'password_confirm': CLAVE,
+    }),
+    ('metricas', 'admin', 'GET', {}, None),
+    ('logout', 'paciente', 'GET', {}, None),
+    ('admin_dashboard', 'admin', 'GET', {}, None),
+    ('admin_usuarios', 'admin', 'GET', {}, None),
+    ('admin_citas', 'admin', 'GET', {}, None),
+    ('admin_especialidades', 'admin', 'GET', {}, None),
+    ('admin_reportes', 'admin', 'GET', {}, None),
+    ('monitoreo_limites', 'admin', 'GET', {}, None),
+    ('paciente_dashboard', 'paciente', 'GET', {}, None),
+    ('paciente_citas', 'paciente', 'GET', {}, None),
+    ('historial_medico', 'paciente', 'GET', {}, None),
+    ('perfil_paciente', 'paciente', 'GET', {}, None),
+    ('perfil_paciente', 'paciente', 'POST', {}, {'first_name': 'Paciente', 'email': 'presupuesto@example.com'}),
+    ('paciente_primeros_turnos', 'paciente', 'GET', {}, lambda o: {'especialidad': o['especialidad'].pk}),
+    ('crear_cita', 'paciente', 'POST', {}, lambda o: {
+        'medico': o['medico'].pk, 'especialidad': o['especialidad'].pk,
+        'fecha_hora': (timezone.localtime() + timedelta(days=90)).strftime('%Y-%m-%dT10:00'), 'motivo': 'Control',
+    }),
+    ('paciente_unirse_espera', 'paciente', 'POST', {}, lambda o: {
+        'medico': o['medico'].pk,
+        'desde': (timezone.localdate() + timedelta(days=1)).isoformat(),
+        'hasta': (timezone.localdate() + timedelta(days=20)).isoformat(),
+    }),
+    ('paciente_retirar_espera', 'paciente', 'POST', lambda o: {'pk': o['espera'].pk}, {}),
+    ('paciente_responder_oferta', 'paciente', 'POST', lambda o: {'pk': o['oferta'].pk}, {'aceptar': '1'}),
+    ('marcar_notificaciones_leidas', 'paciente', 'POST', {}, {}),
+    ('medico_dashboard', 'medico', 'GET', {}, None),
+    ('medico_mis_citas', 'medico', 'GET', {}, None),
+    ('medico_mis_pacientes', 'medico', 'GET', {}, None),
+    ('medico_horario', 'medico', 'GET', {}, None),
+    ('medico_perfil', 'medico', 'POST', {}, {'first_name': 'Medico', 'email': 'presupuesto@example.com'}),
+    ('medico_agregar_franja', 'medico', 'POST', {}, {'dia': 'SAT', 'hora_inicio': '09:00', 'hora_fin': '11:00'}),
+    ('medico_paciente_detail', 'medico', 'GET', lambda o: {'pk': o['paciente'].pk}, None),
+    ('medico_paciente_historial', 'medico', 'GET', lambda o: {'pk': o['paciente'].pk}, None),
+    ('medico_agendar', 'medico', 'GET', lambda o: {'pk': o['paciente'].pk}, None),
+    ('medico_agendar', 'medico', 'POST', lambda o: {'pk': o['paciente'].pk}, {
+        'fecha_hora': (timezone.localtime() + timedelta(days=60)).strftime('%Y-%m-%dT11:00'),
+        'repetir': 'SEMANAL', 'repeticiones': '8', 'motivo': 'Serie medida',
+    }),
+    ('medico_cita_detail', 'medico', 'GET', lambda o: {'pk': o['cita'].pk}, None),
+    ('medico_confirmar_cita', 'medico', 'POST', lambda o: {'pk': o['cita'].pk}, {}),
+    ('medico_cancelar_cita', 'medico', 'POST', lambda o: {'pk': o['cita'].pk}, {}),
+    ('medico_completar_cita', 'medico', 'POST', lambda o: {'pk': o['cita'].pk}, {}),
+    ('medico_cambiar_estado_cita', 'medico', 'POST', lambda o: {'pk': o['cita'].pk}, {'estado': 'CONFIRMADA'}),
+    ('medico_serie_mover', 'medico', 'POST', lambda o: {'pk': o['serie'].pk}, {'minutos': '30'}),
+    ('medico_serie_cancelar', 'medico', 'POST', lambda o: {'pk': o['serie'].pk}, {}),
+    ('calendario_ics', None, 'GET', {}, lambda o: {'token': o['token']}),
+    ('calendario_enlace', 'paciente', 'POST', {}, {}),
+    # Sincronización incremental: la página sale llena con muchos y con pocos datos
+    ('sincronizar', 'medico', 'GET', {}, lambda o: {'cursor': o['cursor_sync'], 'limite': '10'}),
+    ('eventos_leer', 'integracion', 'GET', {}, {'limite': '50'}),
+    ('eventos_confirmar', 'integracion', 'POST', {}, {'hasta': '1'}),
+]
+
+# Vistas que no se miden aquí y por qué
+SIN_MEDIR = {
+    'listar_citas': 'la plantilla admin/CRUD_Citas/listar.html no existe',
+    'medico_estadisticas': 'la plantilla medico/pages/estadisticas.html no existe',
+}
+
+
+def _valor(valor, objetos):
+    return valor(objetos) if callable(valor) else valor
+
+
+class Command(BaseCommand):
+    help = 'Verificar que las consultas de cada vista no crecen con los datos ni superan su presupuesto'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--muchos', type=int, default=500, help='Filas por tabla en la medición grande')
+
+    # Las rutas admin/... de core.urls las tapa el admin de Django en
+    # config/urls.py; aquí se mide contra core.urls directamente. El Client
+    # de pruebas envía Host: testserver.
+    @override_settings(
+        ROOT_URLCONF='core.urls', ALLOWED_HOSTS=['testserver'], CACHES=CACHES_MEDICION, AUDITORIA_ACTIVA=False,
+        EVENTOS_CONSUMIDORES={'presupuesto': CLAVE},
+    )
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            objetos = self._actores()
+            self._sembrar(objetos, POCOS)
+            pocos = self._medir(objetos)
+            self._sembrar(objetos, options['muchos'])
+            muchos = self._medir(objetos)
+            transaction.set_rollback(True)
+        cache.clear()
+
+        fallos = []
+        self.stdout.write(f'{"vista":<36}{"presupuesto":>12}{"pocos":>7}{"muchos":>8}  estado')
+        for nombre, _, metodo, _, _ in CASOS:
+            caso = (nombre, metodo)
+            maximo = presupuesto_de(get_resolver().resolve(reverse(nombre, kwargs=self._kwargs(nombre, objetos))).func)
+            estado = 'ok'
+            if maximo is None:
+                estado = 'SIN PRESUPUESTO'
+            elif pocos[caso] != muchos[caso]:
+                estado = 'CRECE CON LOS DATOS'
+            elif muchos[caso] > maximo:
+                estado = 'EXCEDE'
+            if estado != 'ok':
+                fallos.append(f'{nombre} ({metodo})')
+            self.stdout.write(
+                f'{nombre + " (" + metodo + ")":<36}{maximo if maximo is not None else "-":>12}'
+                f'{pocos[caso]:>7}{muchos[caso]:>8}  {estado}'
+            )
+
+        # Las rutas sin caso (alias como paciente_historial) valen si su vista ya se midió
+        patrones = [patron for patron in get_resolver().url_patterns if patron.name]
+        medidas = {nombre for nombre, *_ in CASOS}
+        vistas_medidas = {patron.callback for patron in patrones if patron.name in medidas}
+        for patron in patrones:
+            if patron.name in SIN_MEDIR:
+                self.stdout.write(f'No medida: {patron.name} ({SIN_MEDIR[patron.name]})')
+                if presupuesto_de(patron.callback) is None:
+                    fallos.append(patron.name)
+            elif patron.callback not in vistas_medidas:
+                self.stdout.write(self.style.WARNING(f'Sin caso de medición: {patron.name}'))
+
+        if fallos:
+            raise CommandError(f'Vistas fuera de presupuesto: {", ".join(fallos)}')
+        self.stdout.write(self.style.SUCCESS('✓ Todas las vistas medidas cumplen su presupuesto'))
+
+    # --- datos ---
+
+    def _actores(self):
+        especialidad = Especialidad.objects.create(nombre=f'{PREFIJO}especialidad')
+        medico = Usuario.objects.create(username=f'{PREFIJO}medico', rol='MEDICO', first_name='Medico')
+        medico.especialidades.add(especialidad)
+        paciente = Usuario.objects.create(username=f'{PREFIJO}paciente', rol='PACIENTE', first_name='Paciente')
+        paciente.set_password(CLAVE)
+        paciente.save(update_fields=['password'])
+        admin = Usuario.objects.create(username=f'{PREFIJO}admin', rol='ADMIN', is_staff=True)
+        Franja.objects.bulk_create([
+            Franja(medico=medico, dia=dia, hora_inicio=time(8), hora_fin=time(13))
+            for dia in ('MON', 'TUE', 'WED', 'THU', 'FRI')
+        ])
+        manana = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=2)
+        cita = Cita.objects.create(
+            paciente=paciente, medico=medico, especialidad=especialidad, fecha_hora=manana,
+            motivo='Caso medido', estado='PENDIENTE',
+        )
+        # Una cita pasada para que el historial nunca esté vacío
+        Cita.objects.create(
+            paciente=paciente, medico=medico, especialidad=especialidad, fecha_hora=manana - timedelta(days=30),
+            motivo='Caso medido', estado='COMPLETADA',
+        )
+        serie = SerieCitas.objects.create(
+            paciente=paciente, medico=medico, frecuencia='SEMANAL', inicio=manana + timedelta(hours=3), repeticiones=4,
+        )
+        Cita.objects.bulk_create([
+            Cita(paciente=paciente, medico=medico, fecha_hora=serie.inicio + timedelta(weeks=i),
+                 motivo='Serie', estado='PENDIENTE', serie=serie)
+            for i in range(4)
+        ])
+        espera = EsperaCita.objects.create(
+            paciente=paciente, medico=medico, desde=timezone.now(), hasta=timezone.now() + timedelta(days=30),
+        )
+        # Otra entrada, de otro paciente, para que las cancelaciones medidas
+        # ofrezcan sus huecos (las del propio paciente no los reciben)
+        EsperaCita.objects.create(
+            paciente=admin, especialidad=especialidad, desde=timezone.now(), hasta=timezone.now() + timedelta(days=60),
+        )
+        liberada = Cita.objects.create(
+            paciente=admin, medico=medico, fecha_hora=manana + timedelta(hours=1), motivo='Liberada', estado='CANCELADA',
+        )
+        oferta = OfertaHueco.objects.create(
+            cita_liberada=liberada, espera=espera, vence_en=timezone.now() + timedelta(hours=1),
+        )
+        return {
+            'especialidad': especialidad, 'medico': medico, 'paciente': paciente, 'admin': admin,
+            'cita': cita, 'serie': serie, 'espera': espera, 'oferta': oferta, 'otros_pacientes': [],
+            'token': token_de(medico.pk),
+            # Desde el principio, pero sin pasar de la última purga de lápidas (daría 410)
+            'cursor_sync': codificar_cursor({
+                'citas': (0, 0), 'notificaciones': (0, 0),
+                'borrados': (SecuenciaSync.objects.values_list('purgado_hasta', flat=True).get(pk=1), 0),
+            }),
+        }
+
+    def _sembrar(self, objetos, n):
+        """Agrega ``n`` citas, notificaciones y recordatorios alrededor de los actores."""
+        medico, paciente = objetos['medico'], objetos['paciente']
+        inicio = len(objetos['otros_pacientes'])
+        objetos['otros_pacientes'] += Usuario.objects.bulk_create([
+            Usuario(username=f'{PREFIJO}p{inicio + i}', rol='PACIENTE') for i in range(max(1, n // 5))
+        ])
+        # Por la tarde, para no chocar con la cita ni la serie de los actores
+        tarde = timezone.localtime().replace(hour=15, minute=0, second=0, microsecond=0)
+        estados = [valor for valor, _ in Cita.ESTADOS]
+        citas = Cita.objects.bulk_create([
+            Cita(
+                paciente=paciente if i % 2 else random.choice(objetos['otros_pacientes']),
+                medico=medico,
+                especialidad=objetos['especialidad'],
+                fecha_hora=tarde + timedelta(
+                    days=i % 3 - 1 if i < POCOS else random.randint(-300, 300),
+                    minutes=30 * random.randint(0, 7),
+                ),
+                motivo='Relleno',
+                estado=estados[i % len(estados)],
+            )
+            for i in range(n)
+        ])
+        Recordatorio.objects.bulk_create([
+            Recordatorio(cita=cita, fecha_envio=cita.fecha_hora - timedelta(days=1), mensaje='Relleno')
+            for cita in citas
+        ])
+        Notificacion.objects.bulk_create([
+            Notificacion(usuario=paciente, titulo='Relleno', mensaje='Relleno', leida=bool(i % 2))
+            for i in range(n)
+        ])
+
+    # --- medición ---
+
+    def _kwargs(self, nombre, objetos):
+        caso = next((c for c in CASOS if c[0] == nombre), None)
+        return _valor(caso[3], objetos) if caso else {}
+
+    def _medir(self, objetos):
+        clientes = {}
+        for rol in ('admin', 'medico', 'paciente'):
+            clientes[rol] = Client()
+            clientes[rol].force_login(objetos[rol])
+        clientes['integracion'] = Client(HTTP_AUTHORIZATION=f'Bearer {CLAVE}')
+
+        resultados = {}
+        for nombre, rol, metodo, kwargs, datos in CASOS:
+            url = reverse(nombre, kwargs=_valor(kwargs, objetos))
+            datos = _valor(datos, objetos)
+            # Los anónimos estrenan cliente: un login medido no debe dejar sesión
+            cliente = clientes[rol] if rol else Client()
+            # Una petición de calentamiento (cachés, sesión) y la medida
+            for _ in range(2):
+                with transaction.atomic():
+                    with ContadorConsultas() as contador:
+                        if metodo == 'GET':
+                            respuesta = cliente.get(url, datos)
+                        else:
+                            respuesta = cliente.post(url, datos)
+                        # Las respuestas en streaming consultan mientras se envían
+                        if respuesta.streaming:
+                            b''.join(respuesta.streaming_content)
+                    transaction.set_rollback(True)
+            if respuesta.status_code >= 400:
+                raise CommandError(f'{nombre}: respuesta {respuesta.status_code}')
+            resultados[(nombre, metodo)] = contador.total
+            if nombre == 'logout':
+                clientes[rol].force_login(objetos[rol])
+        cache.clear()
+        return resultados
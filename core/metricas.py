@@ -0,0 +1,276 @@
+"""
+Métricas de operación en el formato de texto de Prometheus (``/metrics``).
+
+Contadores, medidores e histogramas con cubetas fijas viven en memoria del
+proceso; cada actualización toma solo el cerrojo de esa métrica durante una
+suma. ``MetricasMiddleware`` (core/middleware.py) mide todas las vistas y las
+vistas de negocio incrementan los contadores de citas y logins.
+
+Con servidores de varios procesos (gunicorn, uwsgi) se define
+METRICAS_DIRECTORIO: cada proceso vuelca sus valores en
+``<directorio>/<pid>.json`` cada METRICAS_INTERVALO_VOLCADO segundos y al
+terminar, y ``/metrics`` suma los archivos de todos los procesos. Los
+contadores e histogramas de procesos ya terminados se conservan; sus
+medidores no. El directorio se vacía en cada despliegue.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+CUBETAS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Registro:
+    def __init__(self):
+        self.metricas = {}
+        self._pid = None
+        self._cerrojo = threading.Lock()
+
+    def registrar(self, metrica):
+        if metrica.nombre in self.metricas:
+            raise ValueError(f'Métrica duplicada: {metrica.nombre}')
+        self.metricas[metrica.nombre] = metrica
+
+    # --- varios procesos ---
+
+    def directorio(self):
+        return getattr(settings, 'METRICAS_DIRECTORIO', None)
+
+    def asegurar_volcado(self):
+        """Arranca el hilo de volcado en este proceso (de nuevo tras un fork)."""
+        if self._pid == os.getpid() or not self.directorio():
+            return
+        with self._cerrojo:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Proceso hijo: lo heredado del padre ya lo vuelca el padre
+                for metrica in self.metricas.values():
+                    metrica.reiniciar()
+            self._pid = os.getpid()
+            threading.Thread(target=self._bucle_volcado, name='metricas', daemon=True).start()
+            atexit.register(self.volcar)
+
+    def _bucle_volcado(self):
+        intervalo = getattr(settings, 'METRICAS_INTERVALO_VOLCADO', 5)
+        while True:
+            time.sleep(intervalo)
+            self.volcar()
+
+    def volcar(self):
+        directorio = self.directorio()
+        if not directorio:
+            return
+        os.makedirs(directorio, exist_ok=True)
+        datos = {nombre: metrica.instantanea() for nombre, metrica in self.metricas.items()}
+        ruta = os.path.join(directorio, f'{os.getpid()}.json')
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(datos, archivo)
+        os.replace(temporal, ruta)
+
+    def _valores_de_procesos(self):
+        """Suma por métrica y etiquetas de los volcados de todos los procesos."""
+        self.volcar()
+        totales = {}
+        directorio = self.directorio()
+        for nombre_archivo in os.listdir(directorio):
+            pid = nombre_archivo[:-len('.json')]
+            if not nombre_archivo.endswith('.json') or not pid.isdigit():
+                continue
+            pid = int(pid)
+            try:
+                with open(os.path.join(directorio, nombre_archivo)) as archivo:
+                    datos = json.load(archivo)
+            except (OSError, ValueError):
+                continue
+            vivo = _proceso_vivo(pid)
+            for nombre, valores in datos.items():
+                metrica = self.metricas.get(nombre)
+                if metrica is None or (metrica.tipo == 'gauge' and not vivo):
+                    continue
+                destino = totales.setdefault(nombre, {})
+                for clave, valor in valores:
+                    clave = tuple(clave)
+                    destino[clave] = metrica.sumar(destino.get(clave), valor)
+        return totales
+
+    # --- exposición ---
+
+    def exponer(self):
+        """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+        if self.directorio():
+            totales = self._valores_de_procesos()
+        else:
+            totales = {
+                nombre: {tuple(clave): valor for clave, valor in metrica.instantanea()}
+                for nombre, metrica in self.metricas.items()
+            }
+
+        lineas = []
+        for nombre, metrica in sorted(self.metricas.items()):
+            lineas.append(f'# HELP {nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {nombre} {metrica.tipo}')
+            for clave, valor in sorted(totales.get(nombre, {}).items()):
+                lineas.extend(metrica.lineas(clave, valor))
+        return '\n'.join(lineas) + '\n'
+
+
+def _proceso_vivo(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _formatear(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=(), registro=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.registro = registro or REGISTRO
+        self._valores = {}
+        self._cerrojo = threading.Lock()
+        self.registro.registrar(self)
+
+    def _clave(self, etiquetas):
+        if len(etiquetas) != len(self.etiquetas):
+            raise ValueError(f'{self.nombre} espera las etiquetas {self.etiquetas}')
+        return tuple(str(etiquetas[nombre]) for nombre in self.etiquetas)
+
+    def _selector(self, clave, extra=()):
+        pares = list(zip(self.etiquetas, clave)) + list(extra)
+        if not pares:
+            return ''
+        return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+    def reiniciar(self):
+        with self._cerrojo:
+            self._valores = {}
+
+    def instantanea(self):
+        with self._cerrojo:
+            return [[list(clave), valor] for clave, valor in self._valores.items()]
+
+    def sumar(self, acumulado, valor):
+        return valor if acumulado is None else acumulado + valor
+
+    def lineas(self, clave, valor):
+        return [f'{self.nombre}{self._selector(clave)} {_formatear(valor)}']
+
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        self.registro.asegurar_volcado()
+        clave = self._clave(etiquetas)
+        with self._cerrojo:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Medidor(_Metrica):
+    tipo = 'gauge'
+
+    def inc(self, cantidad=1, **etiquetas):
+        self.registro.asegurar_volcado()
+        clave = self._clave(etiquetas)
+        with self._cerrojo:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def dec(self, cantidad=1, **etiquetas):
+        self.inc(-cantidad, **etiquetas)
+
+    def set(self, valor, **etiquetas):
+        self.registro.asegurar_volcado()
+        clave = self._clave(etiquetas)
+        with self._cerrojo:
+            self._valores[clave] = valor
+
+
+class Histograma(_Metrica):
+    """Cubetas fijas; por etiquetas se guardan los conteos por cubeta (sin acumular), la suma y el total."""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_DURACION, registro=None):
+        self.cubetas = tuple(sorted(cubetas))
+        super().__init__(nombre, ayuda, etiquetas, registro)
+
+    def observar(self, valor, **etiquetas):
+        self.registro.asegurar_volcado()
+        clave = self._clave(etiquetas)
+        indice = bisect_left(self.cubetas, valor)
+        with self._cerrojo:
+            datos = self._valores.get(clave)
+            if datos is None:
+                datos = self._valores[clave] = [[0] * (len(self.cubetas) + 1), 0.0, 0]
+            datos[0][indice] += 1
+            datos[1] += valor
+            datos[2] += 1
+
+    def instantanea(self):
+        with self._cerrojo:
+            return [[list(clave), [list(c), s, n]] for clave, (c, s, n) in self._valores.items()]
+
+    def sumar(self, acumulado, valor):
+        if acumulado is None:
+            return [list(valor[0]), valor[1], valor[2]]
+        return [[a + b for a, b in zip(acumulado[0], valor[0])], acumulado[1] + valor[1], acumulado[2] + valor[2]]
+
+    def lineas(self, clave, valor):
+        conteos, suma, total = valor
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.cubetas + (float('inf'),), conteos):
+            acumulado += conteo
+            selector = self._selector(clave, [('le', _formatear(float(limite)))])
+            lineas.append(f'{self.nombre}_bucket{selector} {acumulado}')
+        lineas.append(f'{self.nombre}_sum{self._selector(clave)} {_formatear(suma)}')
+        lineas.append(f'{self.nombre}_count{self._selector(clave)} {total}')
+        return lineas
+
+
+REGISTRO = Registro()
+
+PETICIONES = Contador(
+    'miposta_peticiones_total', 'Peticiones atendidas por vista, método y estado HTTP',
+    ['vista', 'metodo', 'estado'],
+)
+DURACION_PETICIONES = Histograma(
+    'miposta_peticion_duracion_segundos', 'Duración de las peticiones por vista y método',
+    ['vista', 'metodo'],
+)
+PETICIONES_EN_CURSO = Medidor('miposta_peticiones_en_curso', 'Peticiones en proceso ahora mismo')
+CITAS_CREADAS = Contador('miposta_citas_creadas_total', 'Citas creadas por origen', ['origen'])
+TRANSICIONES_CITAS = Contador(
+    'miposta_citas_transiciones_total', 'Cambios de estado de citas hechos por los médicos',
+    ['desde', 'hacia'],
+)
+LOGINS = Contador('miposta_logins_total', 'Intentos de inicio de sesión por resultado', ['resultado'])
+LOGS_DESCARTADOS = Contador(
+    'miposta_logs_descartados_total', 'Registros de log descartados porque la cola de escritura estaba llena',
+)
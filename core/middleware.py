@@ -0,0 +1,274 @@
+import logging
+import mimetypes
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+
+from . import metricas
+from .bitacora import peticion_actual
+from .presupuestos import ContadorConsultas, presupuesto_de
+
+CLAVE_RENOVADA = '_renovada'
+
+
+def calidades_aceptadas(cabecera):
+    """
+    Codificación -> q de un Accept-Encoding (``gzip;q=0.5, br``). Sin ``q``
+    vale 1; un ``q`` ilegible cuenta como 0.
+    """
+    calidades = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.partition(';')
+        nombre = nombre.strip().lower()
+        if not nombre:
+            continue
+        calidad = 1.0
+        for parametro in parametros.split(';'):
+            clave, _, valor = parametro.partition('=')
+            if clave.strip().lower() == 'q':
+                try:
+                    calidad = float(valor)
+                except ValueError:
+                    calidad = 0.0
+        calidades[nombre] = calidad
+    return calidades
+
+
+class RenovarSesionMiddleware:
+    """
+    Expiración deslizante de la sesión sin guardarla en cada petición.
+
+    Reemplaza a SESSION_SAVE_EVERY_REQUEST: la sesión solo se marca como
+    modificada (y se vuelve a escribir) cuando le queda menos de
+    SESION_MARGEN_RENOVACION segundos de vida.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.duracion = settings.SESSION_COOKIE_AGE
+        self.margen = getattr(settings, 'SESION_MARGEN_RENOVACION', self.duracion // 2)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if session is None or session.is_empty() or session.get_expire_at_browser_close():
+            return response
+
+        ahora = int(time.time())
+        renovada = session.get(CLAVE_RENOVADA)
+        if session.modified or renovada is None or renovada + self.duracion - ahora < self.margen:
+            # Al modificarla, SessionMiddleware la guarda y reenvía la cookie
+            session[CLAVE_RENOVADA] = ahora
+        return response
+
+
+class ArchivosEstaticosMiddleware:
+    """
+    Sirve STATIC_ROOT directamente desde el proceso WSGI/ASGI.
+
+    Pensado para los archivos generados por collectstatic con
+    core.storage.ManifestComprimidoStorage: elige la variante .br o .gz según
+    Accept-Encoding (respetando los valores q), marca los nombres con hash como inmutables (caché de un
+    año) y responde 304 cuando coincide If-None-Match.
+    """
+    CON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+    CODIFICACIONES = [('br', '.br'), ('gzip', '.gz')]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefijo = settings.STATIC_URL
+        self.raiz = Path(settings.STATIC_ROOT).resolve()
+        self.max_age_sin_hash = getattr(settings, 'ESTATICOS_MAX_AGE_SIN_HASH', 60)
+        # Ruta relativa -> datos del archivo. Los estáticos no cambian sin
+        # reiniciar tras un despliegue. Solo se guardan los que existen: así
+        # el diccionario no pasa del número de archivos de STATIC_ROOT,
+        # aunque lleguen rutas inventadas.
+        self.archivos = {}
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefijo):
+            archivo = self._buscar(request.path_info[len(self.prefijo):])
+            if archivo is not None:
+                return self._servir(request, archivo)
+        return self.get_response(request)
+
+    def _buscar(self, relativa):
+        archivo = self.archivos.get(relativa)
+        if archivo is None:
+            archivo = self._inspeccionar(relativa)
+            if archivo is not None:
+                self.archivos[relativa] = archivo
+        return archivo
+
+    def _inspeccionar(self, relativa):
+        ruta = (self.raiz / relativa).resolve()
+        if self.raiz not in ruta.parents or not ruta.is_file():
+            return None
+
+        tipo, _ = mimetypes.guess_type(ruta.name)
+        variantes = {}
+        for codificacion, sufijo in [(None, '')] + self.CODIFICACIONES:
+            candidata = ruta.with_name(ruta.name + sufijo)
+            if candidata.is_file():
+                estado = candidata.stat()
+                variantes[codificacion] = {
+                    'ruta': candidata,
+                    'etag': f'"{estado.st_size:x}-{int(estado.st_mtime):x}{"-" + codificacion if codificacion else ""}"',
+                }
+
+        if self.CON_HASH.search(ruta.name):
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            cache_control = f'public, max-age={self.max_age_sin_hash}'
+
+        return {
+            'tipo': tipo or 'application/octet-stream',
+            'variantes': variantes,
+            'cache_control': cache_control,
+        }
+
+    def _elegir(self, request, archivo):
+        """Variante con mayor q > 0 (en empate, la primera de CODIFICACIONES)."""
+        calidades = calidades_aceptadas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        comodin = calidades.get('*', 0.0)
+        elegida, mejor = None, 0.0
+        for nombre, _ in self.CODIFICACIONES:
+            calidad = calidades.get(nombre, comodin)
+            if nombre in archivo['variantes'] and calidad > mejor:
+                elegida, mejor = nombre, calidad
+        return elegida
+
+    def _servir(self, request, archivo):
+        codificacion = self._elegir(request, archivo)
+        variante = archivo['variantes'][codificacion]
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        etags = {etag.strip().removeprefix('W/') for etag in if_none_match.split(',')}
+        if variante['etag'] in etags or '*' in etags:
+            respuesta = HttpResponseNotModified()
+        else:
+            respuesta = FileResponse(open(variante['ruta'], 'rb'), content_type=archivo['tipo'])
+            if codificacion:
+                respuesta['Content-Encoding'] = codificacion
+
+        respuesta['ETag'] = variante['etag']
+        respuesta['Cache-Control'] = archivo['cache_control']
+        if len(archivo['variantes']) > 1:
+            respuesta['Vary'] = 'Accept-Encoding'
+        return respuesta
+
+
+class RegistroPeticionesMiddleware:
+    """
+    Id de petición, usuario y vista para los logs (ver core/bitacora.py) y una
+    línea por petición en ``core.peticiones`` con método, ruta, estado y
+    duración. Respeta un X-Request-ID entrante (de un proxy) y lo devuelve en
+    la respuesta.
+    """
+    REQUEST_ID_VALIDO = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+    logger = logging.getLogger('core.peticiones')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.META.get('HTTP_X_REQUEST_ID', '')
+        if not self.REQUEST_ID_VALIDO.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = peticion_actual.set({'request_id': request_id})
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            response['X-Request-ID'] = request_id
+            self.logger.info(
+                '%s %s %s', request.method, request.path, response.status_code,
+                extra={
+                    'metodo': request.method,
+                    'ruta': request.path,
+                    'estado': response.status_code,
+                    'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2),
+                },
+            )
+            return response
+        finally:
+            peticion_actual.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        contexto = peticion_actual.get()
+        if contexto is not None:
+            contexto['vista'] = request.resolver_match.view_name
+            usuario = getattr(request, 'user', None)
+            if usuario is not None and usuario.is_authenticated:
+                contexto['usuario_id'] = usuario.pk
+
+
+class MetricasMiddleware:
+    """Cuenta y cronometra cada petición por vista (ver core/metricas.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metricas.PETICIONES_EN_CURSO.inc()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.PETICIONES_EN_CURSO.dec()
+        duracion = time.perf_counter() - inicio
+
+        # Por nombre de ruta, no por URL, para no crear una serie por cada pk
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else 'sin_ruta'
+        metricas.PETICIONES.inc(vista=vista, metodo=request.method, estado=response.status_code)
+        metricas.DURACION_PETICIONES.observar(duracion, vista=vista, metodo=request.method)
+        return response
+
+
+class PresupuestoConsultasMiddleware:
+    """Solo con DEBUG: avisa en el log si la petición supera el presupuesto de su vista (ver core/presupuestos.py)."""
+
+    logger = logging.getLogger('core.presupuestos')
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ContadorConsultas() as contador:
+            response = self.get_response(request)
+
+        # Las respuestas en streaming (sincronizar) consultan mientras se
+        # envían: se sigue contando y se comprueba al terminar
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self._contar_al_enviar(response.streaming_content, request, contador)
+        else:
+            self._comprobar(request, contador)
+        return response
+
+    def _contar_al_enviar(self, contenido, request, contador):
+        partes = iter(contenido)
+        fin = object()
+        while True:
+            with contador:
+                parte = next(partes, fin)
+            if parte is fin:
+                break
+            yield parte
+        self._comprobar(request, contador)
+
+    def _comprobar(self, request, contador):
+        coincidencia = getattr(request, 'resolver_match', None)
+        maximo = presupuesto_de(coincidencia.func) if coincidencia else None
+        if maximo is not None and contador.total > maximo:
+            self.logger.warning(
+                'La vista %s hizo %s consultas (presupuesto %s): %s %s',
+                coincidencia.view_name, contador.total, maximo, request.method, request.path,
+            )
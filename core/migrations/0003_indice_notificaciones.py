@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_resumenes_diarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', '-creada_en'], name='notif_usuario_leida_idx'),
+        ),
+    ]
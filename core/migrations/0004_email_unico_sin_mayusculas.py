@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:11
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+MOSTRAR_DUPLICADOS = 20
+
+
+def comprobar_duplicados(apps, schema_editor):
+    """
+    El índice único falla si ya hay emails que solo difieren en mayúsculas
+    (``Ana@x`` y ``ana@x``). Las cuentas no se fusionan solas porque cada una
+    tiene sus citas: se detiene la migración con la lista de las que hay que
+    resolver a mano (cambiar el email de una o fusionarlas) antes de reintentar.
+    """
+    Usuario = apps.get_model('core', 'Usuario')
+    duplicados = (
+        Usuario.objects
+        .exclude(email='')
+        .annotate(email_min=django.db.models.functions.text.Lower('email'))
+        .values('email_min')
+        .annotate(total=models.Count('pk'))
+        .filter(total__gt=1)
+        .order_by('email_min')
+        .values_list('email_min', flat=True)
+    )
+    emails = list(duplicados[:MOSTRAR_DUPLICADOS + 1])
+    if not emails:
+        return
+    cuentas = (
+        Usuario.objects
+        .annotate(email_min=django.db.models.functions.text.Lower('email'))
+        .filter(email_min__in=emails[:MOSTRAR_DUPLICADOS])
+        .order_by('email_min', 'pk')
+        .values_list('email_min', 'username')
+    )
+    lineas = [f'  {email}: {username}' for email, username in cuentas]
+    if len(emails) > MOSTRAR_DUPLICADOS:
+        lineas.append(f'  ... y más (se muestran los primeros {MOSTRAR_DUPLICADOS} emails)')
+    raise RuntimeError(
+        'Hay usuarios con el mismo email salvo mayúsculas; resuélvelos antes de migrar:\n'
+        + '\n'.join(lineas)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_indice_notificaciones'),
+    ]
+
+    operations = [
+        migrations.RunPython(comprobar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usuario',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='usuarios_email_ci_unico'),
+        ),
+    ]
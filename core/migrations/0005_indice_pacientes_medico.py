@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_email_unico_sin_mayusculas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'paciente', 'fecha_hora', 'estado'], name='citas_medico_paciente_idx'),
+        ),
+    ]
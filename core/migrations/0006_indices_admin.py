@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_indice_pacientes_medico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['-creada_en'], name='notif_creada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recordatorio',
+            index=models.Index(fields=['-fecha_envio'], name='recordatorios_envio_idx'),
+        ),
+    ]
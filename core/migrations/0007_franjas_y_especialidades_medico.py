@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indices_admin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Franja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.CharField(choices=[('MON', 'Lunes'), ('TUE', 'Martes'), ('WED', 'Miércoles'), ('THU', 'Jueves'), ('FRI', 'Viernes'), ('SAT', 'Sábado'), ('SUN', 'Domingo')], max_length=3)),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('tipo', models.CharField(choices=[('CONSULTA', 'Consulta'), ('VACUNACION', 'Vacunación')], default='CONSULTA', max_length=20)),
+            ],
+            options={
+                'verbose_name': 'Franja',
+                'verbose_name_plural': 'Franjas',
+                'db_table': 'franjas',
+                'ordering': ['medico', 'dia', 'hora_inicio'],
+            },
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='especialidades',
+            field=models.ManyToManyField(blank=True, db_table='medicos_especialidades', related_name='medicos', to='core.especialidad'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'fecha_hora'], name='citas_medico_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='franja',
+            name='medico',
+            field=models.ForeignKey(limit_choices_to={'rol': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, related_name='franjas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='franja',
+            constraint=models.CheckConstraint(condition=models.Q(('hora_inicio__lt', models.F('hora_fin'))), name='franjas_inicio_antes_fin'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_franjas_y_especialidades_medico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EsperaCita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateTimeField()),
+                ('hasta', models.DateTimeField()),
+                ('estado', models.CharField(choices=[('ESPERANDO', 'Esperando'), ('OFRECIDA', 'Con oferta'), ('ASIGNADA', 'Asignada'), ('RETIRADA', 'Retirada')], default='ESPERANDO', max_length=20)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('especialidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.especialidad')),
+                ('medico', models.ForeignKey(blank=True, limit_choices_to={'rol': 'MEDICO'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='esperas_medico', to=settings.AUTH_USER_MODEL)),
+                ('paciente', models.ForeignKey(limit_choices_to={'rol': 'PACIENTE'}, on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Espera de cita',
+                'verbose_name_plural': 'Lista de espera',
+                'db_table': 'lista_espera',
+                'ordering': ['creado_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OfertaHueco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ACEPTADA', 'Aceptada'), ('RECHAZADA', 'Rechazada'), ('VENCIDA', 'Vencida')], default='PENDIENTE', max_length=20)),
+                ('vence_en', models.DateTimeField()),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('cita_asignada', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.cita')),
+                ('cita_liberada', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ofertas', to='core.cita')),
+                ('espera', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ofertas', to='core.esperacita')),
+            ],
+            options={
+                'verbose_name': 'Oferta de hueco',
+                'verbose_name_plural': 'Ofertas de huecos',
+                'db_table': 'ofertas_hueco',
+                'ordering': ['-creada_en'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='esperacita',
+            index=models.Index(condition=models.Q(('estado', 'ESPERANDO')), fields=['medico', 'desde', 'creado_en'], name='espera_medico_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='esperacita',
+            index=models.Index(condition=models.Q(('estado', 'ESPERANDO'), ('medico__isnull', True)), fields=['especialidad', 'desde', 'creado_en'], name='espera_especialidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='esperacita',
+            index=models.Index(fields=['paciente', 'estado'], name='espera_paciente_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='esperacita',
+            constraint=models.CheckConstraint(condition=models.Q(('medico__isnull', False), ('especialidad__isnull', False), _connector='OR'), name='espera_medico_o_especialidad'),
+        ),
+        migrations.AddConstraint(
+            model_name='esperacita',
+            constraint=models.CheckConstraint(condition=models.Q(('desde__lt', models.F('hasta'))), name='espera_ventana_valida'),
+        ),
+        migrations.AddIndex(
+            model_name='ofertahueco',
+            index=models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['vence_en'], name='ofertas_pendientes_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ofertahueco',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'PENDIENTE')), fields=('cita_liberada',), name='ofertas_una_pendiente_por_hueco'),
+        ),
+        migrations.AddConstraint(
+            model_name='ofertahueco',
+            constraint=models.UniqueConstraint(fields=('cita_liberada', 'espera'), name='ofertas_hueco_espera_unica'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_lista_espera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieCitas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frecuencia', models.CharField(choices=[('SEMANAL', 'Semanal'), ('MENSUAL', 'Mensual')], max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1)),
+                ('inicio', models.DateTimeField()),
+                ('repeticiones', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('hasta', models.DateField(blank=True, null=True)),
+                ('motivo', models.TextField(blank=True)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('especialidad', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.especialidad')),
+                ('medico', models.ForeignKey(limit_choices_to={'rol': 'MEDICO'}, on_delete=django.db.models.deletion.CASCADE, related_name='series_medico', to=settings.AUTH_USER_MODEL)),
+                ('paciente', models.ForeignKey(limit_choices_to={'rol': 'PACIENTE'}, on_delete=django.db.models.deletion.CASCADE, related_name='series_paciente', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Serie de citas',
+                'verbose_name_plural': 'Series de citas',
+                'db_table': 'series_citas',
+            },
+        ),
+        migrations.AddField(
+            model_name='cita',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='citas', to='core.seriecitas'),
+        ),
+    ]
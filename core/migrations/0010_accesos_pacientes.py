@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_series_citas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccesoPaciente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cita_id', models.BigIntegerField(blank=True, null=True)),
+                ('vista', models.CharField(choices=[('CITA', 'Detalle de cita'), ('FICHA', 'Ficha del paciente'), ('HISTORIAL', 'Historial del paciente'), ('ROSTER', 'Listado de pacientes')], max_length=10)),
+                ('momento', models.DateTimeField()),
+                ('medico', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('paciente', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Acceso a paciente',
+                'verbose_name_plural': 'Accesos a pacientes',
+                'db_table': 'accesos_pacientes',
+                'indexes': [models.Index(fields=['paciente', '-momento'], name='accesos_paciente_idx'), models.Index(fields=['medico', '-momento'], name='accesos_medico_idx')],
+            },
+        ),
+    ]
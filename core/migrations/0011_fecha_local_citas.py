@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:58
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TAMANO_LOTE = 2000
+
+
+def llenar_fecha_local(apps, schema_editor):
+    """Día local de las citas existentes, un UPDATE por día y lote."""
+    Cita = apps.get_model('core', 'Cita')
+    por_dia = defaultdict(list)
+    for pk, fecha_hora in Cita.objects.order_by().values_list('pk', 'fecha_hora').iterator(chunk_size=TAMANO_LOTE):
+        por_dia[timezone.localtime(fecha_hora).date()].append(pk)
+    for dia, pks in por_dia.items():
+        for i in range(0, len(pks), TAMANO_LOTE):
+            Cita.objects.filter(pk__in=pks[i:i + TAMANO_LOTE]).update(fecha_local=dia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_accesos_pacientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='fecha_local',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_fecha_local, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cita',
+            name='fecha_local',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha_local'], name='citas_fecha_local_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_secuencia(apps, schema_editor):
+    """La fila única del contador; las filas existentes quedan en la versión 0."""
+    SecuenciaSync = apps.get_model('core', 'SecuenciaSync')
+    SecuenciaSync.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_token_calendario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorradoSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('CITA', 'Cita'), ('NOTIFICACION', 'Notificación')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('version', models.BigIntegerField()),
+                ('borrado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Borrado sincronizado',
+                'verbose_name_plural': 'Borrados sincronizados',
+                'db_table': 'borrados_sync',
+            },
+        ),
+        migrations.CreateModel(
+            name='SecuenciaSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+                ('purgado_hasta', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de sincronización',
+                'verbose_name_plural': 'Secuencia de sincronización',
+                'db_table': 'secuencia_sync',
+            },
+        ),
+        migrations.RunPython(crear_secuencia, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='cita',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['paciente', 'version'], name='citas_paciente_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['medico', 'version'], name='citas_medico_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'version'], name='notif_usuario_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='borradosync',
+            name='usuario',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='borradosync',
+            index=models.Index(fields=['usuario', 'version'], name='borrados_usuario_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borradosync',
+            index=models.Index(fields=['borrado_en'], name='borrados_momento_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sincronizacion_movil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumidorEventos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('confirmado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Consumidor de eventos',
+                'verbose_name_plural': 'Consumidores de eventos',
+                'db_table': 'consumidores_eventos',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoCita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CREADA', 'Cita creada'), ('ESTADO', 'Cambio de estado')], max_length=10)),
+                ('cita_id', models.BigIntegerField()),
+                ('paciente_id', models.BigIntegerField()),
+                ('medico_id', models.BigIntegerField()),
+                ('especialidad_id', models.BigIntegerField(blank=True, null=True)),
+                ('fecha_hora', models.DateTimeField()),
+                ('estado_anterior', models.CharField(blank=True, max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de cita',
+                'verbose_name_plural': 'Eventos de citas',
+                'db_table': 'eventos_citas',
+                'indexes': [models.Index(fields=['creado_en'], name='eventos_creado_idx')],
+            },
+        ),
+    ]
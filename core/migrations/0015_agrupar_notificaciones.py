@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_eventos_citas'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notificacion',
+            options={'verbose_name': 'Notificación', 'verbose_name_plural': 'Notificaciones'},
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='asunto',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+TAMANO_LOTE = 2000
+
+
+def llenar_pacientes_diarios(apps, schema_editor):
+    """Pacientes distintos por día de las citas existentes (una consulta agrupada)."""
+    Cita = apps.get_model('core', 'Cita')
+    PacientesDiarios = apps.get_model('core', 'PacientesDiarios')
+    filas = (
+        Cita.objects.order_by().values('fecha_local')
+        .annotate(total=Count('paciente', distinct=True)).values_list('fecha_local', 'total')
+    )
+    PacientesDiarios.objects.bulk_create(
+        [PacientesDiarios(fecha=fecha, pacientes_unicos=total) for fecha, total in filas],
+        batch_size=TAMANO_LOTE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_agrupar_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+            ],
+            options={
+                'verbose_name': 'Día pendiente',
+                'verbose_name_plural': 'Días pendientes',
+                'db_table': 'dias_pendientes',
+            },
+        ),
+        migrations.CreateModel(
+            name='PacientesDiarios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('pacientes_unicos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Pacientes del día',
+                'verbose_name_plural': 'Pacientes por día',
+                'db_table': 'pacientes_diarios',
+            },
+        ),
+        migrations.RunPython(llenar_pacientes_diarios, migrations.RunPython.noop),
+    ]
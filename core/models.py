@@ -1,5 +1,10 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .fechas import dia_local
 
 class Usuario(AbstractUser):
     """Tabla: usuarios"""
@@ -13,9 +18,26 @@ class Usuario(AbstractUser):
     telefono = models.CharField(max_length=15, blank=True)
     direccion = models.TextField(blank=True)
     fecha_nacimiento = models.DateField(null=True, blank=True)
+    # Solo para médicos: especialidades que atiende
+    especialidades = models.ManyToManyField(
+        'Especialidad',
+        blank=True,
+        related_name='medicos',
+        db_table='medicos_especialidades',
+    )
+    # Secreto del enlace de suscripción .ics (core/calendario.py)
+    token_calendario = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
     
     class Meta:
         db_table = 'usuarios'
+        constraints = [
+            # Email único sin distinguir mayúsculas (se permiten varios vacíos)
+            models.UniqueConstraint(
+                Lower('email'),
+                condition=~models.Q(email=''),
+                name='usuarios_email_ci_unico',
+            ),
+        ]
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
     
@@ -52,7 +74,175 @@ class Especialidad(models.Model):
         return self.nombre
 
 
-class Cita(models.Model):
+class SerieCitas(models.Model):
+    """Tabla: series_citas (citas recurrentes, estilo RRULE semanal o mensual)"""
+    FRECUENCIAS = [
+        ('SEMANAL', 'Semanal'),
+        ('MENSUAL', 'Mensual'),
+    ]
+
+    paciente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='series_paciente', limit_choices_to={'rol': 'PACIENTE'})
+    medico = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='series_medico', limit_choices_to={'rol': 'MEDICO'})
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.SET_NULL, null=True, blank=True)
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS)
+    intervalo = models.PositiveSmallIntegerField(default=1)
+    inicio = models.DateTimeField()
+    repeticiones = models.PositiveSmallIntegerField(null=True, blank=True)
+    hasta = models.DateField(null=True, blank=True)
+    motivo = models.TextField(blank=True)
+    creada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'series_citas'
+        verbose_name = 'Serie de citas'
+        verbose_name_plural = 'Series de citas'
+
+    def __str__(self):
+        return f"Serie {self.get_frecuencia_display().lower()}: {self.paciente.username} con Dr. {self.medico.username}"
+
+
+class SecuenciaSync(models.Model):
+    """
+    Tabla: secuencia_sync (una sola fila con la última versión entregada).
+
+    Cada escritura de citas y notificaciones toma de aquí su ``version`` para
+    la sincronización incremental (core/sincronizacion.py). El UPDATE bloquea
+    la fila hasta el fin de la transacción del que la pidió, así las versiones
+    se confirman en orden y un cliente que ya leyó hasta ``v`` no puede
+    perderse una fila que aparezca después con una versión menor.
+    """
+    valor = models.BigIntegerField(default=0)
+    # Versión del último borrado purgado: un cursor anterior debe sincronizar desde cero
+    purgado_hasta = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'secuencia_sync'
+        verbose_name = 'Secuencia de sincronización'
+        verbose_name_plural = 'Secuencia de sincronización'
+
+    def __str__(self):
+        return f"Versión {self.valor} (purgado hasta {self.purgado_hasta})"
+
+    @classmethod
+    def reservar(cls, cantidad=1):
+        """Primera de ``cantidad`` versiones consecutivas; llamar dentro de ``transaction.atomic``."""
+        cls.objects.filter(pk=1).update(valor=F('valor') + cantidad)
+        return cls.objects.values_list('valor', flat=True).get(pk=1) - cantidad + 1
+
+
+class VersionadoQuerySet(models.QuerySet):
+    """update, bulk_create y bulk_update no pasan por save(): aquí también se asigna ``version``."""
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            if 'version' not in kwargs:
+                kwargs['version'] = SecuenciaSync.reservar()
+            return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if not objs:
+            return objs
+        with transaction.atomic(using=self.db):
+            primera = SecuenciaSync.reservar(len(objs))
+            for i, obj in enumerate(objs):
+                obj.version = primera + i
+            return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if not objs:
+            return 0
+        with transaction.atomic(using=self.db):
+            if 'version' not in fields:
+                version = SecuenciaSync.reservar()
+                for obj in objs:
+                    obj.version = version
+                fields = [*fields, 'version']
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+class Versionado(models.Model):
+    """Modelo que la app móvil sincroniza por ``version`` (ver SecuenciaSync)."""
+    version = models.BigIntegerField(default=0, editable=False)
+
+    objects = VersionadoQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            self.version = SecuenciaSync.reservar()
+            campos = kwargs.get('update_fields')
+            if campos is not None:
+                kwargs['update_fields'] = {*campos, 'version'}
+            super().save(*args, **kwargs)
+
+
+class CitaQuerySet(VersionadoQuerySet):
+    """
+    update, bulk_create y bulk_update no pasan por save(): aquí se completa
+    fecha_local, se marcan los días que dejan las citas movidas
+    (DiaPendiente) y se escriben los EventoCita de las citas creadas y de los
+    cambios de estado.
+    """
+
+    def update(self, **kwargs):
+        mueve = 'fecha_hora' in kwargs or 'fecha_local' in kwargs
+        if 'estado' not in kwargs and not mueve:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            # La versión primero: su bloqueo serializa las escrituras de citas
+            if 'version' not in kwargs:
+                kwargs['version'] = SecuenciaSync.reservar()
+            if mueve:
+                # El resumen del día que las citas dejan también cambia
+                DiaPendiente.marcar(self.order_by().values_list('fecha_local', flat=True).distinct())
+            if 'estado' not in kwargs:
+                return super().update(**kwargs)
+            anteriores = dict(self.select_for_update().order_by().values_list('pk', 'estado'))
+            actualizadas = super().update(**kwargs)
+            if anteriores:
+                EventoCita.registrar(
+                    Cita.objects.filter(pk__in=list(anteriores)).values(*EventoCita.CAMPOS_CITA), anteriores
+                )
+        return actualizadas
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for cita in objs:
+            cita.fecha_local = dia_local(cita.fecha_hora)
+        with transaction.atomic(using=self.db):
+            creadas = super().bulk_create(objs, *args, **kwargs)
+            # Con ignore_conflicts las filas no insertadas quedan sin pk
+            EventoCita.registrar(
+                [{campo: getattr(cita, campo) for campo in EventoCita.CAMPOS_CITA} for cita in creadas if cita.pk],
+                {},
+            )
+        return creadas
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # Los eventos de estado los escribe update(), que bulk_update llama por cada lote
+        objs = list(objs)
+        if 'fecha_hora' in fields:
+            fields = [*fields, 'fecha_local']
+            for cita in objs:
+                cita.fecha_local = dia_local(cita.fecha_hora)
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def ocupan_turno(self):
+        """
+        Citas que ocupan su turno: las no canceladas y las canceladas cuyo
+        hueco retiene una oferta de la lista de espera sin vencer.
+        """
+        retenido = OfertaHueco.objects.filter(
+            cita_liberada=OuterRef('pk'), estado='PENDIENTE', vence_en__gt=timezone.now()
+        )
+        return self.filter(~Q(estado='CANCELADA') | Exists(retenido))
+
+
+class Cita(Versionado):
     """Tabla: citas"""
     ESTADOS = [
         ('PENDIENTE', 'Pendiente'),
@@ -65,21 +255,102 @@ class Cita(models.Model):
     medico = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='citas_medico', limit_choices_to={'rol': 'MEDICO'})
     especialidad = models.ForeignKey(Especialidad, on_delete=models.SET_NULL, null=True, blank=True)
     fecha_hora = models.DateTimeField()
+    # Día de fecha_hora en TIME_ZONE, para agrupar por día sin TruncDate (ver core/fechas.py).
+    # Lo mantienen save() y CitaQuerySet; un update() de fecha_hora debe escribirlo también.
+    fecha_local = models.DateField(editable=False)
     motivo = models.TextField()
     estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
     notas = models.TextField(blank=True)
+    serie = models.ForeignKey(SerieCitas, on_delete=models.SET_NULL, null=True, blank=True, related_name='citas')
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
+
+    objects = CitaQuerySet.as_manager()
     
     class Meta:
         db_table = 'citas'
         ordering = ['-fecha_hora']
+        indexes = [
+            models.Index(fields=['fecha_hora'], name='citas_fecha_hora_idx'),
+            models.Index(fields=['actualizado_en'], name='citas_actualizado_idx'),
+            models.Index(fields=['medico', 'paciente', 'fecha_hora', 'estado'], name='citas_medico_paciente_idx'),
+            models.Index(fields=['medico', 'fecha_hora'], name='citas_medico_fecha_idx'),
+            models.Index(fields=['fecha_local'], name='citas_fecha_local_idx'),
+            models.Index(fields=['paciente', 'version'], name='citas_paciente_version_idx'),
+            models.Index(fields=['medico', 'version'], name='citas_medico_version_idx'),
+        ]
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
     
     def __str__(self):
         return f"Cita: {self.paciente.username} con Dr. {self.medico.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        cita = super().from_db(db, field_names, values)
+        # Para saber en save() si cambió el estado o el día; de __dict__ por si están diferidos
+        cita._estado_original = cita.__dict__.get('estado')
+        cita._fecha_local_original = cita.__dict__.get('fecha_local')
+        return cita
+
+    def save(self, *args, **kwargs):
+        self.fecha_local = dia_local(self.fecha_hora)
+        campos = kwargs.get('update_fields')
+        if campos is not None and 'fecha_hora' in campos:
+            kwargs['update_fields'] = {*campos, 'fecha_local'}
+        nueva = self._state.adding
+        anterior = getattr(self, '_estado_original', None)
+        dia_anterior = getattr(self, '_fecha_local_original', None)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if dia_anterior not in (None, self.fecha_local) and (campos is None or 'fecha_hora' in campos):
+                DiaPendiente.marcar([dia_anterior])
+            if nueva or (self.estado != anterior and (campos is None or 'estado' in campos)):
+                EventoCita.registrar(
+                    [{campo: getattr(self, campo) for campo in EventoCita.CAMPOS_CITA}],
+                    {} if nueva else {self.pk: anterior},
+                )
+        self._estado_original = self.estado
+        self._fecha_local_original = self.fecha_local
+
+
+class Franja(models.Model):
+    """Tabla: franjas (horario semanal de atención del médico)"""
+    DIAS = [
+        ('MON', 'Lunes'),
+        ('TUE', 'Martes'),
+        ('WED', 'Miércoles'),
+        ('THU', 'Jueves'),
+        ('FRI', 'Viernes'),
+        ('SAT', 'Sábado'),
+        ('SUN', 'Domingo'),
+    ]
+    TIPOS = [
+        ('CONSULTA', 'Consulta'),
+        ('VACUNACION', 'Vacunación'),
+    ]
+
+    medico = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='franjas', limit_choices_to={'rol': 'MEDICO'})
+    dia = models.CharField(max_length=3, choices=DIAS)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    tipo = models.CharField(max_length=20, choices=TIPOS, default='CONSULTA')
+
+    class Meta:
+        db_table = 'franjas'
+        ordering = ['medico', 'dia', 'hora_inicio']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(hora_inicio__lt=models.F('hora_fin')),
+                name='franjas_inicio_antes_fin',
+            ),
+        ]
+        verbose_name = 'Franja'
+        verbose_name_plural = 'Franjas'
+
+    def __str__(self):
+        return f"{self.medico.username}: {self.get_dia_display()} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+
 
 class Recordatorio(models.Model):
     """Tabla: recordatorios"""
@@ -92,6 +363,9 @@ class Recordatorio(models.Model):
     class Meta:
         db_table = 'recordatorios'
         ordering = ['-fecha_envio']
+        indexes = [
+            models.Index(fields=['-fecha_envio'], name='recordatorios_envio_idx'),
+        ]
         verbose_name = 'Recordatorio'
         verbose_name_plural = 'Recordatorios'
     
@@ -99,7 +373,7 @@ class Recordatorio(models.Model):
         return f"Recordatorio: {self.cita}"
 
 
-class Notificacion(models.Model):
+class Notificacion(Versionado):
     """Tabla: notificaciones"""
     TIPOS = [
         ('INFO', 'Información'),
@@ -112,14 +386,351 @@ class Notificacion(models.Model):
     tipo = models.CharField(max_length=20, choices=TIPOS, default='INFO')
     titulo = models.CharField(max_length=200)
     mensaje = models.TextField()
+    # De qué trata (p. ej. "espera:12"): las del mismo tipo y asunto se agrupan en
+    # una fila y 'cantidad' cuenta cuántas representa (ver core/notificaciones.py)
+    asunto = models.CharField(max_length=100, blank=True)
+    cantidad = models.PositiveIntegerField(default=1)
     leida = models.BooleanField(default=False)
+    # Al agrupar se mueve a la última aparición
     creada_en = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'notificaciones'
-        ordering = ['-creada_en']
+        # Sin orden por defecto: cada consulta pide el suyo y las demás no ordenan de más
+        indexes = [
+            models.Index(fields=['usuario', 'leida', '-creada_en'], name='notif_usuario_leida_idx'),
+            models.Index(fields=['-creada_en'], name='notif_creada_idx'),
+            models.Index(fields=['usuario', 'version'], name='notif_usuario_version_idx'),
+        ]
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
     
     def __str__(self):
-        return f"{self.get_tipo_display()}: {self.titulo}"
\ No newline at end of file
+        return f"{self.get_tipo_display()}: {self.titulo}"
+
+
+class EsperaCita(models.Model):
+    """Tabla: lista_espera"""
+    ESTADOS = [
+        ('ESPERANDO', 'Esperando'),
+        ('OFRECIDA', 'Con oferta'),
+        ('ASIGNADA', 'Asignada'),
+        ('RETIRADA', 'Retirada'),
+    ]
+
+    paciente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='esperas', limit_choices_to={'rol': 'PACIENTE'})
+    # Médico concreto o, si es nulo, cualquier médico de la especialidad
+    medico = models.ForeignKey(Usuario, on_delete=models.CASCADE, null=True, blank=True, related_name='esperas_medico', limit_choices_to={'rol': 'MEDICO'})
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.CASCADE, null=True, blank=True)
+    desde = models.DateTimeField()
+    hasta = models.DateTimeField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='ESPERANDO')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'lista_espera'
+        ordering = ['creado_en']
+        indexes = [
+            # Solo las entradas que pueden recibir un hueco (índices parciales)
+            models.Index(
+                fields=['medico', 'desde', 'creado_en'],
+                condition=models.Q(estado='ESPERANDO'),
+                name='espera_medico_idx',
+            ),
+            models.Index(
+                fields=['especialidad', 'desde', 'creado_en'],
+                condition=models.Q(estado='ESPERANDO', medico__isnull=True),
+                name='espera_especialidad_idx',
+            ),
+            models.Index(fields=['paciente', 'estado'], name='espera_paciente_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(medico__isnull=False) | models.Q(especialidad__isnull=False),
+                name='espera_medico_o_especialidad',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(desde__lt=models.F('hasta')),
+                name='espera_ventana_valida',
+            ),
+        ]
+        verbose_name = 'Espera de cita'
+        verbose_name_plural = 'Lista de espera'
+
+    def __str__(self):
+        return f"Espera: {self.paciente.username} ({self.get_estado_display()})"
+
+
+class OfertaHueco(models.Model):
+    """Tabla: ofertas_hueco (hueco liberado ofrecido a una entrada de la lista de espera)"""
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ACEPTADA', 'Aceptada'),
+        ('RECHAZADA', 'Rechazada'),
+        ('VENCIDA', 'Vencida'),
+    ]
+
+    cita_liberada = models.ForeignKey(Cita, on_delete=models.CASCADE, related_name='ofertas')
+    espera = models.ForeignKey(EsperaCita, on_delete=models.CASCADE, related_name='ofertas')
+    cita_asignada = models.ForeignKey(Cita, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+    vence_en = models.DateTimeField()
+    creada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ofertas_hueco'
+        ordering = ['-creada_en']
+        indexes = [
+            models.Index(fields=['vence_en'], condition=models.Q(estado='PENDIENTE'), name='ofertas_pendientes_idx'),
+        ]
+        constraints = [
+            # Un hueco se ofrece a una sola entrada a la vez (cancelaciones concurrentes)
+            models.UniqueConstraint(
+                fields=['cita_liberada'],
+                condition=models.Q(estado='PENDIENTE'),
+                name='ofertas_una_pendiente_por_hueco',
+            ),
+            # Y nunca dos veces a la misma entrada
+            models.UniqueConstraint(fields=['cita_liberada', 'espera'], name='ofertas_hueco_espera_unica'),
+        ]
+        verbose_name = 'Oferta de hueco'
+        verbose_name_plural = 'Ofertas de huecos'
+
+    def __str__(self):
+        return f"Oferta: {self.cita_liberada.fecha_hora:%d/%m/%Y %H:%M} ({self.get_estado_display()})"
+
+
+class ResumenDiario(models.Model):
+    """Tabla: resumenes_diarios (agregados por día, médico y especialidad)"""
+    fecha = models.DateField()
+    medico = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    especialidad = models.ForeignKey(Especialidad, on_delete=models.SET_NULL, null=True, blank=True)
+    total_citas = models.PositiveIntegerField(default=0)
+    pendientes = models.PositiveIntegerField(default=0)
+    confirmadas = models.PositiveIntegerField(default=0)
+    canceladas = models.PositiveIntegerField(default=0)
+    completadas = models.PositiveIntegerField(default=0)
+    no_asistidas = models.PositiveIntegerField(default=0)
+    pacientes_unicos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'resumenes_diarios'
+        ordering = ['fecha']
+        indexes = [
+            models.Index(fields=['fecha'], name='resumenes_fecha_idx'),
+        ]
+        verbose_name = 'Resumen diario'
+        verbose_name_plural = 'Resúmenes diarios'
+
+    def __str__(self):
+        return f"Resumen {self.fecha}: {self.medico.username}"
+
+
+class PacientesDiarios(models.Model):
+    """
+    Tabla: pacientes_diarios (pacientes distintos por día, entre todos los
+    médicos; no sale de sumar ResumenDiario)
+    """
+    fecha = models.DateField(unique=True)
+    pacientes_unicos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'pacientes_diarios'
+        verbose_name = 'Pacientes del día'
+        verbose_name_plural = 'Pacientes por día'
+
+    def __str__(self):
+        return f"{self.fecha}: {self.pacientes_unicos} pacientes"
+
+
+class MarcaProceso(models.Model):
+    """Tabla: marcas_proceso (hasta dónde llegó cada proceso incremental)"""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultima_ejecucion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'marcas_proceso'
+        verbose_name = 'Marca de proceso'
+        verbose_name_plural = 'Marcas de proceso'
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultima_ejecucion}"
+
+
+class DiaPendiente(models.Model):
+    """
+    Tabla: dias_pendientes (días cuyo resumen diario hay que recalcular).
+
+    Un día que una cita deja al moverse o borrarse ya no aparece en ninguna
+    ``fecha_local``; se marca aquí, en la misma transacción, y
+    ``actualizar_resumenes`` lo recalcula y borra la marca. Se permiten
+    repetidos: así una marca nueva nunca choca con una que se está
+    procesando.
+    """
+    fecha = models.DateField()
+
+    class Meta:
+        db_table = 'dias_pendientes'
+        verbose_name = 'Día pendiente'
+        verbose_name_plural = 'Días pendientes'
+
+    def __str__(self):
+        return f"Pendiente: {self.fecha}"
+
+    @classmethod
+    def marcar(cls, dias):
+        dias = set(dias)
+        if dias:
+            cls.objects.bulk_create([cls(fecha=dia) for dia in dias])
+
+
+class AccesoPaciente(models.Model):
+    """
+    Tabla: accesos_pacientes (auditoría de quién vio los datos de qué paciente).
+
+    Las filas se escriben por lotes desde core/auditoria.py. Sin claves
+    foráneas en la base para que el registro sobreviva al borrado de usuarios
+    o citas y la inserción no tenga que comprobar otras tablas; los únicos
+    índices son los compuestos por paciente y por médico.
+    """
+    VISTAS = [
+        ('CITA', 'Detalle de cita'),
+        ('FICHA', 'Ficha del paciente'),
+        ('HISTORIAL', 'Historial del paciente'),
+        ('ROSTER', 'Listado de pacientes'),
+    ]
+
+    medico = models.ForeignKey(
+        Usuario, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    paciente = models.ForeignKey(
+        Usuario, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    cita_id = models.BigIntegerField(null=True, blank=True)
+    vista = models.CharField(max_length=10, choices=VISTAS)
+    momento = models.DateTimeField()
+
+    class Meta:
+        db_table = 'accesos_pacientes'
+        verbose_name = 'Acceso a paciente'
+        verbose_name_plural = 'Accesos a pacientes'
+        indexes = [
+            models.Index(fields=['paciente', '-momento'], name='accesos_paciente_idx'),
+            models.Index(fields=['medico', '-momento'], name='accesos_medico_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.medico_id} vio {self.paciente_id} ({self.vista}) {self.momento}"
+
+
+class BorradoSync(models.Model):
+    """
+    Tabla: borrados_sync (lápidas de citas y notificaciones eliminadas).
+
+    Las escriben las señales post_delete (core/signals.py) para que la app
+    móvil quite las filas que ya tenía; una por cada usuario que veía la fila.
+    Sin clave foránea, como AccesoPaciente: la lápida queda aunque se borre
+    el usuario. ``purgar_borrados_sync`` elimina las antiguas.
+    """
+    MODELOS = [
+        ('CITA', 'Cita'),
+        ('NOTIFICACION', 'Notificación'),
+    ]
+
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    version = models.BigIntegerField()
+    borrado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'borrados_sync'
+        verbose_name = 'Borrado sincronizado'
+        verbose_name_plural = 'Borrados sincronizados'
+        indexes = [
+            models.Index(fields=['usuario', 'version'], name='borrados_usuario_version_idx'),
+            models.Index(fields=['borrado_en'], name='borrados_momento_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} borrado para {self.usuario_id} (v{self.version})"
+
+
+class EventoCita(models.Model):
+    """
+    Tabla: eventos_citas (bandeja de salida para integraciones externas).
+
+    Una fila por cita creada y por cada cambio de estado, escrita en la misma
+    transacción que el cambio (Cita.save y CitaQuerySet), así un consumidor
+    ve todos los estados intermedios y nunca uno que se deshizo. Se escribe
+    después de tomar SecuenciaSync, que serializa las escrituras de citas:
+    los ids crecen en orden de commit y sirven de cursor (core/eventos.py).
+    Sin claves foráneas, como AccesoPaciente: el evento sobrevive a la cita.
+    """
+    TIPOS = [
+        ('CREADA', 'Cita creada'),
+        ('ESTADO', 'Cambio de estado'),
+    ]
+    CAMPOS_CITA = ('pk', 'paciente_id', 'medico_id', 'especialidad_id', 'fecha_hora', 'estado')
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    cita_id = models.BigIntegerField()
+    paciente_id = models.BigIntegerField()
+    medico_id = models.BigIntegerField()
+    especialidad_id = models.BigIntegerField(null=True, blank=True)
+    fecha_hora = models.DateTimeField()
+    estado_anterior = models.CharField(max_length=20, blank=True)
+    estado = models.CharField(max_length=20)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'eventos_citas'
+        verbose_name = 'Evento de cita'
+        verbose_name_plural = 'Eventos de citas'
+        indexes = [
+            models.Index(fields=['creado_en'], name='eventos_creado_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} cita {self.cita_id}: {self.estado_anterior or '-'} -> {self.estado}"
+
+    @classmethod
+    def registrar(cls, filas, anteriores):
+        """
+        Eventos de ``filas`` (dicts con CAMPOS_CITA). Las que están en
+        ``anteriores`` (pk -> estado previo) son cambios de estado y solo se
+        registran si el estado cambió; las demás son citas nuevas.
+        """
+        eventos = []
+        for fila in filas:
+            if fila['pk'] not in anteriores:
+                tipo, anterior = 'CREADA', ''
+            elif anteriores[fila['pk']] != fila['estado']:
+                tipo, anterior = 'ESTADO', anteriores[fila['pk']] or ''
+            else:
+                continue
+            eventos.append(cls(
+                tipo=tipo, cita_id=fila['pk'], paciente_id=fila['paciente_id'], medico_id=fila['medico_id'],
+                especialidad_id=fila['especialidad_id'], fecha_hora=fila['fecha_hora'],
+                estado_anterior=anterior, estado=fila['estado'],
+            ))
+        if eventos:
+            cls.objects.bulk_create(eventos)
+
+
+class ConsumidorEventos(models.Model):
+    """Tabla: consumidores_eventos (hasta qué EventoCita confirmó cada integración)"""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    confirmado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'consumidores_eventos'
+        verbose_name = 'Consumidor de eventos'
+        verbose_name_plural = 'Consumidores de eventos'
+
+    def __str__(self):
+        return f"{self.nombre}: hasta #{self.ultimo_id}"
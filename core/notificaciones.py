@@ -0,0 +1,244 @@
+"""
+Notificaciones: creación agrupada, contador de no leídas, últimas N y
+mantenimiento.
+
+El contador vive en la caché por usuario y se mantiene al crear
+notificaciones (señal post_save) y al marcarlas como leídas
+(``marcar_leidas``), siempre al confirmar la transacción. Si la clave no
+existe se recalcula con un COUNT sobre el índice ``(usuario, leida,
+creada_en)``; el valor vence a los DURACION_CACHE segundos, así que un
+recálculo que se cruce con un ajuste no deja el contador mal para siempre.
+
+Para que las filas de cada usuario no crezcan sin límite:
+
+* ``notificar`` agrupa en una sola fila, con ``cantidad``, las notificaciones
+  sin leer del mismo tipo y asunto dentro de NOTIFICACIONES_VENTANA_AGRUPAR.
+* ``compactar_leidas`` junta las leídas antiguas del mismo tipo y asunto.
+* ``purgar`` elimina las que superan la retención.
+
+Las dos últimas las corre ``manage.py purgar_notificaciones`` por lotes.
+"""
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import Notificacion, Usuario
+from .sincronizacion import borrado_en_lote, registrar_borrados
+
+LIMITE_RECIENTES = 5
+DURACION_CACHE = 5 * 60
+
+
+def notificar(usuario_id, titulo, mensaje, tipo='INFO', asunto=''):
+    """
+    Crea una notificación para el usuario. Si ya tiene una sin leer del mismo
+    ``tipo`` y ``asunto`` de hace menos de NOTIFICACIONES_VENTANA_AGRUPAR, la
+    actualiza con el texto nuevo, suma 1 a ``cantidad`` y la sube al
+    principio. Sin asunto no se agrupa.
+    """
+    ahora = timezone.now()
+    if asunto:
+        desde = ahora - timedelta(seconds=settings.NOTIFICACIONES_VENTANA_AGRUPAR)
+        anterior = (
+            Notificacion.objects
+            .filter(usuario_id=usuario_id, leida=False, tipo=tipo, asunto=asunto, creada_en__gte=desde)
+            .order_by('-creada_en')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        # Si se leyó entre la búsqueda y el UPDATE no se toca: va una nueva
+        if anterior and Notificacion.objects.filter(pk=anterior, leida=False).update(
+            titulo=titulo, mensaje=mensaje, cantidad=F('cantidad') + 1, creada_en=ahora
+        ):
+            return
+    Notificacion.objects.create(usuario_id=usuario_id, tipo=tipo, titulo=titulo, mensaje=mensaje, asunto=asunto)
+
+
+def notificar_varios(avisos):
+    """
+    ``notificar`` para muchos avisos (dicts con sus argumentos) con un número
+    fijo de consultas: una lectura de las agrupables, un ``bulk_update`` y un
+    ``bulk_create``. Los avisos del mismo tipo y asunto dentro del lote
+    también se agrupan.
+    """
+    ahora = timezone.now()
+    avisos = [{'tipo': 'INFO', 'asunto': '', **aviso} for aviso in avisos]
+    claves = {(aviso['usuario_id'], aviso['tipo'], aviso['asunto']) for aviso in avisos if aviso['asunto']}
+    with transaction.atomic():
+        agrupables = {}
+        if claves:
+            filas = (
+                Notificacion.objects
+                .select_for_update()
+                .filter(
+                    usuario_id__in={usuario_id for usuario_id, _, _ in claves},
+                    tipo__in={tipo for _, tipo, _ in claves},
+                    asunto__in={asunto for _, _, asunto in claves},
+                    leida=False,
+                    creada_en__gte=ahora - timedelta(seconds=settings.NOTIFICACIONES_VENTANA_AGRUPAR),
+                )
+                .order_by('creada_en')
+                .only('id', 'usuario_id', 'tipo', 'asunto', 'cantidad')
+            )
+            # En orden de creación: queda la más reciente de cada clave
+            agrupables = {(n.usuario_id, n.tipo, n.asunto): n for n in filas}
+
+        agrupadas, nuevas = {}, []
+        for aviso in avisos:
+            clave = (aviso['usuario_id'], aviso['tipo'], aviso['asunto'])
+            notificacion = agrupables.get(clave) if aviso['asunto'] else None
+            if notificacion is None:
+                notificacion = Notificacion(**aviso)
+                nuevas.append(notificacion)
+                if aviso['asunto']:
+                    agrupables[clave] = notificacion
+                continue
+            notificacion.titulo, notificacion.mensaje = aviso['titulo'], aviso['mensaje']
+            notificacion.cantidad += 1
+            notificacion.creada_en = ahora
+            if notificacion.pk:
+                agrupadas[notificacion.pk] = notificacion
+        if agrupadas:
+            Notificacion.objects.bulk_update(agrupadas.values(), ['titulo', 'mensaje', 'cantidad', 'creada_en'])
+        # bulk_create no envía post_save: el contador se ajusta aquí
+        Notificacion.objects.bulk_create(nuevas)
+        for usuario_id, creadas in Counter(n.usuario_id for n in nuevas).items():
+            transaction.on_commit(partial(sumar_sin_leer, usuario_id, creadas))
+
+
+def _clave(usuario_id):
+    return f'notif:sin_leer:{usuario_id}'
+
+
+def contar_sin_leer(usuario_id):
+    """Cantidad de notificaciones sin leer (sin consulta si está en caché)."""
+    total = cache.get(_clave(usuario_id))
+    if total is None:
+        total = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+        # add: si un ajuste creó la clave mientras se contaba, no se pisa
+        cache.add(_clave(usuario_id), total, DURACION_CACHE)
+    return total
+
+
+def sumar_sin_leer(usuario_id, cantidad=1):
+    """Ajusta el contador en caché; si no existe se recalculará al leerlo."""
+    try:
+        if cantidad >= 0:
+            cache.incr(_clave(usuario_id), cantidad)
+        else:
+            cache.decr(_clave(usuario_id), -cantidad)
+    except ValueError:
+        pass
+
+
+def invalidar_contador(usuario_id):
+    cache.delete(_clave(usuario_id))
+
+
+def recientes_sin_leer(usuario_id, limite=LIMITE_RECIENTES):
+    """Últimas ``limite`` notificaciones sin leer (queryset perezoso)."""
+    return (
+        Notificacion.objects
+        .filter(usuario_id=usuario_id, leida=False)
+        .only('id', 'tipo', 'titulo', 'mensaje', 'cantidad', 'creada_en')
+        .order_by('-creada_en')[:limite]
+    )
+
+
+def resumen(usuario_id, limite=LIMITE_RECIENTES):
+    """
+    Contexto para las plantillas: contador y últimas no leídas.
+
+    Con el contador en caché y en cero no se ejecuta ninguna consulta; en
+    otro caso solo la de las últimas ``limite``, y únicamente si la plantilla
+    las recorre.
+    """
+    sin_leer = contar_sin_leer(usuario_id)
+    return {
+        'notificaciones_sin_leer': sin_leer,
+        'notificaciones_recientes': recientes_sin_leer(usuario_id, limite) if sin_leer else [],
+    }
+
+
+def marcar_leidas(usuario_id, ids=None):
+    """Marca como leídas todas las notificaciones del usuario (o las ``ids``)."""
+    pendientes = Notificacion.objects.filter(usuario_id=usuario_id, leida=False)
+    if ids is not None:
+        pendientes = pendientes.filter(id__in=ids)
+    marcadas = pendientes.update(leida=True)
+    if marcadas:
+        transaction.on_commit(partial(sumar_sin_leer, usuario_id, -marcadas))
+    return marcadas
+
+
+# --- mantenimiento (manage.py purgar_notificaciones) ---
+
+def compactar_leidas(antes_de, lote=1000):
+    """
+    Junta en la de id mayor las notificaciones leídas anteriores a
+    ``antes_de`` con el mismo usuario, tipo y asunto, sumando ``cantidad``.
+    Recorre los usuarios de ``lote`` en ``lote``, una transacción por lote;
+    devuelve cuántas filas eliminó.
+    """
+    eliminadas, desde = 0, 0
+    while True:
+        usuarios = list(Usuario.objects.filter(pk__gt=desde).order_by('pk').values_list('pk', flat=True)[:lote])
+        if not usuarios:
+            return eliminadas
+        desde = usuarios[-1]
+        antiguas = Notificacion.objects.filter(usuario_id__in=usuarios, leida=True, creada_en__lt=antes_de)
+        grupos = list(
+            antiguas
+            .values('usuario_id', 'tipo', 'asunto')
+            .annotate(filas=Count('pk'), total=Sum('cantidad'), ultima=Max('pk'))
+            .filter(filas__gt=1)
+            .order_by()
+        )
+        if not grupos:
+            continue
+        ultimas = {(g['usuario_id'], g['tipo'], g['asunto']): g['ultima'] for g in grupos}
+        sobrantes = [
+            pk for pk, *grupo in antiguas.filter(usuario_id__in={g['usuario_id'] for g in grupos})
+            .values_list('pk', 'usuario_id', 'tipo', 'asunto')
+            if ultimas.get(tuple(grupo), pk) != pk
+        ]
+        with transaction.atomic():
+            Notificacion.objects.bulk_update(
+                [Notificacion(pk=g['ultima'], cantidad=g['total']) for g in grupos], ['cantidad']
+            )
+            for i in range(0, len(sobrantes), lote):
+                eliminadas += eliminar(sobrantes[i:i + lote])
+
+
+def purgar(antes_de, lote=1000):
+    """Elimina las notificaciones anteriores a ``antes_de``, ``lote`` por transacción."""
+    eliminadas = 0
+    while True:
+        ids = list(
+            Notificacion.objects.filter(creada_en__lt=antes_de)
+            .order_by('creada_en').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return eliminadas
+        eliminadas += eliminar(ids)
+
+
+def eliminar(ids):
+    """
+    Borra las notificaciones ``ids`` con las lápidas de la app móvil en un
+    solo INSERT, en vez de una por fila desde la señal post_delete.
+    """
+    with transaction.atomic():
+        filas = list(Notificacion.objects.filter(pk__in=ids).values_list('pk', 'usuario_id'))
+        registrar_borrados('NOTIFICACION', filas)
+        with borrado_en_lote():
+            eliminadas = Notificacion.objects.filter(pk__in=[pk for pk, _ in filas]).delete()[0]
+    for usuario_id in {usuario_id for _, usuario_id in filas}:
+        invalidar_contador(usuario_id)
+    return eliminadas
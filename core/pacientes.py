@@ -0,0 +1,126 @@
+"""
+Listado de pacientes de un médico.
+
+Una sola consulta agrupada sobre ``citas`` (índice ``medico, paciente,
+fecha_hora, estado``) devuelve cada paciente con su última visita, su próxima
+cita, el total de visitas y las cancelaciones. La paginación es por cursor
+(keyset): la página siguiente se pide con los valores de la última fila, así
+el costo no crece con el número de página.
+"""
+import base64
+import json
+
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Cita
+from .reportes import ESTADOS_ABIERTOS, ESTADOS_COMPLETADOS
+
+POR_PAGINA = 24
+
+# Orden disponible -> (columna, es fecha)
+ORDENES = {
+    'nombre': ('nombre', False),
+    'ultima_visita': ('ultima_visita', True),
+    'proxima_visita': ('proxima_visita', True),
+    'total_visitas': ('total_visitas', False),
+    'cancelaciones': ('cancelaciones', False),
+}
+ORDEN_POR_DEFECTO = 'ultima_visita'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valor, paciente_id):
+    if hasattr(valor, 'isoformat'):
+        valor = valor.isoformat()
+    datos = json.dumps([valor, paciente_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, es_fecha):
+    try:
+        datos = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valor, paciente_id = json.loads(datos)
+        paciente_id = int(paciente_id)
+    except (ValueError, TypeError):
+        raise CursorInvalido(cursor)
+    if es_fecha and valor is not None:
+        valor = parse_datetime(valor)
+        if valor is None:
+            raise CursorInvalido(cursor)
+    return valor, paciente_id
+
+
+def pacientes_del_medico(medico):
+    """Queryset agrupado: una fila (dict) por paciente con sus estadísticas."""
+    ahora = timezone.now()
+    return (
+        Cita.objects
+        .filter(medico=medico)
+        .order_by()
+        .values('paciente')
+        .annotate(
+            ultima_visita=Max(
+                'fecha_hora', filter=Q(estado__in=ESTADOS_COMPLETADOS, fecha_hora__lt=ahora)
+            ),
+            proxima_visita=Min(
+                'fecha_hora', filter=Q(estado__in=ESTADOS_ABIERTOS, fecha_hora__gte=ahora)
+            ),
+            total_visitas=Count('pk', filter=Q(estado__in=ESTADOS_COMPLETADOS)),
+            cancelaciones=Count('pk', filter=Q(estado='CANCELADA')),
+            nombre=F('paciente__first_name'),
+            apellido=F('paciente__last_name'),
+            username=F('paciente__username'),
+            email=F('paciente__email'),
+            telefono=F('paciente__telefono'),
+        )
+    )
+
+
+def _despues_de(columna, valor, paciente_id, descendente):
+    """Filas posteriores al cursor en el orden (columna NULLS LAST, paciente)."""
+    sentido = 'lt' if descendente else 'gt'
+    if valor is None:
+        return Q(**{f'{columna}__isnull': True, f'paciente__{sentido}': paciente_id})
+    return (
+        Q(**{f'{columna}__{sentido}': valor})
+        | Q(**{columna: valor, f'paciente__{sentido}': paciente_id})
+        | Q(**{f'{columna}__isnull': True})
+    )
+
+
+def pagina_de_pacientes(medico, orden=ORDEN_POR_DEFECTO, descendente=True, cursor=None,
+                        por_pagina=POR_PAGINA):
+    """
+    Devuelve ``(filas, cursor_siguiente)``; ``cursor_siguiente`` es ``None``
+    en la última página. Lanza ``CursorInvalido`` si el cursor no se puede leer.
+    """
+    columna, es_fecha = ORDENES[orden]
+    filas = pacientes_del_medico(medico)
+
+    if cursor:
+        valor, paciente_id = decodificar_cursor(cursor, es_fecha)
+        filas = filas.filter(_despues_de(columna, valor, paciente_id, descendente))
+
+    if descendente:
+        filas = filas.order_by(F(columna).desc(nulls_last=True), '-paciente')
+    else:
+        filas = filas.order_by(F(columna).asc(nulls_last=True), 'paciente')
+
+    filas = list(filas[:por_pagina + 1])
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(ultima[columna], ultima['paciente'])
+    return filas, siguiente
+
+
+def total_pacientes(medico):
+    return Cita.objects.filter(medico=medico).aggregate(
+        total=Count('paciente', distinct=True)
+    )['total']
@@ -0,0 +1,56 @@
+"""
+Paginador con conteo estimado para tablas grandes (admin).
+
+Sin filtros, el total se toma de las estadísticas del motor (``pg_class`` en
+PostgreSQL, ``information_schema`` en MySQL, el ``rowid`` máximo en SQLite)
+en lugar de un ``COUNT(*)`` que recorre la tabla. Con filtros se cuenta de
+verdad, pero solo hasta ``LIMITE_CONTEO_EXACTO`` filas.
+"""
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+LIMITE_CONTEO_EXACTO = 10000
+
+
+def estimar_filas(modelo, using='default'):
+    """Filas aproximadas de la tabla de ``modelo`` o ``None`` si no hay estimación."""
+    conexion = connections[using]
+    tabla = modelo._meta.db_table
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [tabla])
+        elif conexion.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [tabla],
+            )
+        elif conexion.vendor == 'sqlite':
+            cursor.execute(f'SELECT MAX(rowid) FROM {conexion.ops.quote_name(tabla)}')
+        else:
+            return None
+        fila = cursor.fetchone()
+    if not fila or fila[0] is None or fila[0] < 0:
+        # PostgreSQL devuelve -1 si la tabla nunca se analizó
+        return None
+    return int(fila[0])
+
+
+class ConteoEstimadoPaginator(Paginator):
+    limite_exacto = LIMITE_CONTEO_EXACTO
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list
+        if not isinstance(consulta, QuerySet):
+            return super().count
+
+        if not consulta.query.where and not consulta.query.distinct:
+            estimado = estimar_filas(consulta.model, consulta.db)
+            if estimado is not None and estimado > self.limite_exacto:
+                return estimado
+
+        # Conteo exacto acotado: SELECT COUNT(*) FROM (... LIMIT n)
+        return consulta.order_by()[:self.limite_exacto].count()
@@ -0,0 +1,55 @@
+"""
+Presupuestos de consultas SQL por vista.
+
+Cada vista declara con ``@presupuesto_consultas(n)`` cuántas consultas puede
+hacer una petición completa (middleware, vista y plantilla), sin importar
+cuántos datos haya. ``manage.py verificar_presupuestos`` lo comprueba con un
+conjunto de datos pequeño y otro grande; en desarrollo,
+``PresupuestoConsultasMiddleware`` (core/middleware.py) avisa en el log cuando una petición real
+lo supera.
+
+No se cuentan BEGIN ni los SAVEPOINT de ``transaction.atomic``: dependen de
+si la petición corre dentro de otra transacción, no de la vista. En las
+respuestas en streaming el presupuesto incluye las consultas hechas mientras
+se envía el cuerpo; el middleware y el comando las cuentan al consumirlo.
+"""
+from django.db import connection
+
+NO_CUENTAN = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN')
+
+
+def presupuesto_consultas(maximo):
+    """Declara el máximo de consultas de la vista (va por fuera de los demás decoradores)."""
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+def presupuesto_de(vista):
+    return getattr(vista, 'presupuesto_consultas', None)
+
+
+def es_consulta(sql):
+    return not sql.lstrip().upper().startswith(NO_CUENTAN)
+
+
+class ContadorConsultas:
+    """Cuenta las consultas ejecutadas en ``connection`` mientras está activo."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if es_consulta(sql):
+            self.total += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._contexto = connection.execute_wrapper(self)
+        self._contexto.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._contexto.__exit__(*exc)
+
@@ -0,0 +1,57 @@
+"""
+Alta de usuarios.
+
+La unicidad de ``username`` y de ``email`` (sin distinguir mayúsculas) la
+garantizan los índices únicos de la tabla ``usuarios``: se inserta
+directamente y, si hay conflicto, se captura ``IntegrityError``. Solo en ese
+caso se consulta qué campo chocó, para dar un mensaje preciso.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import Usuario
+
+ROLES_REGISTRO = ('PACIENTE', 'MEDICO')
+
+
+class RegistroError(Exception):
+    def __init__(self, campo, mensaje):
+        super().__init__(mensaje)
+        self.campo = campo
+        self.mensaje = mensaje
+
+
+def normalizar_email(email):
+    return Usuario.objects.normalize_email(email.strip()).lower()
+
+
+def campo_duplicado(username, email):
+    """Qué campo provocó el conflicto de unicidad ('username' o 'email')."""
+    if Usuario.objects.filter(username=username).exists():
+        return 'username'
+    return 'email'
+
+
+def mensaje_duplicado(campo):
+    if campo == 'username':
+        return 'El nombre de usuario ya está en uso'
+    return 'El email ya está registrado'
+
+
+def registrar_usuario(username, email, password, rol='PACIENTE', **extra):
+    """Crea el usuario o lanza ``RegistroError`` si el username o el email ya existen."""
+    if rol not in ROLES_REGISTRO:
+        raise RegistroError('rol', 'Rol no válido')
+
+    email = normalizar_email(email)
+    try:
+        with transaction.atomic():
+            return Usuario.objects.create_user(
+                username=username,
+                email=email,
+                password=password,
+                rol=rol,
+                **extra
+            )
+    except IntegrityError:
+        campo = campo_duplicado(username, email)
+        raise RegistroError(campo, mensaje_duplicado(campo))
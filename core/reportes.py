@@ -0,0 +1,198 @@
+"""
+Agregados diarios de citas para la sección de reportes.
+
+Los reportes leen de ``ResumenDiario`` (una fila por día, médico y
+especialidad) en lugar de recorrer ``citas`` en cada petición. El comando
+``actualizar_resumenes`` mantiene la tabla al día recalculando solo los días
+tocados desde la última ejecución: los de las citas modificadas y los que
+las citas movidas o borradas dejaron (``DiaPendiente``). Los días se leen de
+la columna indexada ``Cita.fecha_local`` (día en hora de Lima), no con
+``TruncDate``.
+
+``pacientes_unicos`` no se puede sumar entre médicos y especialidades (un
+paciente cuenta en cada fila): el total del día se guarda aparte en
+``PacientesDiarios``.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import fechas
+from .models import Cita, DiaPendiente, MarcaProceso, PacientesDiarios, ResumenDiario
+
+MARCA_RESUMENES = 'resumenes_diarios'
+
+ESTADOS_COMPLETADOS = ['COMPLETADA', 'ATENDIDA']
+ESTADOS_ABIERTOS = ['PENDIENTE', 'CONFIRMADA']
+
+CAMPOS_SUMABLES = [
+    'total_citas', 'pendientes', 'confirmadas', 'canceladas',
+    'completadas', 'no_asistidas',
+]
+
+
+def dias_tocados(desde, pendientes_hasta=None):
+    """
+    Días locales cuyas citas cambiaron después de ``desde``, más los marcados
+    en ``DiaPendiente`` hasta el id ``pendientes_hasta``.
+
+    Incluye además los días transcurridos entre ``desde`` y hoy, porque las
+    inasistencias aparecen solo con el paso del tiempo sin que la cita cambie.
+    """
+    dias = set(
+        Cita.objects
+        .filter(actualizado_en__gt=desde)
+        .order_by()
+        .values_list('fecha_local', flat=True)
+        .distinct()
+    )
+    if pendientes_hasta is not None:
+        dias.update(
+            DiaPendiente.objects.filter(pk__lte=pendientes_hasta).values_list('fecha', flat=True).distinct()
+        )
+    hoy = fechas.hoy()
+    dia = fechas.dia_local(desde)
+    while dia <= hoy:
+        dias.add(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+def _tramos(dias):
+    """Agrupa días sueltos en tramos contiguos ``(primero, ultimo)``."""
+    tramos = []
+    for dia in sorted(dias):
+        if tramos and dia - tramos[-1][1] == timedelta(days=1):
+            tramos[-1][1] = dia
+        else:
+            tramos.append([dia, dia])
+    return tramos
+
+
+def recalcular_dias(dias):
+    """
+    Recalcula los resúmenes de los días indicados.
+
+    Cada tramo contiguo se resuelve con una consulta agrupada sobre el rango
+    de ``fecha_local`` (y otra para los pacientes distintos del día) y se
+    reemplaza dentro de una transacción. Devuelve la cantidad de filas de
+    resumen escritas.
+    """
+    ahora = timezone.now()
+    escritas = 0
+    for primero, ultimo in _tramos(dias):
+        filas = (
+            Cita.objects
+            .filter(fecha_local__gte=primero, fecha_local__lte=ultimo)
+            .order_by()
+            .values('fecha_local', 'medico_id', 'especialidad_id')
+            .annotate(
+                total_citas=Count('id'),
+                pendientes=Count('id', filter=Q(estado='PENDIENTE')),
+                confirmadas=Count('id', filter=Q(estado='CONFIRMADA')),
+                canceladas=Count('id', filter=Q(estado='CANCELADA')),
+                completadas=Count('id', filter=Q(estado__in=ESTADOS_COMPLETADOS)),
+                no_asistidas=Count('id', filter=Q(estado__in=ESTADOS_ABIERTOS, fecha_hora__lt=ahora)),
+                pacientes_unicos=Count('paciente', distinct=True),
+            )
+        )
+        resumenes = [
+            ResumenDiario(
+                fecha=fila.pop('fecha_local'),
+                medico_id=fila.pop('medico_id'),
+                especialidad_id=fila.pop('especialidad_id'),
+                **fila
+            )
+            for fila in filas
+        ]
+        pacientes = [
+            PacientesDiarios(fecha=fecha, pacientes_unicos=total)
+            for fecha, total in (
+                Cita.objects
+                .filter(fecha_local__gte=primero, fecha_local__lte=ultimo)
+                .order_by()
+                .values('fecha_local')
+                .annotate(total=Count('paciente', distinct=True))
+                .values_list('fecha_local', 'total')
+            )
+        ]
+        with transaction.atomic():
+            ResumenDiario.objects.filter(fecha__gte=primero, fecha__lte=ultimo).delete()
+            ResumenDiario.objects.bulk_create(resumenes, batch_size=500)
+            PacientesDiarios.objects.filter(fecha__gte=primero, fecha__lte=ultimo).delete()
+            PacientesDiarios.objects.bulk_create(pacientes, batch_size=500)
+        escritas += len(resumenes)
+    return escritas
+
+
+def actualizar_resumenes(completo=False):
+    """
+    Procesa los días tocados desde la última ejecución y avanza la marca.
+
+    La marca y el último ``DiaPendiente`` se toman antes de consultar, de
+    modo que las citas modificadas durante la ejecución se vuelven a procesar
+    en la siguiente. Devuelve ``(dias_procesados, filas_escritas)``.
+    """
+    inicio = timezone.now()
+    marca, _ = MarcaProceso.objects.get_or_create(nombre=MARCA_RESUMENES)
+    pendientes_hasta = DiaPendiente.objects.order_by('-pk').values_list('pk', flat=True).first()
+
+    # Una sola transacción: en la reconstrucción completa los lectores siguen
+    # viendo los resúmenes anteriores hasta el final y, si algo falla, quedan
+    # intactos junto con la marca y los días pendientes
+    with transaction.atomic():
+        if completo or marca.ultima_ejecucion is None:
+            ResumenDiario.objects.all().delete()
+            PacientesDiarios.objects.all().delete()
+            dias = set(Cita.objects.order_by().values_list('fecha_local', flat=True).distinct())
+        else:
+            dias = dias_tocados(marca.ultima_ejecucion, pendientes_hasta)
+
+        escritas = recalcular_dias(dias)
+        if pendientes_hasta is not None:
+            DiaPendiente.objects.filter(pk__lte=pendientes_hasta).delete()
+        marca.ultima_ejecucion = inicio
+        marca.save(update_fields=['ultima_ejecucion'])
+    return len(dias), escritas
+
+
+def series_diarias(desde, hasta):
+    """
+    Serie por día (una fila por fecha) entre ``desde`` y ``hasta`` inclusive.
+
+    ``pacientes_unicos`` se lee de ``PacientesDiarios``: la suma de las filas
+    del resumen contaría dos veces al paciente que vio a dos médicos el mismo
+    día.
+    """
+    pacientes = dict(
+        PacientesDiarios.objects
+        .filter(fecha__gte=desde, fecha__lte=hasta)
+        .values_list('fecha', 'pacientes_unicos')
+    )
+    serie = list(
+        ResumenDiario.objects
+        .filter(fecha__gte=desde, fecha__lte=hasta)
+        .values('fecha')
+        .annotate(**{campo: Sum(campo) for campo in CAMPOS_SUMABLES})
+        .order_by('fecha')
+    )
+    for fila in serie:
+        fila['pacientes_unicos'] = pacientes.get(fila['fecha'], 0)
+    return serie
+
+
+def totales_por(campo, desde, hasta):
+    """Totales del periodo agrupados por ``campo`` (p. ej. ``medico__username``)."""
+    return list(
+        ResumenDiario.objects
+        .filter(fecha__gte=desde, fecha__lte=hasta)
+        .values(campo)
+        .annotate(
+            total_citas=Sum('total_citas'),
+            canceladas=Sum('canceladas'),
+            no_asistidas=Sum('no_asistidas'),
+        )
+        .order_by('-total_citas')
+    )
@@ -0,0 +1,176 @@
+"""
+Series de citas recurrentes (semanal o mensual, con número de repeticiones o
+fecha final, al estilo de RRULE).
+
+Crear una serie son tres consultas: se expanden las ocurrencias en memoria,
+se comparan con la agenda del médico en una sola consulta por rango y las que
+no chocan se insertan con un único ``bulk_create``. Mover o cancelar la serie
+es un solo UPDATE sobre sus citas futuras.
+"""
+import calendar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from .disponibilidad import DURACION_TURNO, turno_ocupado
+from .fechas import dia_local
+from .models import Cita, SerieCitas
+from .reportes import ESTADOS_ABIERTOS
+
+MAX_OCURRENCIAS = 104
+
+
+class SerieError(Exception):
+    pass
+
+
+def _sumar_meses(fecha, meses):
+    """Misma fecha ``meses`` después, o ``None`` si ese mes no tiene el día."""
+    mes = fecha.month - 1 + meses
+    anio, mes = fecha.year + mes // 12, mes % 12 + 1
+    if fecha.day > calendar.monthrange(anio, mes)[1]:
+        return None
+    return fecha.replace(year=anio, month=mes)
+
+
+def expandir(inicio, frecuencia, intervalo=1, repeticiones=None, hasta=None):
+    """
+    Fechas de la serie en hora local (misma hora de pared aunque cambie el
+    horario de verano). Como RRULE, los meses sin el día de inicio (p. ej. el
+    31) se saltan. Se corta en ``repeticiones``, en ``hasta`` (fecha incluida)
+    o en MAX_OCURRENCIAS.
+    """
+    if repeticiones is None and hasta is None:
+        raise SerieError('Indica el número de repeticiones o la fecha final')
+    limite = min(repeticiones or MAX_OCURRENCIAS, MAX_OCURRENCIAS)
+    local = timezone.localtime(inicio).replace(tzinfo=None)
+
+    ocurrencias = []
+    paso = 0
+    while len(ocurrencias) < limite:
+        if frecuencia == 'SEMANAL':
+            fecha = local + timedelta(weeks=intervalo * paso)
+        elif frecuencia == 'MENSUAL':
+            fecha = _sumar_meses(local, intervalo * paso)
+        else:
+            raise SerieError('Frecuencia no válida')
+        paso += 1
+        if fecha is None:
+            continue
+        if hasta is not None and fecha.date() > hasta:
+            break
+        ocurrencias.append(timezone.make_aware(fecha))
+    return ocurrencias
+
+
+def _ocupadas(medico_id, desde, hasta, excluir_serie=None):
+    """Inicios ordenados de las citas que ocupan turno del médico en el rango (una consulta)."""
+    citas = (
+        Cita.objects
+        .filter(
+            medico_id=medico_id,
+            fecha_hora__gt=desde - DURACION_TURNO,
+            fecha_hora__lt=hasta + DURACION_TURNO,
+        )
+        .ocupan_turno()
+    )
+    if excluir_serie is not None:
+        citas = citas.exclude(serie=excluir_serie)
+    return list(citas.order_by('fecha_hora').values_list('fecha_hora', flat=True))
+
+
+def crear_serie(paciente, medico, inicio, frecuencia, intervalo=1, repeticiones=None,
+                hasta=None, especialidad=None, motivo=''):
+    """
+    Crea la serie y sus citas. Devuelve ``(serie, creadas, omitidas)``, donde
+    ``omitidas`` son las fechas que chocaban con la agenda del médico.
+    """
+    if intervalo < 1:
+        raise SerieError('El intervalo debe ser al menos 1')
+    ocurrencias = expandir(inicio, frecuencia, intervalo, repeticiones, hasta)
+    if not ocurrencias:
+        raise SerieError('La serie no tiene ninguna fecha')
+
+    with transaction.atomic():
+        ocupadas = _ocupadas(medico.pk, ocurrencias[0], ocurrencias[-1])
+        libres, omitidas = [], []
+        for fecha_hora in ocurrencias:
+            (omitidas if turno_ocupado(ocupadas, fecha_hora) else libres).append(fecha_hora)
+        if not libres:
+            raise SerieError('Todas las fechas de la serie chocan con otras citas')
+
+        serie = SerieCitas.objects.create(
+            paciente=paciente,
+            medico=medico,
+            especialidad=especialidad,
+            frecuencia=frecuencia,
+            intervalo=intervalo,
+            inicio=ocurrencias[0],
+            repeticiones=repeticiones,
+            hasta=hasta,
+            motivo=motivo,
+        )
+        creadas = Cita.objects.bulk_create([
+            Cita(
+                paciente=paciente,
+                medico=medico,
+                especialidad=especialidad,
+                fecha_hora=fecha_hora,
+                motivo=motivo,
+                estado='PENDIENTE',
+                serie=serie,
+            )
+            for fecha_hora in libres
+        ])
+    return serie, creadas, omitidas
+
+
+def _pendientes(serie):
+    return Cita.objects.filter(
+        serie=serie, fecha_hora__gt=timezone.now(), estado__in=ESTADOS_ABIERTOS
+    )
+
+
+def mover_serie(serie, desplazamiento):
+    """
+    Desplaza todas las citas futuras abiertas de la serie (un UPDATE).
+    Lanza ``SerieError`` si alguna nueva fecha choca con otra cita.
+    """
+    with transaction.atomic():
+        filas = list(_pendientes(serie).order_by('fecha_hora').values_list('pk', 'fecha_hora'))
+        if not filas:
+            return 0
+        nuevas = [f + desplazamiento for _, f in filas]
+        ocupadas = _ocupadas(serie.medico_id, nuevas[0], nuevas[-1], excluir_serie=serie)
+        choques = [f for f in nuevas if turno_ocupado(ocupadas, f)]
+        if choques:
+            fechas_texto = ', '.join(f'{timezone.localtime(f):%d/%m %H:%M}' for f in choques[:5])
+            raise SerieError(f'La nueva hora choca con otras citas: {fechas_texto}')
+        # actualizado_en explícito: update() no aplica auto_now y los
+        # resúmenes diarios y los ETag dependen de él. fecha_local tampoco la
+        # calcula update(): va en el mismo UPDATE, por cita.
+        return _pendientes(serie).update(
+            fecha_hora=F('fecha_hora') + desplazamiento,
+            fecha_local=Case(
+                *[When(pk=pk, then=dia_local(nueva)) for (pk, _), nueva in zip(filas, nuevas)],
+                default=F('fecha_local'),
+            ),
+            actualizado_en=timezone.now(),
+        )
+
+
+def cancelar_serie(serie):
+    """
+    Cancela todas las citas futuras abiertas de la serie (un UPDATE) y
+    devuelve las citas canceladas, para ofrecer los huecos a la lista de espera.
+    """
+    with transaction.atomic():
+        canceladas = list(_pendientes(serie).select_related('medico'))
+        Cita.objects.filter(pk__in=[c.pk for c in canceladas]).update(
+            estado='CANCELADA', actualizado_en=timezone.now()
+        )
+    for cita in canceladas:
+        cita.estado = 'CANCELADA'
+    return canceladas
@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .autenticacion import invalidar_usuario
+from .catalogo import invalidar_catalogo, invalidar_nombres
+from .models import Cita, DiaPendiente, Especialidad, Notificacion, SerieCitas, Usuario
+from .notificaciones import invalidar_contador, sumar_sin_leer
+from .sincronizacion import en_lote, registrar_borrado
+
+
+@receiver(post_save, sender=Especialidad)
+@receiver(post_delete, sender=Especialidad)
+def especialidad_cambiada(sender, **kwargs):
+    invalidar_catalogo()
+    invalidar_nombres()
+
+
+@receiver(m2m_changed, sender=Usuario.especialidades.through)
+def especialidades_medico_cambiadas(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidar_catalogo()
+
+
+CAMPOS_NOMBRE = ('username', 'first_name', 'last_name')
+
+
+def _nombres(usuario):
+    return tuple(usuario.__dict__.get(campo) for campo in CAMPOS_NOMBRE)
+
+
+@receiver(post_init, sender=Usuario)
+def recordar_rol(sender, instance, **kwargs):
+    # Se lee de __dict__ para no disparar una consulta si 'rol' está diferido
+    instance._rol_original = instance.__dict__.get('rol')
+    instance._nombres_originales = _nombres(instance)
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, update_fields=None, **kwargs):
+    # El login solo actualiza last_login (y la contraseña si se rehashea)
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidar_usuario(instance.id)
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    if 'MEDICO' in (instance.rol, instance._rol_original):
+        invalidar_catalogo()
+    instance._rol_original = instance.rol
+    # El panel del médico y los feeds .ics muestran nombres de otros usuarios
+    if _nombres(instance) != instance._nombres_originales:
+        invalidar_nombres()
+        instance._nombres_originales = _nombres(instance)
+
+
+@receiver(post_delete, sender=Usuario)
+def usuario_eliminado(sender, instance, **kwargs):
+    invalidar_usuario(instance.id)
+    if instance.rol == 'MEDICO':
+        invalidar_catalogo()
+
+
+@receiver(post_save, sender=Notificacion)
+def notificacion_guardada(sender, instance, created, **kwargs):
+    if created:
+        if not instance.leida:
+            # Al confirmar: si la transacción se deshace, el contador (sin
+            # vencimiento) quedaría contando una notificación que no existe
+            transaction.on_commit(partial(sumar_sin_leer, instance.usuario_id))
+    else:
+        # Pudo cambiar 'leida' (p. ej. desde el admin): se recalcula al leer
+        invalidar_contador(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Notificacion)
+def notificacion_eliminada(sender, instance, **kwargs):
+    # Los borrados en lote (notificaciones.eliminar) ya dejaron lápidas y contadores
+    if en_lote():
+        return
+    invalidar_contador(instance.usuario_id)
+    registrar_borrado('NOTIFICACION', instance.id, [instance.usuario_id])
+
+
+@receiver(post_delete, sender=Cita)
+def cita_eliminada(sender, instance, **kwargs):
+    registrar_borrado('CITA', instance.id, [instance.paciente_id, instance.medico_id])
+    DiaPendiente.marcar([instance.fecha_local])
+
+
+@receiver(pre_delete, sender=Especialidad)
+@receiver(pre_delete, sender=SerieCitas)
+def citas_pierden_referencia(sender, instance, **kwargs):
+    # SET_NULL escribe con un UPDATE interno que no pasa por CitaQuerySet;
+    # este update() sin campos solo sube la versión, en la misma transacción
+    campo = 'especialidad' if sender is Especialidad else 'serie'
+    Cita.objects.filter(**{campo: instance}).update()
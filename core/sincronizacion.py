@@ -0,0 +1,166 @@
+"""
+Sincronización incremental de citas y notificaciones para la app móvil.
+
+Cada escritura de ``Cita`` o ``Notificacion`` (save, update, bulk_create,
+bulk_update) toma una ``version`` nueva de ``SecuenciaSync`` en la misma
+transacción, y cada borrado deja una lápida ``BorradoSync`` con la suya
+(core/signals.py). ``actualizado_en`` no sirve como cursor: los relojes de
+dos procesos no coinciden y una transacción puede confirmarse después de otra
+que empezó más tarde; las versiones, en cambio, se confirman en orden.
+
+El cliente guarda un cursor opaco con la última ``(version, id)`` que recibió
+de cada flujo (citas, notificaciones y borrados):
+
+* Sin cursor (primera sincronización), la respuesta trae todas las citas y
+  notificaciones del usuario, leídas por lotes con ``iterator()`` mientras se
+  envían. Las lápidas anteriores no hacen falta.
+* Con cursor, cada flujo es una sola lectura por rango sobre el índice
+  ``(usuario, version)`` con LIMIT; si algún flujo llenó el límite, ``mas``
+  indica que hay que pedir otra página con el cursor nuevo.
+
+La respuesta es NDJSON, una línea ``{"tipo": "cita", "datos": {...}}`` por
+fila (``notificacion`` y ``borrado`` igual), y termina con
+``{"tipo": "fin", "cursor": ..., "mas": ...}``; GZipMiddleware la comprime
+si el cliente lo acepta. Las lápidas se purgan tras
+SYNC_RETENCION_BORRADOS_DIAS (``manage.py purgar_borrados_sync``); un cursor
+anterior a la purga recibe ``CursorVencido`` y el cliente empieza de cero.
+"""
+import base64
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import BorradoSync, Cita, Notificacion, SecuenciaSync
+
+ROLES = ('MEDICO', 'PACIENTE')
+FLUJOS = ('citas', 'notificaciones', 'borrados')
+TAMANO_LOTE = 500
+TIPO_CONTENIDO = 'application/x-ndjson'
+
+CAMPOS_CITA = (
+    'id', 'version', 'paciente_id', 'medico_id', 'especialidad_id', 'serie_id',
+    'fecha_hora', 'estado', 'motivo', 'creado_en', 'actualizado_en',
+)
+CAMPOS_NOTIFICACION = ('id', 'version', 'tipo', 'titulo', 'mensaje', 'asunto', 'cantidad', 'leida', 'creada_en')
+CAMPOS_BORRADO = ('id', 'version', 'modelo', 'objeto_id')
+TIPOS = {'citas': 'cita', 'notificaciones': 'notificacion', 'borrados': 'borrado'}
+
+
+_en_lote = ContextVar('sincronizacion_en_lote', default=False)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class CursorVencido(Exception):
+    """El cursor es anterior a la última purga de lápidas: hay que sincronizar desde cero."""
+
+
+# --- lápidas ---
+
+def registrar_borrado(modelo, objeto_id, usuario_ids):
+    """Una lápida por usuario que veía la fila; se llama desde post_delete, dentro del borrado."""
+    registrar_borrados(modelo, [(objeto_id, usuario_id) for usuario_id in usuario_ids])
+
+
+def registrar_borrados(modelo, filas):
+    """Lápidas de ``filas`` (pares objeto_id, usuario_id) con un solo INSERT."""
+    if not filas:
+        return
+    primera = SecuenciaSync.reservar(len(filas))
+    BorradoSync.objects.bulk_create([
+        BorradoSync(usuario_id=usuario_id, modelo=modelo, objeto_id=objeto_id, version=primera + i)
+        for i, (objeto_id, usuario_id) in enumerate(filas)
+    ])
+
+
+@contextmanager
+def borrado_en_lote():
+    """
+    Mientras dura, las señales post_delete no escriben lápidas fila por fila:
+    quien borra muchas filas las escribe antes con ``registrar_borrados``.
+    """
+    token = _en_lote.set(True)
+    try:
+        yield
+    finally:
+        _en_lote.reset(token)
+
+
+def en_lote():
+    return _en_lote.get()
+
+
+# --- cursor ---
+
+def codificar_cursor(posiciones):
+    datos = json.dumps([list(posiciones[nombre]) for nombre in FLUJOS], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(datos) != len(FLUJOS):
+            raise ValueError(cursor)
+        return {nombre: (int(version), int(ultimo_id)) for nombre, (version, ultimo_id) in zip(FLUJOS, datos)}
+    except (ValueError, TypeError):
+        raise CursorInvalido(cursor)
+
+
+# --- cambios ---
+
+def cambios(usuario, cursor=None, limite=None):
+    """
+    Líneas NDJSON con lo que cambió para ``usuario`` desde ``cursor`` (o todo,
+    sin cursor). La comprobación de la purga se hace aquí, antes de la
+    primera línea, para que la vista pueda responder 410.
+    """
+    secuencia = SecuenciaSync.objects.values('valor', 'purgado_hasta').get(pk=1)
+    if cursor is None:
+        posiciones = {'citas': (0, 0), 'notificaciones': (0, 0), 'borrados': (secuencia['valor'], 0)}
+        return _lineas(usuario, posiciones, None)
+    if cursor['borrados'][0] < secuencia['purgado_hasta']:
+        raise CursorVencido
+    return _lineas(usuario, dict(cursor), limite)
+
+
+def _consultas(usuario):
+    if usuario.rol == 'MEDICO':
+        citas = Cita.objects.filter(medico_id=usuario.id).values(*CAMPOS_CITA, 'notas')
+    else:
+        citas = Cita.objects.filter(paciente_id=usuario.id).values(*CAMPOS_CITA)
+    return {
+        'citas': citas,
+        'notificaciones': Notificacion.objects.filter(usuario_id=usuario.id).values(*CAMPOS_NOTIFICACION),
+        'borrados': BorradoSync.objects.filter(usuario_id=usuario.id).values(*CAMPOS_BORRADO),
+    }
+
+
+def _lineas(usuario, posiciones, limite):
+    mas = False
+    for nombre, consulta in _consultas(usuario).items():
+        version, ultimo_id = posiciones[nombre]
+        filas = (
+            consulta
+            .filter(version__gte=version)
+            .exclude(version=version, id__lte=ultimo_id)
+            .order_by('version', 'id')
+        )
+        if limite is None:
+            filas = filas.iterator(chunk_size=TAMANO_LOTE)
+        else:
+            filas = list(filas[:limite + 1])
+            if len(filas) > limite:
+                mas, filas = True, filas[:limite]
+        for fila in filas:
+            posiciones[nombre] = (fila['version'], fila['id'])
+            yield _linea({'tipo': TIPOS[nombre], 'datos': fila})
+    yield _linea({'tipo': 'fin', 'cursor': codificar_cursor(posiciones), 'mas': mas})
+
+
+def _linea(datos):
+    return json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
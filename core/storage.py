@@ -0,0 +1,50 @@
+"""
+Almacenamiento de archivos estáticos para producción.
+
+Extiende ManifestStaticFilesStorage (nombres con hash de contenido) y, al
+ejecutar ``collectstatic``, deja junto a cada archivo de texto sus variantes
+precomprimidas ``.gz`` y ``.br`` (esta última si está instalado el paquete
+``brotli``). ``ArchivosEstaticosMiddleware`` sirve esas variantes.
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.xml')
+TAMANO_MINIMO = 256
+
+
+def comprimir_archivo(ruta):
+    """Escribe ``ruta.gz`` (y ``ruta.br``) si la compresión ahorra espacio."""
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    if len(contenido) < TAMANO_MINIMO:
+        return
+
+    variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', brotli.compress(contenido, quality=11)))
+
+    for sufijo, comprimido in variantes:
+        if len(comprimido) < len(contenido):
+            with open(ruta + sufijo, 'wb') as f:
+                f.write(comprimido)
+
+
+class ManifestComprimidoStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        nombres = set()
+        for nombre, nombre_hash, procesado in super().post_process(paths, dry_run, **options):
+            yield nombre, nombre_hash, procesado
+            if not dry_run and nombre_hash and not isinstance(procesado, Exception):
+                # Se comprime la copia con hash y también la original
+                nombres.update((nombre, nombre_hash))
+
+        for nombre in nombres:
+            if nombre.endswith(EXTENSIONES_COMPRIMIBLES) and self.exists(nombre):
+                comprimir_archivo(self.path(nombre))
@@ -7,6 +7,9 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('registro/', views.registro_view, name='registro'),
     path('logout/', views.logout_view, name='logout'),
+
+    # Métricas de Prometheus (staff o token del recolector)
+    path('metrics', views.metricas_view, name='metricas'),
     
     # Dashboards
     path('dashboard/admin/', views.admin_dashboard, name='admin_dashboard'),
@@ -22,6 +25,7 @@ urlpatterns = [
     path('admin/citas/', views.admin_citas, name='admin_citas'),
     path('admin/especialidades/', views.admin_especialidades, name='admin_especialidades'),
     path('admin/reportes/', views.admin_reportes, name='admin_reportes'),
+    path('monitoreo/limites/', views.monitoreo_limites, name='monitoreo_limites'),
 
 
 
@@ -30,6 +34,11 @@ urlpatterns = [
     path('paciente/historial/', views.historial_medico, name='historial_medico'),
     path('paciente/historial/', views.historial_medico, name='paciente_historial'),  # Alias
     path('paciente/perfil/', views.perfil_paciente, name='perfil_paciente'),
+    path('paciente/lista-espera/', views.paciente_unirse_espera, name='paciente_unirse_espera'),
+    path('paciente/lista-espera/<int:pk>/retirar/', views.paciente_retirar_espera, name='paciente_retirar_espera'),
+    path('paciente/ofertas/<int:pk>/responder/', views.paciente_responder_oferta, name='paciente_responder_oferta'),
+    path('paciente/turnos/', views.paciente_primeros_turnos, name='paciente_primeros_turnos'),
+    path('paciente/notificaciones/leer/', views.marcar_notificaciones_leidas, name='marcar_notificaciones_leidas'),
 
     # Secciones de Médico (NUEVAS)
     path('medico/mis-citas/', views.medico_mis_citas, name='medico_mis_citas'),
@@ -43,6 +52,7 @@ urlpatterns = [
 
     # Opcionales (recomendado para que los enlaces "Ver Ficha" y "Agendar" funcionen)
     path('medico/paciente/<int:pk>/', views.medico_paciente_detail, name='medico_paciente_detail'),
+    path('medico/paciente/<int:pk>/historial/', views.medico_paciente_historial, name='medico_paciente_historial'),
     path('medico/paciente/<int:pk>/agendar/', views.medico_agendar, name='medico_agendar'),
 
     # URLs del Médico - Gestión de Citas
@@ -52,6 +62,19 @@ urlpatterns = [
     path('medico/citas/<int:pk>/cancelar/', views.medico_cancelar_cita, name='medico_cancelar_cita'),
     path('medico/citas/<int:pk>/completar/', views.medico_completar_cita, name='medico_completar_cita'),
     path('medico/citas/<int:pk>/cambiar-estado/', views.medico_cambiar_estado_cita, name='medico_cambiar_estado_cita'),
+    path('medico/series/<int:pk>/mover/', views.medico_serie_mover, name='medico_serie_mover'),
+    path('medico/series/<int:pk>/cancelar/', views.medico_serie_cancelar, name='medico_serie_cancelar'),
+
+    # Suscripción de calendario (.ics con token secreto)
+    path('calendario.ics', views.calendario_ics, name='calendario_ics'),
+    path('calendario/enlace/', views.calendario_enlace, name='calendario_enlace'),
+
+    # Sincronización incremental de la app móvil (NDJSON)
+    path('sincronizar/', views.sincronizar, name='sincronizar'),
+
+    # Eventos de citas para integraciones (token por consumidor)
+    path('eventos/', views.eventos_leer, name='eventos_leer'),
+    path('eventos/confirmar/', views.eventos_confirmar, name='eventos_confirmar'),
     
 
 ]
\ No newline at end of file
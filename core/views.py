@@ -1,47 +1,76 @@
+import hmac
 import logging
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.views.decorators.cache import never_cache
-from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import condition, require_POST
 from django.utils import timezone
-from django.http import JsonResponse
-from datetime import timedelta
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+from datetime import date, datetime, time, timedelta
 from django.core.paginator import Paginator
 import json
-
-
-from .models import Usuario, Cita, Especialidad, Notificacion
+from django.core.exceptions import ValidationError
+
+
+from .models import Usuario, Cita, Especialidad, EsperaCita, Franja, Notificacion, OfertaHueco, MarcaProceso, SerieCitas
+from . import (
+    auditoria, calendario, eventos, fechas, historial, lista_espera, metricas, notificaciones, pacientes, reportes,
+    series, sincronizacion,
+)
+from .autenticacion import redireccion_por_rol, rol_requerido
+from .catalogo import version_catalogo
+from .disponibilidad import primeros_turnos
+from .frescura import etag_medico, etag_paciente
+from .limites import contadores, limitar_peticiones, por_ip, por_username, por_usuario
+from .presupuestos import presupuesto_consultas
+from .registro import RegistroError, registrar_usuario
 
 logger = logging.getLogger(__name__)
 
 
+@presupuesto_consultas(2)
 def index_view(request):
     return render(request, 'index.html')
 
 
+@presupuesto_consultas(4)
+@never_cache
+def metricas_view(request):
+    """Métricas en formato Prometheus, solo para staff o con el token del recolector"""
+    token = settings.METRICAS_TOKEN
+    autorizacion = request.headers.get('Authorization', '')
+    con_token = bool(token) and hmac.compare_digest(autorizacion, f'Bearer {token}')
+    if not (con_token or (request.user.is_authenticated and request.user.is_staff)):
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+    return HttpResponse(
+        metricas.REGISTRO.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 # ============================================================
 #                      AUTENTICACIÓN
 # ============================================================
 
+@presupuesto_consultas(8)
 @never_cache
+@limitar_peticiones(('login_ip', por_ip), ('login_usuario', por_username))
 @csrf_protect
 def login_view(request):
     if request.user.is_authenticated:
-        if request.user.rol == 'ADMIN':
-            return redirect('admin_dashboard')
-        elif request.user.rol == 'MEDICO':
-            return redirect('medico_dashboard')
-        else:
-            return redirect('paciente_dashboard')
+        return redireccion_por_rol(request.user)
 
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
         password = request.POST.get('password', '')
 
         if not username or not password:
+            metricas.LOGINS.inc(resultado='incompleto')
             messages.error(request, 'Por favor completa todos los campos')
             return render(request, 'layout/login.html')
 
@@ -49,20 +78,17 @@ def login_view(request):
 
         if user is not None:
             login(request, user)
+            metricas.LOGINS.inc(resultado='exito')
             messages.success(request, f'Bienvenido {user.first_name or user.username}')
-
-            if user.rol == 'ADMIN':
-                return redirect('admin_dashboard')
-            elif user.rol == 'MEDICO':
-                return redirect('medico_dashboard')
-            else:
-                return redirect('paciente_dashboard')
+            return redireccion_por_rol(user)
         else:
+            metricas.LOGINS.inc(resultado='fallido')
             messages.error(request, 'Usuario o contraseña incorrectos')
 
     return render(request, 'layout/login.html')
 
 
+@presupuesto_consultas(3)
 @login_required
 def logout_view(request):
     username = request.user.username
@@ -71,7 +97,9 @@ def logout_view(request):
     return redirect('login')
 
 
+@presupuesto_consultas(4)
 @never_cache
+@limitar_peticiones(('registro_ip', por_ip))
 @csrf_protect
 def registro_view(request):
     if request.user.is_authenticated:
@@ -111,16 +139,8 @@ def registro_view(request):
             messages.error(request, 'La contraseña debe tener al menos 8 caracteres')
             return render(request, 'layout/registro.html', {'form': form_data})
 
-        if Usuario.objects.filter(username=username).exists():
-            messages.error(request, 'El nombre de usuario ya está en uso')
-            return render(request, 'layout/registro.html', {'form': form_data})
-
-        if Usuario.objects.filter(email=email).exists():
-            messages.error(request, 'El email ya está registrado')
-            return render(request, 'layout/registro.html', {'form': form_data})
-
         try:
-            user = Usuario.objects.create_user(
+            registrar_usuario(
                 username=username,
                 email=email,
                 password=password,
@@ -129,6 +149,8 @@ def registro_view(request):
             )
             messages.success(request, 'Usuario registrado exitosamente. Ahora puedes iniciar sesión.')
             return redirect('login')
+        except RegistroError as e:
+            messages.error(request, e.mensaje)
         except Exception as e:
             logger.exception("Error al crear usuario")
             messages.error(request, f'Error al registrar usuario: {str(e)}')
@@ -140,12 +162,9 @@ def registro_view(request):
 #                      DASHBOARDS
 # ============================================================
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('ADMIN')
 def admin_dashboard(request):
-    if request.user.rol != 'ADMIN':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     context = {
         'total_usuarios': Usuario.objects.count(),
         'total_citas': Cita.objects.count(),
@@ -155,30 +174,28 @@ def admin_dashboard(request):
 
 
 
-@login_required
+@presupuesto_consultas(13)
+@rol_requerido('MEDICO')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_medico)
 def medico_dashboard(request):
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
-    # Fecha de hoy
-    hoy_inicio = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    hoy_fin = hoy_inicio + timezone.timedelta(days=1)
+    # Hoy en hora local (no en UTC)
+    hoy_inicio, hoy_fin = fechas.rango_dia()
 
     # Citas de hoy
     citas_hoy = Cita.objects.filter(
         medico=request.user,
         fecha_hora__gte=hoy_inicio,
         fecha_hora__lt=hoy_fin
-    ).order_by('fecha_hora')
+    ).select_related('paciente').order_by('fecha_hora')
 
     # Próximas citas (después de hoy, máximo 3)
     ahora = timezone.now()
     proximas_citas = Cita.objects.filter(
         medico=request.user,
-        fecha_hora__gt=hoy_fin,
+        fecha_hora__gte=hoy_fin,
         estado='PENDIENTE'
-    ).order_by('fecha_hora')[:3]
+    ).select_related('paciente').order_by('fecha_hora')[:3]
 
     # Estadísticas
     total_citas = Cita.objects.filter(medico=request.user).count()
@@ -201,20 +218,14 @@ def medico_dashboard(request):
     
     return render(request, 'medico/index.html', context)
 
-@login_required
+@presupuesto_consultas(8)
+@rol_requerido('PACIENTE')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_paciente)
 def paciente_dashboard(request):
-    if request.user.rol != 'PACIENTE':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     mis_citas = Cita.objects.filter(paciente=request.user).order_by('-fecha_hora')
-    
-    notificaciones = (
-    Notificacion.objects
-    .filter(usuario=request.user)
-    .order_by('-creada_en')  # <-- corregido: creada_en (no 'creado_en')
-    )   
 
+    # Las notificaciones llegan por core.context_processors.notificaciones
 
     # Obtener próximas citas
     ahora = timezone.now()
@@ -224,17 +235,18 @@ def paciente_dashboard(request):
         estado='PENDIENTE'
     ).order_by('fecha_hora')
     
-    # Datos para el modal de crear cita
+    # Datos para el modal de crear cita (la plantilla los cachea por versión
+    # del catálogo, así que las consultas solo se ejecutan al invalidarse)
     medicos = Usuario.objects.filter(rol='MEDICO')
     especialidades = Especialidad.objects.all()
     
     context = {
         'mis_citas': mis_citas,
         'total_citas': mis_citas.count(),
-        'notificaciones': notificaciones,
         'proximas_citas': proximas_citas,
         'medicos': medicos,
         'especialidades': especialidades,
+        'version_catalogo': version_catalogo(),
     }
 
     return render(request, 'paciente/index.html', context)
@@ -244,6 +256,7 @@ def paciente_dashboard(request):
 #                     CRUD DE CITAS
 # ============================================================
 
+@presupuesto_consultas(4)
 @login_required
 def listar_citas(request):
     if request.user.rol == 'ADMIN':
@@ -257,12 +270,9 @@ def listar_citas(request):
     return render(request, 'admin/CRUD_Citas/listar.html', context)
 
 
-@login_required
+@presupuesto_consultas(9)
+@rol_requerido('PACIENTE', mensaje='Solo los pacientes pueden crear citas', redirigir='listar_citas')
 def crear_cita(request):
-    if request.user.rol != 'PACIENTE':
-        messages.error(request, 'Solo los pacientes pueden crear citas')
-        return redirect('listar_citas')
-
     if request.method == 'POST':
         medico_id = request.POST.get('medico')
         especialidad_id = request.POST.get('especialidad')
@@ -273,6 +283,13 @@ def crear_cita(request):
             messages.error(request, 'Por favor completa los campos obligatorios')
             return redirect('paciente_dashboard')
 
+        try:
+            # El input datetime-local llega sin zona: es hora de Lima
+            fecha_hora = timezone.make_aware(datetime.fromisoformat(fecha_hora))
+        except ValueError:
+            messages.error(request, 'La fecha y hora no son válidas')
+            return redirect('paciente_dashboard')
+
         try:
             medico = Usuario.objects.get(id=medico_id, rol='MEDICO')
 
@@ -280,6 +297,11 @@ def crear_cita(request):
             if especialidad_id:
                 especialidad = Especialidad.objects.filter(id=especialidad_id).first()
 
+            # También los huecos retenidos por una oferta de la lista de espera
+            if lista_espera.turno_tomado(medico.pk, fecha_hora):
+                messages.error(request, 'Ese turno ya no está disponible')
+                return redirect('paciente_dashboard')
+
             Cita.objects.create(
                 paciente=request.user,
                 medico=medico,
@@ -288,6 +310,7 @@ def crear_cita(request):
                 motivo=motivo,
                 estado='PENDIENTE'
             )
+            metricas.CITAS_CREADAS.inc(origen='paciente')
 
             messages.success(request, 'Cita creada exitosamente')
             return redirect('paciente_dashboard')
@@ -308,14 +331,13 @@ def crear_cita(request):
 #                 SECCIONES DEL PACIENTE
 # ============================================================
 
-@login_required
+@presupuesto_consultas(11)
+@rol_requerido('PACIENTE')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_paciente)
 def paciente_citas(request):
-    if request.user.rol != 'PACIENTE':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     # Todas las citas del paciente
-    citas = Cita.objects.filter(paciente=request.user).order_by('-fecha_hora')
+    citas = Cita.objects.filter(paciente=request.user).select_related('medico', 'especialidad').order_by('-fecha_hora')
     
     # Obtener próximas citas (futuras y pendientes)
     ahora = timezone.now()
@@ -323,13 +345,21 @@ def paciente_citas(request):
         paciente=request.user,
         fecha_hora__gte=ahora,
         estado='PENDIENTE'
-    ).order_by('fecha_hora')
+    ).select_related('medico', 'especialidad').order_by('fecha_hora')
     
     # Citas pasadas
     citas_pasadas = Cita.objects.filter(
         paciente=request.user,
         fecha_hora__lt=ahora
-    ).order_by('-fecha_hora')
+    ).select_related('medico', 'especialidad').order_by('-fecha_hora')
+
+    # Lista de espera: entradas activas y ofertas de huecos por responder
+    esperas = EsperaCita.objects.filter(
+        paciente=request.user, estado__in=['ESPERANDO', 'OFRECIDA']
+    ).select_related('medico', 'especialidad')
+    ofertas = OfertaHueco.objects.filter(
+        espera__paciente=request.user, estado='PENDIENTE', vence_en__gt=ahora
+    ).select_related('cita_liberada__medico')
 
     return render(
         request,
@@ -338,15 +368,81 @@ def paciente_citas(request):
             'citas': citas,
             'proximas_citas': proximas_citas,
             'citas_pasadas': citas_pasadas,
+            'esperas': esperas,
+            'ofertas': ofertas,
+            'medicos': Usuario.objects.filter(rol='MEDICO', is_active=True).order_by('first_name', 'username'),
+            'especialidades': Especialidad.objects.filter(activo=True).order_by('nombre'),
         }
     )
 
-@login_required
-def historial_medico(request):
-    if request.user.rol != 'PACIENTE':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
 
+@presupuesto_consultas(6)
+@rol_requerido('PACIENTE')
+@limitar_peticiones(('cambio_estado', por_usuario))
+@require_POST
+def paciente_unirse_espera(request):
+    """Anota al paciente en la lista de espera de un médico o de una especialidad"""
+    medico_id = request.POST.get('medico') or None
+    especialidad_id = request.POST.get('especialidad') or None
+    try:
+        desde = timezone.make_aware(datetime.combine(date.fromisoformat(request.POST.get('desde', '')), time.min))
+        hasta = timezone.make_aware(datetime.combine(date.fromisoformat(request.POST.get('hasta', '')), time.max))
+    except ValueError:
+        messages.error(request, 'Indica las fechas entre las que puedes asistir')
+        return redirect('paciente_citas')
+
+    if not (medico_id or especialidad_id):
+        messages.error(request, 'Elige un médico o una especialidad')
+    elif hasta <= max(desde, timezone.now()):
+        messages.error(request, 'La ventana de fechas debe terminar en el futuro y después de su inicio')
+    elif medico_id and not Usuario.objects.filter(pk=medico_id, rol='MEDICO').exists():
+        messages.error(request, 'Médico no encontrado')
+    elif especialidad_id and not Especialidad.objects.filter(pk=especialidad_id, activo=True).exists():
+        messages.error(request, 'Especialidad no encontrada')
+    else:
+        EsperaCita.objects.create(
+            paciente=request.user,
+            medico_id=medico_id,
+            especialidad_id=especialidad_id,
+            desde=desde,
+            hasta=hasta,
+        )
+        messages.success(request, 'Te avisaremos si se libera un turno')
+    return redirect('paciente_citas')
+
+
+@presupuesto_consultas(5)
+@rol_requerido('PACIENTE')
+@require_POST
+def paciente_retirar_espera(request, pk):
+    """Retira una entrada de la lista de espera"""
+    EsperaCita.objects.filter(
+        pk=pk, paciente=request.user, estado='ESPERANDO'
+    ).update(estado='RETIRADA', actualizado_en=timezone.now())
+    messages.success(request, 'Saliste de la lista de espera')
+    return redirect('paciente_citas')
+
+
+@presupuesto_consultas(15)
+@rol_requerido('PACIENTE', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
+@require_POST
+def paciente_responder_oferta(request, pk):
+    """Acepta o rechaza un turno ofrecido desde la lista de espera (JSON)"""
+    aceptar = request.POST.get('aceptar') == '1'
+    try:
+        cita = lista_espera.responder_oferta(pk, request.user, aceptar)
+    except lista_espera.ListaEsperaError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+
+    if cita is not None:
+        metricas.CITAS_CREADAS.inc(origen='lista_espera')
+        return JsonResponse({'success': True, 'message': 'Turno reservado', 'cita_id': cita.id})
+    return JsonResponse({'success': True, 'message': 'Oferta rechazada'})
+
+@presupuesto_consultas(4)
+@rol_requerido('PACIENTE')
+def historial_medico(request):
     historial = Cita.objects.filter(
         paciente=request.user,
         estado='ATENDIDA'
@@ -359,11 +455,63 @@ def historial_medico(request):
     )
 
 
-@login_required
+@presupuesto_consultas(8)
+@rol_requerido('PACIENTE', json=True)
+def paciente_primeros_turnos(request):
+    """Primeros turnos libres de una especialidad entre todos sus médicos (JSON)"""
+    try:
+        especialidad_id = int(request.GET.get('especialidad', ''))
+        dias = min(max(int(request.GET.get('dias', 14)), 1), 60)
+        k = min(max(int(request.GET.get('k', 5)), 1), 20)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros no válidos'}, status=400)
+
+    especialidad = Especialidad.objects.filter(pk=especialidad_id, activo=True).first()
+    if especialidad is None:
+        return JsonResponse({'success': False, 'error': 'Especialidad no válida'}, status=400)
+
+    desde = timezone.now()
+    turnos = primeros_turnos(especialidad, desde, desde + timedelta(days=dias), k)
+    return JsonResponse({
+        'success': True,
+        'turnos': [
+            {
+                'inicio': timezone.localtime(t['inicio']).isoformat(),
+                'fin': timezone.localtime(t['fin']).isoformat(),
+                # Valor listo para el <input type="datetime-local">
+                'valor_input': timezone.localtime(t['inicio']).strftime('%Y-%m-%dT%H:%M'),
+                'medico_id': t['medico_id'],
+                'medico': t['medico'],
+            }
+            for t in turnos
+        ],
+    })
+
+
+@presupuesto_consultas(5)
+@rol_requerido('PACIENTE', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
+@require_POST
+def marcar_notificaciones_leidas(request):
+    """Marcar como leídas las notificaciones del paciente (todas o las indicadas)"""
+    ids = request.POST.getlist('ids') or None
+    try:
+        marcadas = notificaciones.marcar_leidas(request.user.id, ids)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Identificadores inválidos'}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'marcadas': marcadas,
+        'sin_leer': notificaciones.contar_sin_leer(request.user.id),
+    })
+
+
+@presupuesto_consultas(8)
+@rol_requerido('PACIENTE')
 def perfil_paciente(request):
-    if request.user.rol != 'PACIENTE':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
+    # La sesión solo cachea los datos mínimos del usuario: aquí se necesita la ficha completa
+    request.user = Usuario.objects.get(pk=request.user.pk)
 
     if request.method == 'POST':
         # Obtener datos del formulario
@@ -380,7 +528,7 @@ def perfil_paciente(request):
             return render(request, 'paciente/pages/perfil.html', {'usuario': request.user})
 
         # Verificar si el email ya existe (excepto el del usuario actual)
-        if Usuario.objects.filter(email=email).exclude(id=request.user.id).exists():
+        if Usuario.objects.filter(email__iexact=email).exclude(id=request.user.id).exists():
             messages.error(request, 'El email ya está en uso por otro usuario')
             return render(request, 'paciente/pages/perfil.html', {'usuario': request.user})
 
@@ -415,13 +563,12 @@ def perfil_paciente(request):
 #                 SECCIONES DEL MÉDICO
 # ============================================================
 
-@login_required
+@presupuesto_consultas(8)
+@rol_requerido('MEDICO')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_medico)
 def medico_mis_citas(request):
     """Vista principal de citas del médico con paginación y filtros"""
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     # Obtener todas las citas del médico
     citas = Cita.objects.filter(medico=request.user).select_related('paciente', 'especialidad').order_by('-fecha_hora')
     
@@ -443,28 +590,33 @@ def medico_mis_citas(request):
     return render(request, 'medico/pages/mis_citas.html', context)
 
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO')
 def medico_cita_detail(request, pk):
     """Vista de detalle de una cita específica"""
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-    
-    cita = get_object_or_404(Cita, pk=pk, medico=request.user)
-    
+    cita = get_object_or_404(
+        Cita.objects.select_related('paciente', 'especialidad'), pk=pk, medico=request.user
+    )
+    # Últimas citas pasadas del mismo paciente; el resto en la ficha del paciente
+    anteriores, hay_mas = historial.bloque_de_citas(
+        cita.paciente, request.user, limite=historial.CITAS_EN_DETALLE, excluir=cita.pk
+    )
+    auditoria.registrar_acceso(request.user, [cita.paciente_id], 'CITA', cita_id=cita.pk)
+
     context = {
         'cita': cita,
+        'citas_anteriores': anteriores,
+        'hay_mas_anteriores': hay_mas is not None,
     }
     return render(request, 'medico/pages/cita_detail.html', context)
 
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
 @require_POST
 def medico_confirmar_cita(request, pk):
     """Confirmar una cita (PENDIENTE -> CONFIRMADA)"""
-    if request.user.rol != 'MEDICO':
-        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
-    
     try:
         cita = get_object_or_404(Cita, pk=pk, medico=request.user)
         
@@ -476,23 +628,23 @@ def medico_confirmar_cita(request, pk):
         
         cita.estado = 'CONFIRMADA'
         cita.save()
+        metricas.TRANSICIONES_CITAS.inc(desde='PENDIENTE', hacia='CONFIRMADA')
         
-        logger.info(f"Cita {pk} confirmada por médico {request.user.username}")
+        logger.info("Cita %s confirmada por médico %s", pk, request.user.username)
         return JsonResponse({'success': True, 'message': 'Cita confirmada exitosamente'})
         
     except Exception as e:
-        logger.exception(f"Error al confirmar cita {pk}")
+        logger.exception("Error al confirmar cita %s", pk)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
 
-@login_required
+@presupuesto_consultas(17)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
 @require_POST
 def medico_cancelar_cita(request, pk):
     """Cancelar una cita"""
-    if request.user.rol != 'MEDICO':
-        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
-    
     try:
         cita = get_object_or_404(Cita, pk=pk, medico=request.user)
         
@@ -502,24 +654,27 @@ def medico_cancelar_cita(request, pk):
                 'error': 'No se puede cancelar una cita completada'
             }, status=400)
         
+        estado_anterior = cita.estado
         cita.estado = 'CANCELADA'
         cita.save()
+        metricas.TRANSICIONES_CITAS.inc(desde=estado_anterior, hacia='CANCELADA')
+        # El turno liberado se ofrece a la lista de espera
+        lista_espera.ofrecer_hueco(cita)
         
-        logger.info(f"Cita {pk} cancelada por médico {request.user.username}")
+        logger.info("Cita %s cancelada por médico %s", pk, request.user.username)
         return JsonResponse({'success': True, 'message': 'Cita cancelada exitosamente'})
         
     except Exception as e:
-        logger.exception(f"Error al cancelar cita {pk}")
+        logger.exception("Error al cancelar cita %s", pk)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
 @require_POST
 def medico_completar_cita(request, pk):
     """Marcar una cita como completada/atendida"""
-    if request.user.rol != 'MEDICO':
-        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
-    
     try:
         cita = get_object_or_404(Cita, pk=pk, medico=request.user)
         
@@ -529,23 +684,24 @@ def medico_completar_cita(request, pk):
                 'error': 'No se puede completar una cita cancelada'
             }, status=400)
         
+        estado_anterior = cita.estado
         cita.estado = 'COMPLETADA'
         cita.save()
+        metricas.TRANSICIONES_CITAS.inc(desde=estado_anterior, hacia='COMPLETADA')
         
-        logger.info(f"Cita {pk} completada por médico {request.user.username}")
+        logger.info("Cita %s completada por médico %s", pk, request.user.username)
         return JsonResponse({'success': True, 'message': 'Cita marcada como completada'})
         
     except Exception as e:
-        logger.exception(f"Error al completar cita {pk}")
+        logger.exception("Error al completar cita %s", pk)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
 @require_POST
 def medico_cambiar_estado_cita(request, pk):
     """Cambiar estado de una cita a cualquier estado válido"""
-    if request.user.rol != 'MEDICO':
-        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
-    
     try:
         cita = get_object_or_404(Cita, pk=pk, medico=request.user)
         nuevo_estado = request.POST.get('estado', '').strip().upper()
@@ -561,8 +717,11 @@ def medico_cambiar_estado_cita(request, pk):
         estado_anterior = cita.estado
         cita.estado = nuevo_estado
         cita.save()
+        metricas.TRANSICIONES_CITAS.inc(desde=estado_anterior, hacia=nuevo_estado)
+        if nuevo_estado == 'CANCELADA' and estado_anterior != 'CANCELADA':
+            lista_espera.ofrecer_hueco(cita)
         
-        logger.info(f"Cita {pk} cambió de {estado_anterior} a {nuevo_estado} por {request.user.username}")
+        logger.info("Cita %s cambió de %s a %s por %s", pk, estado_anterior, nuevo_estado, request.user.username)
         return JsonResponse({
             'success': True, 
             'message': f'Estado cambiado a {nuevo_estado}',
@@ -570,44 +729,48 @@ def medico_cambiar_estado_cita(request, pk):
         })
         
     except Exception as e:
-        logger.exception(f"Error al cambiar estado de cita {pk}")
+        logger.exception("Error al cambiar estado de cita %s", pk)
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-@login_required
+@presupuesto_consultas(6)
+@rol_requerido('MEDICO')
 def medico_mis_pacientes(request):
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
+    """Pacientes del médico con estadísticas por paciente, ordenables y paginados por cursor"""
+    orden = request.GET.get('orden', pacientes.ORDEN_POR_DEFECTO)
+    if orden not in pacientes.ORDENES:
+        orden = pacientes.ORDEN_POR_DEFECTO
+    descendente = request.GET.get('dir', 'desc') != 'asc'
 
-    # Obtener pacientes únicos del médico
-    pacientes_ids = Cita.objects.filter(
-        medico=request.user
-    ).values_list('paciente', flat=True).distinct()
-    
-    pacientes = Usuario.objects.filter(id__in=pacientes_ids)
+    try:
+        filas, siguiente = pacientes.pagina_de_pacientes(
+            request.user, orden, descendente, request.GET.get('despues')
+        )
+    except pacientes.CursorInvalido:
+        # Enlace viejo o manipulado: se vuelve a la primera página
+        filas, siguiente = pacientes.pagina_de_pacientes(request.user, orden, descendente)
+    auditoria.registrar_acceso(request.user, [fila['paciente'] for fila in filas], 'ROSTER')
 
     context = {
-        'pacientes': pacientes,
-        'total_pacientes': pacientes.count(),
+        'pacientes': filas,
+        'total_pacientes': pacientes.total_pacientes(request.user),
+        'orden': orden,
+        'direccion': 'desc' if descendente else 'asc',
+        'cursor_siguiente': siguiente,
+        'es_primera_pagina': not request.GET.get('despues'),
     }
     return render(request, 'medico/pages/mis_pacientes.html', context)
 
 
-@login_required
+@presupuesto_consultas(6)
+@rol_requerido('MEDICO')
 def medico_horario(request):
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     # Obtener citas de la semana
-    hoy = timezone.now().date()
-    inicio_semana = hoy - timezone.timedelta(days=hoy.weekday())
-    fin_semana = inicio_semana + timezone.timedelta(days=7)
+    inicio_semana, fin_semana = fechas.rango_semana()
     
     citas_semana = Cita.objects.filter(
         medico=request.user,
-        fecha_hora__date__gte=inicio_semana,
-        fecha_hora__date__lt=fin_semana
+        fecha_hora__gte=inicio_semana,
+        fecha_hora__lt=fin_semana
     ).order_by('fecha_hora')
 
     context = {
@@ -616,12 +779,9 @@ def medico_horario(request):
     return render(request, 'medico/pages/mi_horario.html', context)
 
 
-@login_required
+@presupuesto_consultas(9)
+@rol_requerido('MEDICO')
 def medico_estadisticas(request):
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
-
     # Estadísticas generales
     total_citas = Cita.objects.filter(medico=request.user).count()
     citas_completadas = Cita.objects.filter(medico=request.user, estado='COMPLETADA').count()
@@ -642,11 +802,11 @@ def medico_estadisticas(request):
     return render(request, 'medico/pages/estadisticas.html', context)
 
 
-@login_required
+@presupuesto_consultas(8)
+@rol_requerido('MEDICO')
 def medico_perfil(request):
-    if request.user.rol != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
+    # La sesión solo cachea los datos mínimos del usuario: aquí se necesita la ficha completa
+    request.user = Usuario.objects.get(pk=request.user.pk)
 
     if request.method == 'POST':
         first_name = request.POST.get('first_name', '').strip()
@@ -659,7 +819,7 @@ def medico_perfil(request):
             messages.error(request, 'El nombre y el email son obligatorios')
             return render(request, 'medico/pages/perfil.html', {'usuario': request.user})
 
-        if Usuario.objects.filter(email=email).exclude(id=request.user.id).exists():
+        if Usuario.objects.filter(email__iexact=email).exclude(id=request.user.id).exists():
             messages.error(request, 'El email ya está en uso')
             return render(request, 'medico/pages/perfil.html', {'usuario': request.user})
 
@@ -681,86 +841,195 @@ def medico_perfil(request):
 
 
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO', mensaje='No tienes permisos para crear franjas', redirigir='medico_horario')
 def medico_agregar_franja(request):
-    """
-    Maneja el POST desde el modal de 'Agregar Franja'.
-    Por ahora guarda los datos de forma mínima: valida y muestra un mensaje.
-    Si tienes un modelo Franja u otro storage, reemplaza la parte de creación.
-    """
+    """Crea una franja del horario semanal desde el modal de 'Agregar Franja'"""
     if request.method != 'POST':
         # Redirigir al horario si acceden por GET
         return redirect('medico_horario')
 
-    # Solo médicos pueden acceder (según tu lógica)
-    if getattr(request.user, 'rol', None) != 'MEDICO':
-        messages.error(request, 'No tienes permisos para crear franjas')
-        return redirect('medico_horario')
-
     dia = request.POST.get('dia')
     hora_inicio = request.POST.get('hora_inicio')
     hora_fin = request.POST.get('hora_fin')
-    tipo = request.POST.get('tipo')
+    tipo = request.POST.get('tipo') or 'CONSULTA'
 
     # Validaciones básicas
     if not all([dia, hora_inicio, hora_fin]):
         messages.error(request, 'Completa los campos obligatorios para la franja')
         return redirect('medico_horario')
 
-    # Aquí normalmente crearías la franja en la BD:
-    # Franja.objects.create(medico=request.user, dia=..., hora_inicio=..., hora_fin=..., tipo=...)
-    # Como ejemplo temporal simplemente mostramos mensaje de éxito:
-    messages.success(request, f'Franja agregada: {dia} {hora_inicio} - {hora_fin} ({tipo})')
+    franja = Franja(medico=request.user, dia=dia, hora_inicio=hora_inicio, hora_fin=hora_fin, tipo=tipo)
+    try:
+        franja.full_clean()
+    except ValidationError:
+        messages.error(request, 'Franja no válida: revisa el día y que la hora de inicio sea anterior a la de fin')
+        return redirect('medico_horario')
+    franja.save()
+
+    messages.success(request, f'Franja agregada: {franja.get_dia_display()} {hora_inicio} - {hora_fin} ({franja.get_tipo_display()})')
 
     return redirect('medico_horario')
 
 
-@login_required
+@presupuesto_consultas(8)
+@rol_requerido('MEDICO', mensaje='No tienes permiso para ver esta página', redirigir='medico_dashboard')
 def medico_paciente_detail(request, pk):
-    """
-    Vista mínima de detalle de paciente.
-    Reemplaza o extiende según necesites mostrar ficha clínica.
-    """
-    if getattr(request.user, 'rol', None) != 'MEDICO':
-        messages.error(request, 'No tienes permiso para ver esta página')
-        return redirect('medico_dashboard')
+    """Ficha del paciente con su historial de citas con el médico (primer bloque)"""
+    try:
+        paciente = historial.paciente_con_notificaciones(pk, request.user)
+    except Usuario.DoesNotExist:
+        raise Http404('Paciente no encontrado')
 
-    paciente = get_object_or_404(Usuario, pk=pk, rol='PACIENTE')
-    # Por ahora renderiza una plantilla simple; crea medico/pages/paciente_detail.html si no existe.
+    citas, cursor_siguiente = historial.bloque_de_citas(paciente, request.user)
+    auditoria.registrar_acceso(request.user, [paciente.pk], 'FICHA')
     context = {
         'paciente': paciente,
+        'citas': citas,
+        'cursor_siguiente': cursor_siguiente,
     }
     return render(request, 'medico/pages/paciente_detail.html', context)
 
 
-@login_required
+@presupuesto_consultas(7)
+@rol_requerido('MEDICO')
+def medico_paciente_historial(request, pk):
+    """Bloque siguiente del historial (fragmento HTML para "Cargar más")"""
+    try:
+        paciente = historial.paciente_de(pk, request.user)
+    except Usuario.DoesNotExist:
+        raise Http404('Paciente no encontrado')
+    try:
+        citas, cursor_siguiente = historial.bloque_de_citas(
+            paciente, request.user, request.GET.get('despues')
+        )
+    except pacientes.CursorInvalido:
+        return HttpResponseBadRequest('Cursor inválido')
+    auditoria.registrar_acceso(request.user, [paciente.pk], 'HISTORIAL')
+
+    context = {
+        'paciente': paciente,
+        'citas': citas,
+        'cursor_siguiente': cursor_siguiente,
+    }
+    return render(request, 'medico/pages/_linea_tiempo.html', context)
+
+
+@presupuesto_consultas(9)
+@rol_requerido('MEDICO', mensaje='No tienes permiso para agendar citas', redirigir='medico_dashboard')
 def medico_agendar(request, pk):
     """
-    Vista mínima para crear/mostrar el formulario de agendar cita para un paciente.
-    Si recibes POST, procesa la creación (o redirige al modal).
+    Agenda una cita para el paciente o, si se elige repetir, una serie semanal
+    o mensual (las fechas que chocan con la agenda se omiten).
     """
-    if getattr(request.user, 'rol', None) != 'MEDICO':
-        messages.error(request, 'No tienes permiso para agendar citas')
-        return redirect('medico_dashboard')
-
     paciente = get_object_or_404(Usuario, pk=pk, rol='PACIENTE')
+    especialidades = request.user.especialidades.filter(activo=True).order_by('nombre')
 
     if request.method == 'POST':
-        # Aquí procesarías el formulario de creación de cita
-        # Por simplicidad devolvemos mensaje y redirigimos
-        messages.success(request, f'Cita creada (simulada) para {paciente.get_full_name() or paciente.username}')
+        repetir = request.POST.get('repetir', 'NO')
+        motivo = request.POST.get('motivo', '').strip()
+        try:
+            fecha_hora = timezone.make_aware(datetime.fromisoformat(request.POST.get('fecha_hora', '')))
+            especialidad = None
+            if request.POST.get('especialidad'):
+                especialidad = especialidades.filter(pk=int(request.POST['especialidad'])).first()
+            intervalo = int(request.POST.get('intervalo') or 1)
+            repeticiones = int(request.POST['repeticiones']) if request.POST.get('repeticiones') else None
+            hasta = date.fromisoformat(request.POST['hasta']) if request.POST.get('hasta') else None
+        except ValueError:
+            messages.error(request, 'Revisa la fecha, el intervalo y las repeticiones')
+            return redirect('medico_agendar', pk=pk)
+
+        if fecha_hora <= timezone.now():
+            messages.error(request, 'La cita debe ser en el futuro')
+            return redirect('medico_agendar', pk=pk)
+
+        if repetir == 'NO':
+            if lista_espera.turno_tomado(request.user.pk, fecha_hora):
+                messages.error(request, 'Ya tienes una cita a esa hora o el turno está ofrecido a la lista de espera')
+                return redirect('medico_agendar', pk=pk)
+            Cita.objects.create(
+                paciente=paciente,
+                medico=request.user,
+                especialidad=especialidad,
+                fecha_hora=fecha_hora,
+                motivo=motivo,
+                estado='PENDIENTE',
+            )
+            metricas.CITAS_CREADAS.inc(origen='medico')
+            messages.success(request, f'Cita creada para {paciente.get_full_name() or paciente.username}')
+            return redirect('medico_mis_citas')
+
+        try:
+            serie, creadas, omitidas = series.crear_serie(
+                paciente, request.user, fecha_hora, repetir,
+                intervalo=intervalo, repeticiones=repeticiones, hasta=hasta,
+                especialidad=especialidad, motivo=motivo,
+            )
+        except series.SerieError as e:
+            messages.error(request, str(e))
+            return redirect('medico_agendar', pk=pk)
+
+        metricas.CITAS_CREADAS.inc(len(creadas), origen='serie')
+        logger.info("Serie %s: %s citas creadas por %s", serie.pk, len(creadas), request.user.username)
+        messages.success(request, f'Serie creada con {len(creadas)} citas')
+        if omitidas:
+            fechas_texto = ', '.join(f'{timezone.localtime(f):%d/%m %H:%M}' for f in omitidas[:5])
+            messages.warning(request, f'Se omitieron {len(omitidas)} fechas ocupadas: {fechas_texto}')
         return redirect('medico_mis_citas')
 
-    # GET -> mostrar un formulario o redirigir al listado
-    context = {'paciente': paciente}
+    context = {
+        'paciente': paciente,
+        'especialidades': especialidades,
+        'max_ocurrencias': series.MAX_OCURRENCIAS,
+    }
     return render(request, 'medico/pages/agendar_para_paciente.html', context)
 
-@login_required
-def medico_horario(request):
-    if getattr(request.user, 'rol', None) != 'MEDICO':
-        messages.error(request, 'No tienes permisos para acceder')
-        return redirect('login')
 
+@presupuesto_consultas(10)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
+@require_POST
+def medico_serie_mover(request, pk):
+    """Mueve todas las citas futuras de la serie la cantidad de minutos indicada"""
+    serie = get_object_or_404(SerieCitas, pk=pk, medico=request.user)
+    try:
+        minutos = int(request.POST.get('minutos', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Minutos inválidos'}, status=400)
+    if not minutos:
+        return JsonResponse({'success': False, 'error': 'Indica cuántos minutos mover'}, status=400)
+
+    try:
+        movidas = series.mover_serie(serie, timedelta(minutes=minutos))
+    except series.SerieError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+
+    logger.info("Serie %s movida %s min (%s citas) por %s", pk, minutos, movidas, request.user.username)
+    return JsonResponse({'success': True, 'message': f'{movidas} citas movidas', 'movidas': movidas})
+
+
+# Una búsqueda indexada por turno liberado: medido con una serie de 4 citas
+@presupuesto_consultas(22)
+@rol_requerido('MEDICO', json=True)
+@limitar_peticiones(('cambio_estado', por_usuario), json=True)
+@require_POST
+def medico_serie_cancelar(request, pk):
+    """Cancela todas las citas futuras de la serie y ofrece los huecos a la lista de espera"""
+    serie = get_object_or_404(SerieCitas, pk=pk, medico=request.user)
+    canceladas = series.cancelar_serie(serie)
+    lista_espera.ofrecer_huecos(canceladas)
+
+    logger.info("Serie %s cancelada (%s citas) por %s", pk, len(canceladas), request.user.username)
+    return JsonResponse({
+        'success': True,
+        'message': f'{len(canceladas)} citas canceladas',
+        'canceladas': len(canceladas),
+    })
+
+@presupuesto_consultas(6)
+@rol_requerido('MEDICO')
+def medico_horario(request):
     ahora = timezone.now()
     # cargar citas del próximo mes (ajusta rango si quieres)
     hasta = ahora + timedelta(days=30)
@@ -769,7 +1038,7 @@ def medico_horario(request):
         medico=request.user,
         fecha_hora__gte=ahora,
         fecha_hora__lte=hasta
-    ).order_by('fecha_hora')
+    ).select_related('paciente').order_by('fecha_hora')
 
     # Construir lista de eventos para FullCalendar
     calendar_events = []
@@ -787,13 +1056,27 @@ def medico_horario(request):
             "estado": c.estado,  # PENDIENTE, CONFIRMADA, CANCELADA...
         })
 
+    # Franjas de atención como fondo del calendario
+    franjas_por_dia = {}
+    for franja in Franja.objects.filter(medico=request.user):
+        franjas_por_dia.setdefault(franja.dia, []).append(franja)
+    for i in range(31):
+        d = fechas.hoy() + timedelta(days=i)
+        for franja in franjas_por_dia.get(Franja.DIAS[d.weekday()][0], []):
+            calendar_events.append({
+                "start": f"{d.isoformat()}T{franja.hora_inicio:%H:%M}",
+                "end": f"{d.isoformat()}T{franja.hora_fin:%H:%M}",
+                "display": "background",
+                "title": franja.get_tipo_display(),
+            })
+
     # Serializar a JSON (cadena) para inyectar seguro en template
     calendar_events_json = json.dumps(calendar_events, ensure_ascii=False)
 
     # Construir semana mínima para la plantilla (si tu template la usa)
     semana = []
     for i in range(7):
-        d = (ahora + timedelta(days=i)).date()
+        d = fechas.hoy() + timedelta(days=i)
         semana.append({
             "nombre": d.strftime("%A"),
             "fecha": d,
@@ -822,16 +1105,13 @@ def medico_horario(request):
 # Secciones de administración (renderizan las plantillas)
 # ---------------------------------------------------------
 
-@login_required
+@presupuesto_consultas(5)
+@rol_requerido('ADMIN', mensaje='No tienes permisos para acceder a esta sección')
 def admin_usuarios(request):
     """
     Vista para la sección 'admin/usuarios/'.
     Muestra la lista de usuarios y renderiza admin/pages/usuarios.html
     """
-    if getattr(request.user, 'rol', None) != 'ADMIN':
-        messages.error(request, 'No tienes permisos para acceder a esta sección')
-        return redirect('login')
-
     usuarios = Usuario.objects.all().order_by('username')
     context = {
         'usuarios': usuarios,
@@ -840,16 +1120,13 @@ def admin_usuarios(request):
     return render(request, 'admin/pages/usuarios.html', context)
 
 
-@login_required
+@presupuesto_consultas(5)
+@rol_requerido('ADMIN', mensaje='No tienes permisos para acceder a esta sección')
 def admin_citas(request):
     """
     Vista para la sección 'admin/citas/'.
     Muestra las citas y renderiza admin/pages/citas.html
     """
-    if getattr(request.user, 'rol', None) != 'ADMIN':
-        messages.error(request, 'No tienes permisos para acceder a esta sección')
-        return redirect('login')
-
     citas = Cita.objects.select_related('paciente', 'medico', 'especialidad').order_by('-fecha_hora')
     context = {
         'citas': citas,
@@ -858,16 +1135,13 @@ def admin_citas(request):
     return render(request, 'admin/pages/citas.html', context)
 
 
-@login_required
+@presupuesto_consultas(5)
+@rol_requerido('ADMIN', mensaje='No tienes permisos para acceder a esta sección')
 def admin_especialidades(request):
     """
     Vista para la sección 'admin/especialidades/'.
     Muestra las especialidades y renderiza admin/pages/especialidades.html
     """
-    if getattr(request.user, 'rol', None) != 'ADMIN':
-        messages.error(request, 'No tienes permisos para acceder a esta sección')
-        return redirect('login')
-
     especialidades = Especialidad.objects.all().order_by('nombre')
     context = {
         'especialidades': especialidades,
@@ -876,25 +1150,144 @@ def admin_especialidades(request):
     return render(request, 'admin/pages/especialidades.html', context)
 
 
-@login_required
+@presupuesto_consultas(4)
+@rol_requerido('ADMIN', json=True)
+def monitoreo_limites(request):
+    """Contadores de peticiones permitidas/rechazadas por regla de límite"""
+    return JsonResponse({'success': True, 'limites': contadores()})
+
+
+@presupuesto_consultas(11)
+@rol_requerido('ADMIN', mensaje='No tienes permisos para acceder a esta sección')
 def admin_reportes(request):
     """
     Vista para la sección 'admin/reportes/'.
-    Prepara algunos KPIs básicos y renderiza admin/pages/reportes.html.
-    Puedes ampliar este contexto con consultas más complejas o series para gráficas.
+    Las series para gráficas se leen de los resúmenes diarios (ver
+    core/reportes.py), así un periodo de 2 años son unas cientos de filas.
     """
-    if getattr(request.user, 'rol', None) != 'ADMIN':
-        messages.error(request, 'No tienes permisos para acceder a esta sección')
-        return redirect('login')
+    try:
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        dias = 30
+    dias = max(1, min(dias, 730))
+
+    hasta = fechas.hoy()
+    desde = hasta - timedelta(days=dias - 1)
 
-    total_usuarios = Usuario.objects.count()
-    total_citas = Cita.objects.count()
-    total_especialidades = Especialidad.objects.count()
+    serie = reportes.series_diarias(desde, hasta)
+    marca = MarcaProceso.objects.filter(nombre=reportes.MARCA_RESUMENES).first()
 
-    # Ejemplo simple de datos para usar en la plantilla (puedes expandir)
     context = {
-        'total_usuarios': total_usuarios,
-        'total_citas': total_citas,
-        'total_especialidades': total_especialidades,
+        'total_usuarios': Usuario.objects.count(),
+        'total_citas': Cita.objects.count(),
+        'total_especialidades': Especialidad.objects.count(),
+        'dias': dias,
+        'desde': desde,
+        'hasta': hasta,
+        'serie_diaria': [
+            {**fila, 'fecha': fila['fecha'].isoformat()} for fila in serie
+        ],
+        'por_medico': reportes.totales_por('medico__username', desde, hasta),
+        'por_especialidad': reportes.totales_por('especialidad__nombre', desde, hasta),
+        'ultima_actualizacion': marca.ultima_ejecucion if marca else None,
     }
-    return render(request, 'admin/pages/reportes.html', context)
\ No newline at end of file
+    return render(request, 'admin/pages/reportes.html', context)
+
+
+# ============================================================
+#                 CALENDARIO (.ics)
+# ============================================================
+
+@presupuesto_consultas(2)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=calendario.etag_calendario, last_modified_func=calendario.modificado_calendario)
+def calendario_ics(request):
+    """Feed iCalendar de las citas del dueño del token (sin sesión: lo piden las apps de calendario)"""
+    datos = calendario.huella(request)
+    if datos is None:
+        raise Http404('Calendario no encontrado')
+
+    guardado = calendario.en_cache(datos)
+    if guardado is not None:
+        response = HttpResponse(guardado, content_type=calendario.TIPO_CONTENIDO)
+    else:
+        response = StreamingHttpResponse(calendario.generar(datos), content_type=calendario.TIPO_CONTENIDO)
+    response['Content-Disposition'] = 'inline; filename="citas.ics"'
+    return response
+
+
+@presupuesto_consultas(5)
+@login_required
+@require_POST
+def calendario_enlace(request):
+    """Enlace de suscripción al calendario; con regenerar=1 el anterior deja de funcionar (JSON)"""
+    if request.user.rol not in calendario.ROLES:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+    token = calendario.token_de(request.user.pk, regenerar=request.POST.get('regenerar') == '1')
+    url = request.build_absolute_uri(reverse('calendario_ics')) + '?' + urlencode({'token': token})
+    return JsonResponse({'success': True, 'url': url})
+
+
+# ============================================================
+#                 SINCRONIZACIÓN (app móvil)
+# ============================================================
+
+@presupuesto_consultas(6)
+@never_cache
+@login_required
+def sincronizar(request):
+    """Citas, notificaciones y borrados desde el cursor del cliente (NDJSON, ver core/sincronizacion.py)"""
+    if request.user.rol not in sincronizacion.ROLES:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+    try:
+        cursor = request.GET.get('cursor')
+        cursor = sincronizacion.decodificar_cursor(cursor) if cursor else None
+        limite = min(max(int(request.GET.get('limite', settings.SYNC_LIMITE)), 1), settings.SYNC_LIMITE)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros no válidos'}, status=400)
+
+    try:
+        lineas = sincronizacion.cambios(request.user, cursor, limite)
+    except sincronizacion.CursorVencido:
+        return JsonResponse({'success': False, 'error': 'Cursor vencido', 'reiniciar': True}, status=410)
+    return StreamingHttpResponse(lineas, content_type=sincronizacion.TIPO_CONTENIDO)
+
+
+# ============================================================
+#                 EVENTOS (integraciones)
+# ============================================================
+
+@presupuesto_consultas(1)
+@never_cache
+def eventos_leer(request):
+    """Lote de eventos de citas siguiente al último confirmado por el consumidor del token (JSON)"""
+    nombre = eventos.consumidor_de(request)
+    if nombre is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
+    try:
+        limite = min(max(int(request.GET.get('limite', settings.EVENTOS_LOTE)), 1), settings.EVENTOS_LOTE)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros no válidos'}, status=400)
+    lote, mas = eventos.leer(nombre, limite)
+    return JsonResponse({
+        'success': True,
+        'eventos': lote,
+        'hasta': lote[-1]['id'] if lote else None,
+        'mas': mas,
+    })
+
+
+@presupuesto_consultas(3)
+@csrf_exempt
+@require_POST
+def eventos_confirmar(request):
+    """Confirma los eventos hasta el id ``hasta``: no se vuelven a entregar a este consumidor (JSON)"""
+    nombre = eventos.consumidor_de(request)
+    if nombre is None:
+        return JsonResponse({'success': False, 'error': 'No autorizado'}, status=403)
+    try:
+        hasta = int(request.POST.get('hasta', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros no válidos'}, status=400)
+    eventos.confirmar(nombre, hasta)
+    return JsonResponse({'success': True})